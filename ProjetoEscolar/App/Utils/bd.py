@@ -1,5 +1,10 @@
 import psycopg2
-from psycopg2 import OperationalError
+from psycopg2 import OperationalError, pool
+from psycopg2.extensions import cursor as _cursor, TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from flask import current_app, g, has_app_context, has_request_context, request
+import logging
+import threading
+import time
 import yaml
 import os
 
@@ -10,24 +15,291 @@ config_path = os.path.join(current_dir, 'paramsBD.yml')
 with open(config_path, 'r') as config_file:
     config = yaml.safe_load(config_file)
 
+# Variáveis de ambiente (definidas no compose.yml) têm precedência sobre o arquivo
+for chave in ('db_name', 'db_user', 'db_password', 'db_host', 'db_port'):
+    if os.environ.get(chave.upper()):
+        config[chave] = os.environ[chave.upper()]
+# Demais parâmetros simples (ex.: SLOW_QUERY_MS, BCRYPT_ROUNDS), convertidos como no YAML
+for chave, valor in list(config.items()):
+    if chave.startswith('db_') or isinstance(valor, dict):
+        continue
+    if os.environ.get(chave.upper()):
+        config[chave] = yaml.safe_load(os.environ[chave.upper()])
+
+logger_sql = logging.getLogger('escola.sql')
+
+
+def _connection_params():
+    return dict(
+        database=config['db_name'],
+        user=config['db_user'],
+        password=config['db_password'],
+        host=config['db_host'],
+        port=config['db_port'],
+    )
+
+
+def _formato_parametros(vars):
+    """Descreve os parâmetros pelo tipo, sem expor valores (ex.: senhas) no log."""
+    if vars is None:
+        return None
+    if isinstance(vars, dict):
+        return {chave: type(valor).__name__ for chave, valor in vars.items()}
+    if isinstance(vars, (list, tuple)):
+        return [type(valor).__name__ for valor in vars]
+    return type(vars).__name__
+
+
+# Funções chamadas a cada comando executado: (endpoint, comando, duração em segundos).
+# Utils/metricas.py registra aqui o histograma de tempo por comando.
+observadores_consulta = []
+
+
+def registrar_consulta(query, vars, duracao, linhas=None):
+    """
+    Contabiliza um comando na requisição atual (g.tempo_db, g.consultas),
+    registra no log os que passam de slow_query_ms e avisa os observadores.
+    """
+    endpoint = None
+    if has_request_context():
+        endpoint = request.endpoint
+    if has_app_context():
+        g.tempo_db = g.get('tempo_db', 0.0) + duracao
+        g.consultas = g.get('consultas', 0) + 1
+
+    sql = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+    comando = sql.split(None, 1)[0].upper() if sql.strip() else ''
+    if duracao * 1000 >= float(config.get('slow_query_ms', 200)):
+        formato = _formato_parametros(vars)
+        if linhas is not None:
+            formato = {'linhas': linhas, 'primeira': _formato_parametros(vars)}
+        logger_sql.warning(
+            "Consulta lenta (%.1f ms) em %s: %s | parâmetros: %s",
+            duracao * 1000, endpoint or '-', ' '.join(sql.split()), formato
+        )
+    for observador in observadores_consulta:
+        observador(endpoint, comando, duracao)
+
+
+class CursorCronometrado(_cursor):
+    """
+    Cursor que cronometra cada comando e o contabiliza na requisição atual
+    (ver registrar_consulta). É o cursor padrão das conexões do pool, então
+    todos os blueprints são instrumentados sem alteração.
+    """
+
+    def _cronometrar(self, query, vars, metodo, *args, linhas=None):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            registrar_consulta(query, vars, time.perf_counter() - inicio, linhas)
+
+    def execute(self, query, vars=None):
+        return self._cronometrar(query, vars, super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        primeira = vars_list[0] if vars_list else None
+        return self._cronometrar(query, primeira, super().executemany, query, vars_list,
+                                 linhas=len(vars_list))
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._cronometrar(sql, None, super().copy_expert, sql, file, size)
+
+
 def create_connection():
     """
     Create a connection to the PostgreSQL database.
+    Use only outside of a request (scripts, CLI); handlers must use get_connection().
     :return: Connection object or None
     """
     connection = None
     try:
-        connection = psycopg2.connect(
-            database=config['db_name'],
-            user=config['db_user'],
-            password=config['db_password'],
-            host=config['db_host'],
-            port=config['db_port'],
-        )
+        connection = psycopg2.connect(**_connection_params())
         print("Connection to PostgreSQL DB successful")
     except OperationalError as e:
         print(f"The error '{e}' occurred")
     return connection
 
-# Example usage:
-# connection = create_connection("your_db_name", "your_db_user", "your_db_password", "your_db_host", "your_db_port")
\ No newline at end of file
+
+class ConnectionPool:
+    """
+    Pool de conexões limitado (pool_min/pool_max) e seguro entre threads.
+    Quando todas as conexões estão em uso, o checkout espera até pool_timeout
+    segundos antes de falhar. Conexões ociosas há mais de pool_check_idle
+    segundos são testadas com SELECT 1 antes de serem entregues.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=5.0, check_idle=30.0, **conn_params):
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **conn_params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._ultimo_uso = {}
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'descartadas': 0,
+            'tempo_espera_total': 0.0,
+        }
+
+    def getconn(self):
+        inicio = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise pool.PoolError("Tempo esgotado aguardando conexão livre no pool")
+        try:
+            conn = self._checkout_saudavel()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['tempo_espera_total'] += time.perf_counter() - inicio
+        return conn
+
+    def _checkout_saudavel(self):
+        # Uma tentativa por conexão existente no pool, mais uma para abrir uma nova
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            if self._saudavel(conn):
+                return conn
+            self._descartar(conn)
+        raise OperationalError("Nenhuma conexão saudável disponível no pool")
+
+    def _saudavel(self, conn):
+        if conn.closed or conn.get_transaction_status() == TRANSACTION_STATUS_UNKNOWN:
+            return False
+        ultimo_uso = self._ultimo_uso.get(id(conn))
+        if ultimo_uso is None or time.monotonic() - ultimo_uso < self.check_idle:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, conn):
+        self._ultimo_uso.pop(id(conn), None)
+        with self._lock:
+            self._stats['descartadas'] += 1
+        self._pool.putconn(conn, close=True)
+
+    def putconn(self, conn):
+        try:
+            if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                # Transação deixada aberta pelo handler (ex.: retorno antecipado)
+                conn.rollback()
+        except psycopg2.Error:
+            pass
+        try:
+            if conn.closed or conn.get_transaction_status() == TRANSACTION_STATUS_UNKNOWN:
+                self._descartar(conn)
+            else:
+                self._ultimo_uso[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        em_uso = len(self._pool._used)
+        ociosas = len(self._pool._pool)
+        stats.update({
+            'min': self.minconn,
+            'max': self.maxconn,
+            'em_uso': em_uso,
+            'ociosas': ociosas,
+            'abertas': em_uso + ociosas,
+        })
+        return stats
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Retorna o pool do processo atual, criando-o na primeira chamada.
+    Após um fork (workers do servidor WSGI) um novo pool é criado, pois
+    conexões não podem ser compartilhadas entre processos.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(
+                    int(config.get('pool_min', 1)),
+                    int(config.get('pool_max', 10)),
+                    timeout=float(config.get('pool_timeout', 5)),
+                    check_idle=float(config.get('pool_check_idle', 30)),
+                    cursor_factory=CursorCronometrado,
+                    **_connection_params()
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def get_connection():
+    """
+    Retorna a conexão do pool associada à requisição atual.
+    A mesma conexão é reutilizada durante toda a requisição e devolvida
+    ao pool no teardown do contexto da aplicação.
+    :return: Connection object or None
+    """
+    if 'db_conn' not in g:
+        inicio = time.perf_counter()
+        try:
+            g.db_conn = get_pool().getconn()
+        except (OperationalError, pool.PoolError) as e:
+            print(f"The error '{e}' occurred")
+            return None
+        finally:
+            g.tempo_conexao = time.perf_counter() - inicio
+    return g.db_conn
+
+
+def release_connection(exception=None):
+    """Devolve ao pool a conexão da requisição atual, se houver."""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        get_pool().putconn(conn)
+
+
+def pool_stats():
+    """Estatísticas do pool para monitoramento (None se o pool ainda não foi criado)."""
+    if _pool is None or _pool_pid != os.getpid():
+        return None
+    return _pool.stats()
+
+
+def _cabecalho_consultas(response):
+    # Só em modo debug: quantidade de comandos e tempo no banco da requisição
+    if not current_app.debug:
+        return response
+    response.headers['X-Query-Count'] = str(g.get('consultas', 0))
+    response.headers['X-DB-Time-Ms'] = f"{g.get('tempo_db', 0.0) * 1000:.1f}"
+    return response
+
+
+def init_app(app):
+    """
+    Registra a devolução da conexão ao pool ao final de cada requisição e,
+    em modo debug, os cabeçalhos com a contagem de consultas.
+    """
+    app.teardown_appcontext(release_connection)
+    app.after_request(_cabecalho_consultas)
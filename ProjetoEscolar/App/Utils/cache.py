@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Cache em memória (por processo) para dados de referência que mudam pouco,
+# como turmas e professores. Cada entrada expira após ttl segundos e, quando o
+# limite de itens é atingido, a menos usada recentemente é descartada (LRU).
+# As rotas de escrita invalidam o cache inteiro após o commit.
+
+TTL_PADRAO = 300
+MAX_ITENS_PADRAO = 1024
+
+
+class CacheTTL:
+    """
+    Cache LRU com expiração por tempo, seguro entre threads.
+    A versão é incrementada a cada invalidação: uma leitura iniciada antes
+    de uma escrita não guarda o resultado (possivelmente antigo) depois dela.
+    """
+
+    def __init__(self, nome, ttl=TTL_PADRAO, max_itens=MAX_ITENS_PADRAO):
+        self.nome = nome
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.versao = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidacoes': 0}
+
+    def obter(self, chave):
+        """
+        :return: (True, valor) se a chave está no cache e não expirou,
+                 (False, None) caso contrário
+        """
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] > time.monotonic():
+                self._itens.move_to_end(chave)
+                self._stats['hits'] += 1
+                return True, item[1]
+            if item is not None:
+                del self._itens[chave]
+            self._stats['misses'] += 1
+            return False, None
+
+    def guardar(self, chave, valor, versao):
+        """Guarda o valor lido do banco, desde que não tenha havido invalidação desde a leitura."""
+        with self._lock:
+            if versao != self.versao:
+                return
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self):
+        with self._lock:
+            self.versao += 1
+            self._itens.clear()
+            self._stats['invalidacoes'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['itens'] = len(self._itens)
+        return stats
+
+
+turmas = CacheTTL('turmas')
+professores = CacheTTL('professores')
+
+caches = {cache.nome: cache for cache in (turmas, professores)}
+
+# Caches que dependem de cada tabela (ex.: as turmas trazem o nome do professor).
+# Usado na invalidação entre workers disparada pelos triggers do banco
+# (migração 0010); aluno e atividade ainda não têm cache dependente.
+DEPENDENCIAS = {
+    'professor': ('professores', 'turmas'),
+    'turma': ('turmas',),
+    'aluno': (),
+    'atividade': (),
+}
+
+
+def invalidar(*nomes):
+    """Invalida os caches informados pelo nome."""
+    for nome in nomes:
+        caches[nome].invalidar()
+
+
+def invalidar_tabela(tabela):
+    """Invalida os caches construídos a partir da tabela alterada."""
+    invalidar(*DEPENDENCIAS.get(tabela, ()))
+
+
+def invalidar_todos():
+    invalidar(*caches)
+
+
+def stats():
+    return {nome: cache.stats() for nome, cache in caches.items()}
@@ -0,0 +1,148 @@
+import gzip
+import time
+import zlib
+from functools import wraps
+from flask import current_app, request
+from . import bd
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compressão das respostas (JSON, NDJSON, CSV) negociada pelo Accept-Encoding:
+# brotli quando o cliente aceita e o pacote está instalado, senão gzip.
+# Respostas comuns abaixo de compressao_min_bytes seguem sem compressão; as
+# exportações em streaming são comprimidas bloco a bloco, com flush a cada
+# bloco para o cliente receber os dados à medida que são gerados.
+#
+# Rotas cuja resposta traz segredos (tokens) usam @sem_compressao: comprimir
+# segredo junto com dados enviados pelo cliente abre espaço para ataques do
+# tipo BREACH.
+
+TIPOS_COMPRIMIVEIS = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html'}
+
+# Funções chamadas após cada compressão: (algoritmo, bytes antes, bytes depois, segundos de CPU).
+# Utils/metricas.py registra aqui os contadores de bytes e CPU.
+observadores = []
+
+
+def sem_compressao(funcao):
+    """Decorador para rotas que nunca devem ter a resposta comprimida (coloque abaixo do @app.route)."""
+    @wraps(funcao)
+    def wrapper(*args, **kwargs):
+        return funcao(*args, **kwargs)
+    wrapper.sem_compressao = True
+    return wrapper
+
+
+def _avisar(algoritmo, antes, depois, cpu):
+    for observador in observadores:
+        observador(algoritmo, antes, depois, cpu)
+
+
+def algoritmo_aceito():
+    """Melhor codificação aceita pelo cliente entre as disponíveis, ou None."""
+    disponiveis = (['br'] if brotli is not None else []) + ['gzip']
+    return request.accept_encodings.best_match(disponiveis)
+
+
+def _comprimir_bytes(algoritmo, dados):
+    if algoritmo == 'br':
+        return brotli.compress(dados, quality=int(bd.config.get('compressao_nivel_br', 4)))
+    # mtime=0: a mesma resposta gera sempre os mesmos bytes
+    return gzip.compress(dados, compresslevel=int(bd.config.get('compressao_nivel_gzip', 6)), mtime=0)
+
+
+class _Compressor:
+    """Compressão incremental com flush por bloco, para respostas em streaming."""
+
+    def __init__(self, algoritmo):
+        if algoritmo == 'br':
+            self._objeto = brotli.Compressor(quality=int(bd.config.get('compressao_nivel_br', 4)))
+        else:
+            # wbits=31: formato gzip (cabeçalho e CRC)
+            self._objeto = zlib.compressobj(int(bd.config.get('compressao_nivel_gzip', 6)), zlib.DEFLATED, 31)
+        self.algoritmo = algoritmo
+
+    def bloco(self, dados):
+        if self.algoritmo == 'br':
+            return self._objeto.process(dados) + self._objeto.flush()
+        return self._objeto.compress(dados) + self._objeto.flush(zlib.Z_SYNC_FLUSH)
+
+    def fim(self):
+        if self.algoritmo == 'br':
+            return self._objeto.finish()
+        return self._objeto.flush(zlib.Z_FINISH)
+
+
+def _comprimir_stream(algoritmo, iteravel):
+    compressor = _Compressor(algoritmo)
+    antes = depois = 0
+    cpu = 0.0
+    try:
+        for bloco in iteravel:
+            if isinstance(bloco, str):
+                bloco = bloco.encode('utf-8')
+            inicio = time.thread_time()
+            saida = compressor.bloco(bloco)
+            cpu += time.thread_time() - inicio
+            antes += len(bloco)
+            depois += len(saida)
+            if saida:
+                yield saida
+        inicio = time.thread_time()
+        saida = compressor.fim()
+        cpu += time.thread_time() - inicio
+        depois += len(saida)
+        yield saida
+    finally:
+        if hasattr(iteravel, 'close'):
+            iteravel.close()
+        _avisar(algoritmo, antes, depois, cpu)
+
+
+def _elegivel(resposta):
+    if not bd.config.get('compressao', True) or request.method == 'HEAD':
+        return False
+    if resposta.status_code < 200 or resposta.status_code in (204, 206, 304):
+        return False
+    if resposta.direct_passthrough or 'Content-Encoding' in resposta.headers:
+        return False
+    if resposta.mimetype not in TIPOS_COMPRIMIVEIS:
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    return not getattr(view, 'sem_compressao', False)
+
+
+def _comprimir_resposta(resposta):
+    if not _elegivel(resposta):
+        return resposta
+    # A representação depende do Accept-Encoding, comprimida ou não
+    resposta.vary.add('Accept-Encoding')
+    algoritmo = algoritmo_aceito()
+    if algoritmo is None:
+        return resposta
+
+    if resposta.is_streamed:
+        resposta.response = _comprimir_stream(algoritmo, resposta.response)
+        resposta.headers.pop('Content-Length', None)
+    else:
+        dados = resposta.get_data()
+        if len(dados) < int(bd.config.get('compressao_min_bytes', 1024)):
+            return resposta
+        inicio = time.thread_time()
+        comprimido = _comprimir_bytes(algoritmo, dados)
+        _avisar(algoritmo, len(dados), len(comprimido), time.thread_time() - inicio)
+        resposta.set_data(comprimido)
+    resposta.headers['Content-Encoding'] = algoritmo
+    return resposta
+
+
+def init_app(app):
+    """
+    Registra a compressão das respostas. Deve ser chamado antes dos demais
+    init_app: os hooks after_request rodam na ordem inversa do registro, e a
+    compressão precisa ser a última etapa.
+    """
+    app.after_request(_comprimir_resposta)
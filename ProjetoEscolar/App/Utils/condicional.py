@@ -0,0 +1,130 @@
+import hashlib
+from functools import wraps
+import psycopg2
+from flask import Response, make_response, request
+from . import bd
+from .inclusoes import pedidas as inclusoes_pedidas
+from .paginacao import cabecalhos_proxima
+
+# GET condicional: o ETag de cada resposta é derivado dos contadores de versão
+# das tabelas consultadas (sequências versao_<tabela>, migração 0009) e da URL
+# pedida. Quando o cliente envia If-None-Match com o ETag atual, a resposta é
+# 304 sem executar a consulta do handler nem serializar o JSON.
+#
+# O ETag é fraco (W/"..."): identifica o conteúdo, não os bytes, e continua
+# valendo para a mesma resposta comprimida ou não (Utils/compressao.py).
+
+CACHE_CONTROL_PADRAO = 'private, no-cache'
+
+# Cabeçalhos guardados no cache junto com o corpo (o Link da próxima página é
+# refeito a partir do X-Next-Cursor, pois depende da URL da requisição)
+CABECALHOS_CACHE = ('X-Next-Cursor', 'X-Missing-Ids')
+
+
+def versoes(tabelas):
+    """
+    Lê os contadores de versão das tabelas em um único SELECT.
+    :return: tupla de versões na ordem de tabelas, ou None se indisponível
+             (inclusive com escrita ainda sem commit em alguma delas)
+    """
+    conn = bd.get_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT ler_versoes_tabelas(%s)", (list(tabelas),))
+        lidas = cursor.fetchone()[0]
+    except psycopg2.Error:
+        # Migração ainda não aplicada: segue sem ETag
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+    return tuple(lidas) if lidas is not None else None
+
+
+def calcular_etag(versoes_tabelas):
+    # A representação também depende da query string (página, filtros) e do
+    # Accept (JSON paginado ou exportação em streaming)
+    base = f"{request.full_path}|{request.headers.get('Accept', '')}|{versoes_tabelas}"
+    return hashlib.blake2b(base.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def cache_control():
+    """Cache-Control do recurso (blueprint), configurável em paramsBD.yml."""
+    configuracao = bd.config.get('cache_control') or {}
+    return configuracao.get(request.blueprint) or configuracao.get('padrao') or CACHE_CONTROL_PADRAO
+
+
+def _cabecalhos(resposta, etag):
+    resposta.set_etag(etag, weak=True)
+    resposta.headers['Cache-Control'] = cache_control()
+    resposta.vary.add('Accept')
+    return resposta
+
+
+def _responder(versoes_tabelas, gerar):
+    """Resposta da rota com ETag, ou 304 sem chamar gerar() quando o If-None-Match confere."""
+    if versoes_tabelas is None:
+        return make_response(gerar())
+
+    etag = calcular_etag(versoes_tabelas)
+    if request.if_none_match.contains_weak(etag):
+        return _cabecalhos(Response(status=304), etag)
+
+    resposta = make_response(gerar())
+    if resposta.status_code == 200:
+        _cabecalhos(resposta, etag)
+    return resposta
+
+
+def _resposta_guardada(corpo, cabecalhos):
+    resposta = Response(corpo, mimetype='application/json')
+    resposta.headers.update(cabecalhos)
+    if 'X-Next-Cursor' in cabecalhos:
+        cabecalhos_proxima(resposta, cabecalhos['X-Next-Cursor'])
+    return resposta
+
+
+def chave_listagem(*args, **kwargs):
+    """Chave de cache de uma listagem paginada ou da busca em lote (ids=)."""
+    return ('lista', request.args.get('limit'), request.args.get('cursor'), request.args.get('ids'))
+
+
+def get_condicional(*tabelas, inclusoes=None, cache=None, chave=None):
+    """
+    Decorador para rotas GET cujo resultado depende apenas das tabelas
+    informadas. Responde 304 quando o If-None-Match corresponde ao ETag atual.
+    :param inclusoes: {relação do include=: tabelas extras}, para rotas com
+                      relações embutidas (Utils/inclusoes.py)
+    :param cache: CacheTTL (Utils/cache.py) que guarda o corpo JSON da resposta
+                  junto com as versões das tabelas lidas antes da consulta; um
+                  acerto responde 200 ou 304 sem usar conexão do pool. A entrada
+                  sai do cache quando as tabelas mudam (invalidação por NOTIFY)
+    :param chave: função dos argumentos da rota que devolve a chave no cache,
+                  ou None para a requisição não usar o cache. Nas listagens a
+                  chave inclui limit, cursor e ids (chave_listagem)
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        def wrapper(*args, **kwargs):
+            chave_cache = chave(*args, **kwargs) if cache is not None else None
+            if chave_cache is not None:
+                achou, entrada = cache.obter(chave_cache)
+                if achou:
+                    versoes_tabelas, corpo, cabecalhos = entrada
+                    return _responder(versoes_tabelas, lambda: _resposta_guardada(corpo, cabecalhos))
+                versao_cache = cache.versao
+
+            consultadas = tabelas
+            for nome in inclusoes_pedidas() if inclusoes else []:
+                consultadas += tuple(tabela for tabela in inclusoes.get(nome, ()) if tabela not in consultadas)
+            versoes_tabelas = versoes(consultadas)
+            resposta = _responder(versoes_tabelas, lambda: funcao(*args, **kwargs))
+
+            if chave_cache is not None and resposta.status_code == 200:
+                cabecalhos = {nome: resposta.headers[nome] for nome in CABECALHOS_CACHE if nome in resposta.headers}
+                cache.guardar(chave_cache, (versoes_tabelas, resposta.get_data(), cabecalhos), versao_cache)
+            return resposta
+        return wrapper
+    return decorador
@@ -0,0 +1,69 @@
+from flask import jsonify
+
+# Escritas em um único comando: em vez de consultar antes (SELECT COUNT(*) ...)
+# e gravar depois - várias idas ao banco e uma janela em que outra requisição
+# pode inserir o mesmo registro -, o INSERT/UPDATE roda direto e as restrições
+# do esquema (FOREIGN KEY, UNIQUE) decidem. A violação chega como
+# psycopg2.IntegrityError e é traduzida aqui nas mesmas mensagens e status que
+# as verificações prévias devolviam. Registro inexistente no UPDATE é detectado
+# pelo RETURNING sem linhas.
+
+
+def resposta_integridade(erro, mensagens):
+    """
+    Traduz a violação de restrição na resposta da rota.
+    :param erro: psycopg2.IntegrityError levantado pelo INSERT/UPDATE
+    :param mensagens: {nome da restrição: (mensagem, status)}
+    :return: (resposta JSON, status); restrições não mapeadas viram 400 com a mensagem do banco
+    """
+    restricao = getattr(erro.diag, 'constraint_name', None)
+    if restricao in mensagens:
+        mensagem, status = mensagens[restricao]
+        return jsonify({"error": mensagem}), status
+    return jsonify({"error": str(erro)}), 400
+
+
+def atribuicoes(data, colunas, chave):
+    """
+    Monta o SET de um UPDATE só com as colunas enviadas em data, para que as
+    demais mantenham o valor atual sem precisar lê-las antes.
+    :param chave: coluna da chave primária, usada quando nenhuma coluna foi enviada
+    :return: (trecho SQL do SET, valores)
+    """
+    presentes = [coluna for coluna in colunas if coluna in data]
+    if not presentes:
+        return f"{chave} = {chave}", []
+    return ', '.join(f"{coluna} = %s" for coluna in presentes), [data[coluna] for coluna in presentes]
+
+
+def campos_patch(data, editaveis):
+    """
+    Valida o corpo de um PATCH: só colunas da lista editaveis, ao menos uma.
+    Campos enviados com null gravam NULL; campos ausentes não são tocados.
+    :return: dict {coluna: valor} com os campos enviados
+    :raises ValueError: corpo vazio, que não é objeto ou com campos não editáveis
+    """
+    if not isinstance(data, dict) or not data:
+        raise ValueError("Nenhum campo para atualizar")
+    desconhecidos = sorted(set(data) - set(editaveis))
+    if desconhecidos:
+        raise ValueError(f"Campos não permitidos: {', '.join(desconhecidos)}")
+    return data
+
+
+def atualizar_parcial(cursor, tabela, campos, chave, retorno):
+    """
+    UPDATE de uma linha só com as colunas em campos, devolvendo a linha
+    atualizada no mesmo comando (RETURNING) - sem SELECT antes nem depois.
+    :param campos: {coluna: valor} já validado por campos_patch
+    :param chave: {coluna da chave primária: valor}
+    :param retorno: colunas devolvidas, na ordem da tupla retornada
+    :return: tupla da linha atualizada, ou None se ela não existe
+    """
+    conjunto, valores = atribuicoes(campos, list(campos), None)
+    filtro = ' AND '.join(f"{coluna} = %s" for coluna in chave)
+    cursor.execute(
+        f"UPDATE {tabela} SET {conjunto} WHERE {filtro} RETURNING {', '.join(retorno)}",
+        tuple(valores) + tuple(chave.values())
+    )
+    return cursor.fetchone()
@@ -0,0 +1,125 @@
+import csv
+import datetime
+import decimal
+import io
+from flask import Response, request, jsonify
+from psycopg2 import OperationalError, pool
+from .bd import get_pool, release_connection
+from .serializacao import dumps_bytes
+
+# Exportação em streaming: a consulta roda em um cursor nomeado (server-side),
+# que entrega as linhas ao Python em lotes de ITERSIZE, e a resposta é gerada
+# lote a lote. O uso de memória não depende do tamanho da tabela.
+
+ITERSIZE = 2000
+
+FORMATOS = {
+    'application/x-ndjson': 'ndjson',
+    'text/csv': 'csv',
+}
+
+TIPOS_EXPORTACAO = ['application/json'] + list(FORMATOS)
+
+
+def formato_exportacao():
+    """
+    Formato de streaming pedido no cabeçalho Accept ('ndjson' ou 'csv').
+    Retorna None quando o cliente aceita JSON, mantendo a listagem paginada.
+    """
+    melhor = request.accept_mimetypes.best_match(TIPOS_EXPORTACAO)
+    return FORMATOS.get(melhor)
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.strftime('%Y-%m-%d')
+    if isinstance(valor, decimal.Decimal):
+        return float(valor)
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def _linhas_ndjson(linhas, converter):
+    return b''.join(dumps_bytes(converter(linha)) + b'\n' for linha in linhas)
+
+
+def _linhas_csv(linhas, converter, colunas, cabecalho):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=colunas)
+    if cabecalho:
+        writer.writeheader()
+    for linha in linhas:
+        writer.writerow({chave: _csv_valor(valor) for chave, valor in converter(linha).items()})
+    return buffer.getvalue()
+
+
+def _csv_valor(valor):
+    if isinstance(valor, (datetime.date, datetime.datetime, decimal.Decimal)):
+        return _serializar(valor)
+    return valor
+
+
+def resposta_exportacao(formato, nome, query, valores, colunas, converter):
+    """
+    Executa a consulta em um cursor server-side e devolve uma resposta em streaming.
+    A conexão é retirada do pool só para esta resposta e devolvida no fechamento
+    da resposta (call_on_close), que o servidor WSGI chama mesmo quando o corpo
+    não é lido: HEAD, cliente que desconecta antes do primeiro lote ou corpo
+    envolvido pela compressão e nunca iterado.
+    :param colunas: nomes dos campos, na ordem das colunas do CSV
+    :param converter: função que transforma uma linha no dicionário emitido
+    """
+    # A conexão da requisição (usada pelo get_condicional para o ETag) não é
+    # necessária durante o streaming: volta ao pool antes de ocupar a segunda
+    release_connection()
+
+    conn_pool = get_pool()
+    try:
+        conn = conn_pool.getconn()
+    except (OperationalError, pool.PoolError):
+        return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
+
+    try:
+        cursor = conn.cursor(name=f'exportacao_{nome}')
+        cursor.itersize = ITERSIZE
+        # O DECLARE é enviado aqui, então erros de consulta viram 400 antes do streaming
+        cursor.execute(query, tuple(valores))
+    except Exception as e:
+        conn_pool.putconn(conn)
+        return jsonify({"error": str(e)}), 400
+
+    devolvida = []
+
+    def liberar():
+        # Chamado pelo fim do gerador e pelo fechamento da resposta: devolve uma vez só
+        if devolvida:
+            return
+        devolvida.append(True)
+        try:
+            cursor.close()
+        finally:
+            conn_pool.putconn(conn)
+
+    def gerar():
+        try:
+            primeiro = True
+            while True:
+                linhas = cursor.fetchmany(ITERSIZE)
+                if not linhas:
+                    break
+                if formato == 'csv':
+                    yield _linhas_csv(linhas, converter, colunas, primeiro)
+                else:
+                    yield _linhas_ndjson(linhas, converter)
+                primeiro = False
+            if primeiro and formato == 'csv':
+                yield _linhas_csv([], converter, colunas, True)
+        finally:
+            liberar()
+
+    if formato == 'csv':
+        resposta = Response(gerar(), mimetype='text/csv',
+                            headers={'Content-Disposition': f'attachment; filename={nome}.csv'})
+    else:
+        resposta = Response(gerar(), mimetype='application/x-ndjson')
+    resposta.call_on_close(liberar)
+    return resposta
@@ -0,0 +1,342 @@
+import datetime
+import random
+import time
+import unicodedata
+import bcrypt
+
+# Geração de dados sintéticos para testes de escala. Os dados atuais das
+# tabelas são substituídos (TRUNCATE) e cada tabela é carregada com COPY a
+# partir de um gerador de linhas, sem montar o arquivo em memória. Tudo roda
+# em uma transação: índices secundários e restrições únicas/estrangeiras são
+# removidos antes da carga e recriados no final (uma construção em lote é bem
+# mais rápida que manter o índice linha a linha), e o COPY usa FREEZE, já que
+# as tabelas foram truncadas na mesma transação.
+#
+# Cada tabela tem seu próprio gerador aleatório derivado da semente, então a
+# mesma semente e os mesmos volumes produzem exatamente os mesmos dados.
+
+TABELAS = ['professor', 'turma', 'aluno', 'pagamento', 'presenca', 'atividade', 'atividade_aluno', 'usuario']
+
+# Volumes de uma escola; --escolas multiplica tudo
+VOLUMES_POR_ESCOLA = {
+    'professores': 24,
+    'turmas': 20,
+    'alunos': 400,
+    'atividades_por_ano': 80,
+}
+
+GRUPOS = [
+    # (grupo, idade em anos, mensalidade atual)
+    ('Berçário', 0, 750.00),
+    ('Maternal I', 1, 700.00),
+    ('Maternal II', 2, 650.00),
+    ('Jardim I', 3, 600.00),
+    ('Jardim II', 4, 550.00),
+    ('Pré-escola', 5, 500.00),
+]
+HORARIOS = [('08:00 - 12:00', 45), ('13:00 - 17:00', 40), ('07:30 - 17:30', 15)]
+REAJUSTE_ANUAL = 0.06
+
+NOMES = ['Miguel', 'Arthur', 'Gael', 'Heitor', 'Theo', 'Davi', 'Gabriel', 'Bernardo', 'Samuel', 'Lucas',
+         'Pedro', 'Rafael', 'Enzo', 'Benício', 'Matheus', 'Helena', 'Alice', 'Laura', 'Maria', 'Sophia',
+         'Manuela', 'Maitê', 'Liz', 'Cecília', 'Isabella', 'Luísa', 'Eloá', 'Heloísa', 'Júlia', 'Ayla',
+         'Valentina', 'Lorena', 'Beatriz', 'Antonella', 'Lara', 'Joaquim', 'Lorenzo', 'Isaac', 'Noah', 'Murilo']
+NOMES_ADULTOS = ['Roberto', 'Mariana', 'Fernanda', 'Ricardo', 'Patricia', 'Eduardo', 'Cristina', 'Marcelo',
+                 'Juliana', 'Rodrigo', 'Camila', 'Fábio', 'Aline', 'Gustavo', 'Renata', 'André', 'Vanessa',
+                 'Paulo', 'Tatiane', 'Leandro', 'Simone', 'Carlos', 'Ana', 'João', 'Adriana', 'Sérgio']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima',
+              'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes',
+              'Vieira', 'Barbosa', 'Rocha', 'Dias', 'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques',
+              'Machado', 'Mendes', 'Freitas', 'Cardoso', 'Ramos', 'Teixeira', 'Araújo', 'Castro']
+INFORMACOES = [('Sem Informações', 70), (None, 12), ('Alergia a amendoim', 3), ('Intolerância a lactose', 5),
+               ('Asma', 4), ('Alergia a corantes', 2), ('Alergia a picada de insetos', 2), ('Rinite alérgica', 2)]
+FORMAS_PAGAMENTO = [('PIX', 45), ('Boleto', 28), ('Cartão de Crédito', 15), ('Cartão de Débito', 7),
+                    ('Transferência', 5)]
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro',
+         'Outubro', 'Novembro', 'Dezembro']
+ATIVIDADES = ['Atividade de Pintura - Cores Primárias', 'Contação de História - Os Três Porquinhos',
+              'Atividade de Coordenação Motora', 'Introdução aos Números', 'Música e Movimento',
+              'Massinha de Modelar', 'Circuito Psicomotor', 'Horta da Escola', 'Reconhecendo as Letras',
+              'Teatro de Fantoches', 'Colagem com Materiais Recicláveis', 'Brincadeiras de Roda',
+              'Formas Geométricas', 'Cuidando dos Animais', 'Culinária Infantil - Salada de Frutas']
+DESEMPENHOS = [
+    ('Excelente', 25, ['Demonstrou criatividade e atenção aos detalhes', 'Conseguiu recontar partes da história',
+                       'Demonstrou ótima coordenação']),
+    ('Bom', 50, ['Completou a atividade com entusiasmo', 'Participou ativamente',
+                 'Melhorou ao longo da atividade']),
+    ('Regular', 20, ['Teve dificuldade em algumas etapas', 'Ficou distraído em alguns momentos',
+                     'Precisa de mais prática']),
+    ('Insuficiente', 5, ['Não quis participar da atividade', 'Precisa de acompanhamento']),
+]
+
+
+def volumes(escolas=1, **ajustes):
+    """Volumes para o número de escolas; ajustes com valor None são ignorados."""
+    resultado = {chave: valor * escolas for chave, valor in VOLUMES_POR_ESCOLA.items()}
+    resultado['anos'] = 10
+    resultado.update({chave: valor for chave, valor in ajustes.items() if valor is not None})
+    resultado['professores'] = max(resultado['professores'], resultado['turmas'])
+    return resultado
+
+
+class ArquivoCopy:
+    """Adapta um iterável de blocos de texto à interface read() esperada pelo COPY."""
+
+    def __init__(self, blocos):
+        self._blocos = iter(blocos)
+        self.linhas = 0
+
+    def read(self, size=65536):
+        # Junta blocos pequenos (uma linha de professor) até ~size caracteres por envio
+        partes, total = [], 0
+        for bloco in self._blocos:
+            partes.append(bloco)
+            total += len(bloco)
+            if total >= size:
+                break
+        texto = ''.join(partes)
+        self.linhas += texto.count('\n')
+        return texto
+
+
+def _texto(valor):
+    """Valor no formato texto do COPY (as listas acima não têm tab, quebra de linha ou barra invertida)."""
+    return r'\N' if valor is None else str(valor)
+
+
+def _linha(*valores):
+    return '\t'.join(_texto(valor) for valor in valores) + '\n'
+
+
+def _ponderado(rng, opcoes):
+    valores, pesos = zip(*opcoes)
+    return rng.choices(valores, weights=pesos)[0]
+
+
+def _sem_acento(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii').lower()
+
+
+def _telefone(rng):
+    return f"(11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"
+
+
+def dias_letivos(inicio, fim):
+    """Dias de segunda a sexta entre inicio e fim, exceto janeiro e a segunda quinzena de julho."""
+    dias = []
+    dia = inicio
+    while dia <= fim:
+        if dia.weekday() < 5 and dia.month != 1 and not (dia.month == 7 and dia.day > 15):
+            dias.append(dia)
+        dia += datetime.timedelta(days=1)
+    return dias
+
+
+class Gerador:
+    """Linhas de cada tabela para os volumes, a semente e a data final informados."""
+
+    def __init__(self, volumes, semente=42, data_final=None, senha='senha123', rounds=12):
+        self.volumes = volumes
+        self.semente = semente
+        self.data_final = data_final or datetime.date.today()
+        self.data_inicial = self.data_final - datetime.timedelta(days=round(365.25 * volumes['anos']) - 1)
+        self.senha = senha
+        self.rounds = rounds
+        self.dias = dias_letivos(self.data_inicial, self.data_final)
+        self.professores_nomes = []
+        self.turmas_grupo = []
+        self.alunos_turma = []
+        self.alunos_por_turma = {}
+
+    def rng(self, tabela):
+        # Semente em texto: o random do Python a deriva de forma estável entre execuções
+        return random.Random(f'{self.semente}:{tabela}')
+
+    def professor(self):
+        rng = self.rng('professor')
+        for id_professor in range(1, self.volumes['professores'] + 1):
+            nome, sobrenome = rng.choice(NOMES_ADULTOS), rng.choice(SOBRENOMES)
+            self.professores_nomes.append((nome, sobrenome))
+            email = f"{_sem_acento(nome)}.{_sem_acento(sobrenome)}{id_professor}@escola.com"
+            yield _linha(id_professor, f"{nome} {sobrenome}", email, _telefone(rng))
+
+    def turma(self):
+        rng = self.rng('turma')
+        for id_turma in range(1, self.volumes['turmas'] + 1):
+            grupo = (id_turma - 1) % len(GRUPOS)
+            self.turmas_grupo.append(grupo)
+            # Turmas do mesmo grupo recebem letras em sequência (A, B, ... Z, AA, BB)
+            indice = (id_turma - 1) // len(GRUPOS)
+            letra = chr(65 + indice % 26) * (1 + indice // 26)
+            nome = f"Turma {letra} - {GRUPOS[grupo][0]}"
+            yield _linha(id_turma, nome, id_turma, _ponderado(rng, HORARIOS))
+
+    def aluno(self):
+        rng = self.rng('aluno')
+        for id_aluno in range(1, self.volumes['alunos'] + 1):
+            id_turma = rng.randint(1, self.volumes['turmas'])
+            self.alunos_turma.append(id_turma)
+            self.alunos_por_turma.setdefault(id_turma, []).append(id_aluno)
+            idade = GRUPOS[self.turmas_grupo[id_turma - 1]][1]
+            nascimento = self.data_final - datetime.timedelta(days=idade * 365 + rng.randint(0, 364))
+            sobrenome = rng.choice(SOBRENOMES)
+            responsavel = f"{rng.choice(NOMES_ADULTOS)} {sobrenome}"
+            email = f"{_sem_acento(responsavel).replace(' ', '.')}{id_aluno}@email.com"
+            yield _linha(id_aluno, f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {sobrenome}",
+                         nascimento.isoformat(), id_turma, responsavel, _telefone(rng), email,
+                         _ponderado(rng, INFORMACOES))
+
+    def presenca(self):
+        rng = self.rng('presenca')
+        sorteio = rng.random
+        datas = [dia.isoformat() for dia in self.dias]
+        for id_aluno in range(1, self.volumes['alunos'] + 1):
+            # Frequência de cada aluno em torno de 92%, com alguns bem mais faltosos
+            taxa = rng.betavariate(30, 2.6)
+            prefixo = f"{id_aluno}\t"
+            yield ''.join([prefixo + data + ('\tt\n' if sorteio() < taxa else '\tf\n') for data in datas])
+
+    def pagamento(self):
+        rng = self.rng('pagamento')
+        meses = []
+        ano, mes = self.data_inicial.year, self.data_inicial.month
+        while (ano, mes) <= (self.data_final.year, self.data_final.month):
+            meses.append((ano, mes))
+            ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        for id_aluno, id_turma in enumerate(self.alunos_turma, start=1):
+            mensalidade = GRUPOS[self.turmas_grupo[id_turma - 1]][2]
+            forma = _ponderado(rng, FORMAS_PAGAMENTO)
+            linhas = []
+            for indice, (ano, mes) in enumerate(meses):
+                anos_atras = self.data_final.year - ano
+                valor = round(mensalidade / (1 + REAJUSTE_ANUAL) ** anos_atras, 2)
+                dia = min(28, max(1, int(rng.gauss(8, 4))))
+                recentes = len(meses) - indice
+                pendente = rng.random() < (0.4 if recentes == 1 else 0.12 if recentes <= 3 else 0.02)
+                if rng.random() < 0.1:
+                    forma = _ponderado(rng, FORMAS_PAGAMENTO)
+                linhas.append(_linha(id_aluno, datetime.date(ano, mes, dia).isoformat(), f"{valor:.2f}", forma,
+                                     f"Mensalidade {MESES[mes - 1]}/{ano}", 'Pendente' if pendente else 'Pago'))
+            yield ''.join(linhas)
+
+    def atividade(self):
+        rng = self.rng('atividade')
+        self.atividades_turma = []
+        total = self.volumes['atividades_por_ano'] * self.volumes['anos']
+        for id_atividade in range(1, total + 1):
+            self.atividades_turma.append(rng.randint(1, self.volumes['turmas']))
+            yield _linha(id_atividade, rng.choice(ATIVIDADES), rng.choice(self.dias).isoformat())
+
+    def atividade_aluno(self):
+        rng = self.rng('atividade_aluno')
+        for id_atividade, id_turma in enumerate(self.atividades_turma, start=1):
+            linhas = []
+            for id_aluno in self.alunos_por_turma.get(id_turma, []):
+                if rng.random() < 0.08:
+                    continue  # faltou no dia
+                desempenho, _, observacoes = rng.choices(DESEMPENHOS, weights=[d[1] for d in DESEMPENHOS])[0]
+                observacao = rng.choice(observacoes) if rng.random() < 0.6 else None
+                linhas.append(_linha(id_atividade, id_aluno, desempenho, observacao))
+            yield ''.join(linhas)
+
+    def usuario(self):
+        # Um único hash para todos: o bcrypt de cada usuário dominaria o tempo de geração
+        hash_senha = bcrypt.hashpw(self.senha.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+        yield _linha(1, 'admin', hash_senha, 'administrador', None)
+        for id_professor, (nome, sobrenome) in enumerate(self.professores_nomes, start=1):
+            login = f"{_sem_acento(nome)}.{_sem_acento(sobrenome)}{id_professor}"
+            yield _linha(id_professor + 1, login, hash_senha, 'professor', id_professor)
+
+
+COLUNAS = {
+    'professor': ['id_professor', 'nome_completo', 'email', 'telefone'],
+    'turma': ['id_turma', 'nome_turma', 'id_professor', 'horario'],
+    'aluno': ['id_aluno', 'nome_completo', 'data_nascimento', 'id_turma', 'nome_responsavel',
+              'telefone_responsavel', 'email_responsavel', 'informacoes_adicionais'],
+    'presenca': ['id_aluno', 'data_presenca', 'presente'],
+    'pagamento': ['id_aluno', 'data_pagamento', 'valor_pago', 'forma_pagamento', 'referencia', 'status'],
+    'atividade': ['id_atividade', 'descricao', 'data_realizacao'],
+    'atividade_aluno': ['id_atividade', 'id_aluno', 'desempenho', 'observacoes'],
+    'usuario': ['id_usuario', 'login', 'senha', 'nivel_acesso', 'id_professor'],
+}
+
+# Ordem de carga: cada tabela depois das que ela referencia (e dos dados que o gerador guarda delas)
+ORDEM_CARGA = ['professor', 'turma', 'aluno', 'presenca', 'pagamento', 'atividade', 'atividade_aluno', 'usuario']
+
+
+def _suspender_indices(cursor):
+    """
+    Remove índices secundários e restrições únicas/estrangeiras das tabelas.
+    :return: comandos que os recriam, na ordem de execução
+    """
+    cursor.execute(
+        """
+        SELECT c.conrelid::regclass::text, c.conname, c.contype, pg_get_constraintdef(c.oid)
+        FROM pg_constraint c
+        WHERE c.conrelid = ANY(%s::regclass[]) AND c.contype IN ('u', 'f')
+        ORDER BY c.contype, c.conname
+        """,
+        (TABELAS,)
+    )
+    restricoes = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s::regclass[])
+          AND i.indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE contype IN ('p', 'u', 'x'))
+        """,
+        (TABELAS,)
+    )
+    indices = cursor.fetchall()
+
+    # Estrangeiras ('f') antes das únicas ('u'), que podem ser referenciadas por elas
+    for tabela, nome, _, _ in restricoes:
+        cursor.execute(f'ALTER TABLE {tabela} DROP CONSTRAINT "{nome}"')
+    for nome, _ in indices:
+        cursor.execute(f'DROP INDEX {nome}')
+
+    recriar = [definicao for _, definicao in indices]
+    recriar += [f'ALTER TABLE {tabela} ADD CONSTRAINT "{nome}" {definicao}'
+                for tabela, nome, tipo, definicao in sorted(restricoes, key=lambda r: r[2] == 'f')]
+    return recriar
+
+
+def gerar(conn, gerador, saida=print):
+    """
+    Substitui os dados das tabelas pelos do gerador, em uma única transação.
+    O commit fica a cargo de quem chama.
+    :return: {tabela: linhas carregadas} e o tempo total em segundos
+    """
+    inicio = time.perf_counter()
+    linhas = {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET LOCAL maintenance_work_mem = '512MB'")
+        cursor.execute(f"TRUNCATE {', '.join(TABELAS)} RESTART IDENTITY")
+        recriar = _suspender_indices(cursor)
+
+        for tabela in ORDEM_CARGA:
+            etapa = time.perf_counter()
+            arquivo = ArquivoCopy(getattr(gerador, tabela)())
+            cursor.copy_expert(
+                f"COPY {tabela} ({', '.join(COLUNAS[tabela])}) FROM STDIN WITH (FREEZE)", arquivo, size=65536
+            )
+            linhas[tabela] = arquivo.linhas
+            saida(f"{tabela}: {arquivo.linhas} linhas em {time.perf_counter() - etapa:.1f}s")
+
+        etapa = time.perf_counter()
+        for comando in recriar:
+            cursor.execute(comando)
+        saida(f"Índices e restrições recriados em {time.perf_counter() - etapa:.1f}s")
+
+        # Os ids foram gravados explicitamente: as sequências continuam do maior id
+        for tabela, colunas in COLUNAS.items():
+            if colunas[0] == f'id_{tabela}':
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{tabela}', '{colunas[0]}'), "
+                    f"COALESCE((SELECT max({colunas[0]}) FROM {tabela}), 0) + 1, false)"
+                )
+    finally:
+        cursor.close()
+    return {'linhas': linhas, 'segundos': round(time.perf_counter() - inicio, 2)}
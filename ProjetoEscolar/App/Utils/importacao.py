@@ -0,0 +1,172 @@
+import csv
+from flask import request
+
+# Importação em massa via COPY: o CSV é enviado direto do stream para uma
+# tabela temporária (staging) com colunas texto, validado com poucas instruções
+# sobre o conjunto inteiro e copiado para a tabela final com um único INSERT.
+# A validação de tipos usa pg_input_is_valid (PostgreSQL 16+).
+
+MAX_ERROS_RELATORIO = 1000
+
+ENTIDADES = {
+    'alunos': {
+        'tabela': 'aluno',
+        'colunas': {
+            'nome_completo': 'varchar(255)',
+            'data_nascimento': 'date',
+            'id_turma': 'integer',
+            'nome_responsavel': 'varchar(255)',
+            'telefone_responsavel': 'varchar(20)',
+            'email_responsavel': 'varchar(100)',
+            'informacoes_adicionais': 'text',
+        },
+        'obrigatorias': ['nome_completo', 'data_nascimento'],
+        'referencias': {'id_turma': ('turma', 'id_turma')},
+        'padroes': {},
+    },
+    'professores': {
+        'tabela': 'professor',
+        'colunas': {
+            'nome_completo': 'varchar(255)',
+            'email': 'varchar(100)',
+            'telefone': 'varchar(20)',
+        },
+        'obrigatorias': ['nome_completo'],
+        'referencias': {},
+        'padroes': {},
+    },
+    'pagamentos': {
+        'tabela': 'pagamento',
+        'colunas': {
+            'id_aluno': 'integer',
+            'data_pagamento': 'date',
+            'valor_pago': 'numeric(10,2)',
+            'forma_pagamento': 'varchar(50)',
+            'referencia': 'varchar(100)',
+            'status': 'varchar(20)',
+        },
+        'obrigatorias': ['id_aluno', 'data_pagamento', 'valor_pago'],
+        'referencias': {'id_aluno': ('aluno', 'id_aluno')},
+        'padroes': {'status': 'Pendente'},
+    },
+}
+
+
+def arquivo_importacao():
+    """Stream do CSV enviado: campo multipart 'arquivo' ou o corpo da requisição (text/csv)."""
+    if 'arquivo' in request.files:
+        return request.files['arquivo'].stream
+    return request.stream
+
+
+def _ler_cabecalho(arquivo, spec):
+    linha = arquivo.readline()
+    if isinstance(linha, bytes):
+        linha = linha.decode('utf-8-sig')
+    linha = linha.lstrip('\ufeff').strip()
+    if not linha:
+        raise ValueError("Arquivo CSV vazio")
+
+    # Planilhas exportadas em português costumam usar ponto e vírgula
+    delimitador = ';' if linha.count(';') > linha.count(',') else ','
+    colunas = [coluna.strip().lower() for coluna in next(csv.reader([linha], delimiter=delimitador))]
+
+    desconhecidas = [coluna for coluna in colunas if coluna not in spec['colunas']]
+    if desconhecidas:
+        raise ValueError(f"Colunas desconhecidas no CSV: {', '.join(desconhecidas)}")
+    ausentes = [coluna for coluna in spec['obrigatorias'] if coluna not in colunas]
+    if ausentes:
+        raise ValueError(f"Colunas obrigatórias ausentes no CSV: {', '.join(ausentes)}")
+    if len(set(colunas)) != len(colunas):
+        raise ValueError("Colunas repetidas no cabeçalho do CSV")
+    return colunas, delimitador
+
+
+def _texto(spec, coluna):
+    # Aceita vírgula decimal (150,00) nas colunas numéricas
+    if spec['colunas'][coluna].startswith('numeric'):
+        return f"replace(s.{coluna}, ',', '.')"
+    return f"s.{coluna}"
+
+
+def _validacao(spec):
+    """Expressão CASE que devolve o primeiro erro de cada linha da staging (ou NULL)."""
+    regras = []
+    for coluna in spec['obrigatorias']:
+        regras.append(f"WHEN NULLIF(btrim(s.{coluna}), '') IS NULL THEN 'O campo {coluna} é obrigatório'")
+    for coluna, tipo in spec['colunas'].items():
+        if tipo != 'text':
+            regras.append(
+                f"WHEN s.{coluna} IS NOT NULL AND NOT pg_input_is_valid({_texto(spec, coluna)}, '{tipo}') "
+                f"THEN 'Valor inválido para {coluna}'"
+            )
+    for coluna, (tabela, chave) in spec['referencias'].items():
+        tipo = spec['colunas'][coluna]
+        regras.append(
+            f"WHEN s.{coluna} IS NOT NULL AND NOT EXISTS "
+            f"(SELECT 1 FROM {tabela} r WHERE r.{chave} = s.{coluna}::{tipo}) "
+            f"THEN '{coluna} não encontrado'"
+        )
+    return "CASE " + " ".join(regras) + " END"
+
+
+def _valor_final(spec, coluna):
+    tipo = spec['colunas'][coluna]
+    valor = f"NULLIF({_texto(spec, coluna)}, '')::{tipo}" if tipo != 'text' else f"s.{coluna}"
+    if coluna in spec['padroes']:
+        valor = f"COALESCE({valor}, '{spec['padroes'][coluna]}')"
+    return valor
+
+
+def importar_csv(conn, entidade, arquivo):
+    """
+    Importa um CSV para a tabela da entidade ('alunos', 'professores' ou 'pagamentos').
+    Linhas inválidas são rejeitadas individualmente; as demais são gravadas.
+    O commit fica a cargo de quem chama.
+    :return: relatório com quantidades importadas/rejeitadas e os erros por linha
+    """
+    spec = ENTIDADES[entidade]
+    colunas_csv, delimitador = _ler_cabecalho(arquivo, spec)
+    colunas = list(spec['colunas'])
+
+    cursor = conn.cursor()
+    try:
+        # Datas no formato dd/mm/aaaa das planilhas, além do ISO
+        cursor.execute("SET LOCAL datestyle = 'ISO, DMY'")
+        cursor.execute(
+            "CREATE TEMP TABLE importacao_staging (linha bigserial, erro text, "
+            + ", ".join(f"{coluna} text" for coluna in colunas)
+            + ") ON COMMIT DROP"
+        )
+        cursor.copy_expert(
+            f"COPY importacao_staging ({', '.join(colunas_csv)}) FROM STDIN "
+            f"WITH (FORMAT csv, DELIMITER '{delimitador}', ENCODING 'UTF8')",
+            arquivo
+        )
+
+        cursor.execute(f"UPDATE importacao_staging s SET erro = {_validacao(spec)}")
+
+        cursor.execute(
+            f"INSERT INTO {spec['tabela']} ({', '.join(colunas)}) "
+            f"SELECT {', '.join(_valor_final(spec, coluna) for coluna in colunas)} "
+            f"FROM importacao_staging s WHERE s.erro IS NULL ORDER BY s.linha"
+        )
+        importados = cursor.rowcount
+
+        cursor.execute("SELECT COUNT(*) FROM importacao_staging WHERE erro IS NOT NULL")
+        rejeitados = cursor.fetchone()[0]
+
+        # linha + 1: a primeira linha do arquivo é o cabeçalho
+        cursor.execute(
+            "SELECT linha + 1, erro FROM importacao_staging WHERE erro IS NOT NULL ORDER BY linha LIMIT %s",
+            (MAX_ERROS_RELATORIO,)
+        )
+        erros = [{"linha": linha, "erro": erro} for linha, erro in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+    return {
+        "importados": importados,
+        "rejeitados": rejeitados,
+        "erros": erros,
+    }
@@ -0,0 +1,66 @@
+from flask import request
+
+# Relações embutidas na resposta (include=alunos,professor): cada relação é
+# carregada com uma única consulta "WHERE chave = ANY(%s)" sobre as chaves de
+# todos os registros da resposta e distribuída em memória, em vez de uma
+# consulta por registro (N+1) ou de uma requisição por registro no cliente.
+#
+# A resposta passa a depender também das tabelas incluídas: as rotas informam
+# essas tabelas ao get_condicional (inclusoes=) para o ETag mudar junto.
+
+
+def parametro_include(permitidas):
+    """Parâmetro include para o swagger da rota."""
+    return {
+        'name': 'include',
+        'in': 'query',
+        'type': 'string',
+        'required': False,
+        'description': f"Relações embutidas na resposta, separadas por vírgula: {', '.join(permitidas)}"
+    }
+
+
+def pedidas():
+    """Nomes pedidos em include=, sem validar (usado pelo get_condicional)."""
+    valor = request.args.get('include') or ''
+    return [nome.strip() for nome in valor.split(',') if nome.strip()]
+
+
+def ler_inclusoes(permitidas):
+    """
+    Lê e valida o parâmetro include.
+    :return: relações pedidas, na ordem de permitidas (lista vazia sem include)
+    """
+    nomes = set(pedidas())
+    desconhecidas = sorted(nomes - set(permitidas))
+    if desconhecidas:
+        raise ValueError(f"O parâmetro include aceita: {', '.join(permitidas)}")
+    return [nome for nome in permitidas if nome in nomes]
+
+
+def carregar(cursor, query, chaves, converter, posicao_chave=0):
+    """
+    Carrega a relação de todos os registros da resposta em uma consulta.
+    :param query: consulta com "= ANY(%s)" sobre a coluna que liga a relação ao registro
+    :param chaves: valores dessa coluna nos registros da resposta (None é ignorado)
+    :param posicao_chave: posição dessa coluna nas linhas retornadas
+    :return: {chave: [registros convertidos]}, cada lista na ordem da consulta
+    """
+    chaves = [chave for chave in dict.fromkeys(chaves) if chave is not None]
+    grupos = {}
+    if not chaves:
+        return grupos
+    cursor.execute(query, (chaves,))
+    for linha in cursor.fetchall():
+        grupos.setdefault(linha[posicao_chave], []).append(converter(linha))
+    return grupos
+
+
+def aninhar(registros, nome, campo, grupos, unico=False):
+    """
+    Coloca em cada registro, no campo nome, o grupo da chave registro[campo]:
+    a lista (vazia se não houver) ou, com unico=True, o objeto ou None.
+    """
+    for registro in registros:
+        grupo = grupos.get(registro[campo], [])
+        registro[nome] = (grupo[0] if grupo else None) if unico else grupo
@@ -0,0 +1,120 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import jsonify
+from . import bd
+
+# Limite de tentativas de /login por balde de fichas (token bucket), por IP e
+# por nome de login, verificado antes da verificação bcrypt. Cada chave tem
+# até "burst" fichas, repostas à taxa "refill" fichas por segundo; cada
+# tentativa consome uma ficha e, sem fichas, a resposta é 429 + Retry-After.
+#
+# login_limite_backend em paramsBD.yml escolhe onde ficam os baldes:
+#   memoria  - por processo (cada worker tem seu próprio limite)
+#   postgres - tabela limite_login (migração 0007), compartilhada entre workers
+
+MAX_CHAVES_MEMORIA = 10000
+
+
+def parametros(tipo):
+    """:return: (burst, refill por segundo) configurados para 'ip' ou 'login'"""
+    padroes = {'ip': (20, 0.5), 'login': (5, 0.05)}
+    burst, refill = padroes[tipo]
+    return (float(bd.config.get(f'login_limite_{tipo}_burst', burst)),
+            float(bd.config.get(f'login_limite_{tipo}_refill', refill)))
+
+
+class BaldesMemoria:
+    """Baldes de fichas do processo, com no máximo max_chaves chaves (LRU)."""
+
+    def __init__(self, max_chaves=MAX_CHAVES_MEMORIA):
+        self.max_chaves = max_chaves
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, chave, burst, refill):
+        """:return: (permitido, fichas restantes)"""
+        agora = time.monotonic()
+        with self._lock:
+            fichas, ultimo = self._baldes.get(chave, (burst, agora))
+            fichas = min(burst, fichas + (agora - ultimo) * refill)
+            permitido = fichas >= 1
+            if permitido:
+                fichas -= 1
+            self._baldes[chave] = (fichas, agora)
+            self._baldes.move_to_end(chave)
+            while len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+        return permitido, fichas
+
+
+# Fichas disponíveis no balde antes da tentativa atual
+_FICHAS_REPOSTAS = "LEAST(%(burst)s, l.fichas + EXTRACT(EPOCH FROM now() - l.atualizado_em) * %(refill)s)"
+
+
+def consumir_postgres(conn, chave, burst, refill):
+    """Mesma conta de BaldesMemoria.consumir em um único UPSERT atômico."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            INSERT INTO limite_login AS l (chave, fichas, permitido, atualizado_em)
+            VALUES (%(chave)s, %(burst)s - 1, %(burst)s >= 1, now())
+            ON CONFLICT (chave) DO UPDATE SET
+                fichas = CASE WHEN {_FICHAS_REPOSTAS} >= 1
+                              THEN {_FICHAS_REPOSTAS} - 1 ELSE {_FICHAS_REPOSTAS} END,
+                permitido = {_FICHAS_REPOSTAS} >= 1,
+                atualizado_em = now()
+            RETURNING permitido, fichas
+            """,
+            {'chave': chave, 'burst': burst, 'refill': refill}
+        )
+        permitido, fichas = cursor.fetchone()
+        conn.commit()
+    finally:
+        cursor.close()
+    return permitido, float(fichas)
+
+
+_memoria = BaldesMemoria()
+_recusas = {'ip': 0, 'login': 0}
+_recusas_lock = threading.Lock()
+
+
+def no_banco():
+    """Se os baldes ficam no PostgreSQL (e verificar_login precisa de conexão)."""
+    return bd.config.get('login_limite_backend', 'memoria') == 'postgres'
+
+
+def verificar_login(conn, ip, login):
+    """
+    Consome uma ficha do IP e uma do login.
+    :param conn: conexão usada pelo backend postgres (None com o backend memoria)
+    :return: None se a tentativa pode seguir, ou segundos até a próxima ficha
+    """
+    espera = None
+    for tipo, valor in (('ip', ip), ('login', login.strip().lower())):
+        burst, refill = parametros(tipo)
+        chave = f'{tipo}:{valor}'
+        if no_banco():
+            permitido, fichas = consumir_postgres(conn, chave, burst, refill)
+        else:
+            permitido, fichas = _memoria.consumir(chave, burst, refill)
+        if not permitido:
+            with _recusas_lock:
+                _recusas[tipo] += 1
+            espera = max(espera or 0, (1 - fichas) / refill if refill > 0 else 60)
+    return espera
+
+
+def resposta_limite(espera):
+    resposta = jsonify({"error": "Muitas tentativas de login, tente novamente mais tarde"})
+    resposta.headers['Retry-After'] = str(max(1, math.ceil(espera)))
+    return resposta, 429
+
+
+def stats():
+    """Tentativas de login recusadas por tipo de chave, neste processo."""
+    with _recusas_lock:
+        return dict(_recusas)
@@ -0,0 +1,169 @@
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+from . import bd, cache, compressao, limites
+
+# Métricas Prometheus da própria API, expostas em /metrics.
+# Com vários processos (servidor WSGI com workers), defina PROMETHEUS_MULTIPROC_DIR
+# para que cada worker grave suas métricas em disco e /metrics agregue todas.
+
+MULTIPROCESSO = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+FAIXAS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LATENCIA = Histogram(
+    'escola_http_request_duration_seconds', 'Latência das requisições HTTP',
+    ['blueprint', 'endpoint', 'method'], buckets=FAIXAS_LATENCIA
+)
+REQUISICOES = Counter(
+    'escola_http_requests_total', 'Requisições HTTP por código de status',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+EM_ANDAMENTO = Gauge(
+    'escola_http_requests_in_progress', 'Requisições HTTP em andamento',
+    ['blueprint', 'endpoint'], multiprocess_mode='livesum'
+)
+TEMPO_DB = Histogram(
+    'escola_db_time_per_request_seconds', 'Tempo gasto no banco por requisição',
+    ['blueprint', 'endpoint'], buckets=FAIXAS_LATENCIA
+)
+ESPERA_CONEXAO = Histogram(
+    'escola_db_connection_acquire_seconds', 'Tempo para obter uma conexão do pool',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+TEMPO_CONSULTA = Histogram(
+    'escola_db_query_duration_seconds', 'Tempo de cada comando SQL',
+    ['endpoint', 'comando'], buckets=FAIXAS_LATENCIA
+)
+CONSULTAS_POR_REQUISICAO = Histogram(
+    'escola_db_queries_per_request', 'Comandos SQL executados por requisição',
+    ['blueprint', 'endpoint'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+POOL_CONEXOES = Gauge(
+    'escola_db_pool_connections', 'Conexões do pool por estado',
+    ['estado'], multiprocess_mode='livesum'
+)
+CACHE_OPERACOES = Gauge(
+    'escola_cache_operations', 'Acertos, falhas e invalidações acumulados dos caches',
+    ['cache', 'resultado'], multiprocess_mode='livesum'
+)
+CACHE_ITENS = Gauge(
+    'escola_cache_items', 'Itens armazenados em cada cache',
+    ['cache'], multiprocess_mode='livesum'
+)
+LOGIN_RECUSADOS = Gauge(
+    'escola_login_rate_limited', 'Tentativas de login recusadas pelo limite, acumuladas',
+    ['chave'], multiprocess_mode='livesum'
+)
+COMPRESSAO_ENTRADA = Counter(
+    'escola_compression_input_bytes_total', 'Bytes das respostas antes da compressão', ['algoritmo']
+)
+COMPRESSAO_SAIDA = Counter(
+    'escola_compression_output_bytes_total', 'Bytes das respostas depois da compressão', ['algoritmo']
+)
+COMPRESSAO_CPU = Counter(
+    'escola_compression_cpu_seconds_total', 'Tempo de CPU gasto comprimindo respostas', ['algoritmo']
+)
+
+ROTAS_IGNORADAS = {'metrics'}
+
+
+def _rotulos():
+    return request.blueprint or 'app', request.endpoint or 'desconhecido'
+
+
+def _inicio_requisicao():
+    if request.endpoint in ROTAS_IGNORADAS:
+        return
+    g.metricas_inicio = time.perf_counter()
+    EM_ANDAMENTO.labels(*_rotulos()).inc()
+
+
+def _fim_requisicao(response):
+    inicio = g.pop('metricas_inicio', None)
+    if inicio is None:
+        return response
+    blueprint, endpoint = _rotulos()
+    LATENCIA.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - inicio)
+    REQUISICOES.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+    if 'tempo_db' in g:
+        TEMPO_DB.labels(blueprint, endpoint).observe(g.tempo_db)
+    CONSULTAS_POR_REQUISICAO.labels(blueprint, endpoint).observe(g.get('consultas', 0))
+    if 'tempo_conexao' in g:
+        ESPERA_CONEXAO.observe(g.tempo_conexao)
+    g.metricas_em_andamento = (blueprint, endpoint)
+    if MULTIPROCESSO:
+        # Cada worker publica o estado do seu pool e caches; /metrics soma todos
+        _atualizar_estado()
+    return response
+
+
+def _teardown_requisicao(exception=None):
+    rotulos = g.pop('metricas_em_andamento', None)
+    if rotulos is not None:
+        EM_ANDAMENTO.labels(*rotulos).dec()
+    elif 'metricas_inicio' in g:
+        # Exceção antes do after_request: a requisição ainda conta como em andamento
+        g.pop('metricas_inicio')
+        EM_ANDAMENTO.labels(*_rotulos()).dec()
+
+
+def _observar_consulta(endpoint, comando, duracao):
+    TEMPO_CONSULTA.labels(endpoint or 'fora_de_requisicao', comando or 'desconhecido').observe(duracao)
+
+
+bd.observadores_consulta.append(_observar_consulta)
+
+
+def _observar_compressao(algoritmo, antes, depois, cpu):
+    COMPRESSAO_ENTRADA.labels(algoritmo).inc(antes)
+    COMPRESSAO_SAIDA.labels(algoritmo).inc(depois)
+    COMPRESSAO_CPU.labels(algoritmo).inc(cpu)
+
+
+compressao.observadores.append(_observar_compressao)
+
+
+def _atualizar_pool():
+    stats = bd.pool_stats()
+    if stats:
+        POOL_CONEXOES.labels('em_uso').set(stats['em_uso'])
+        POOL_CONEXOES.labels('ociosas').set(stats['ociosas'])
+
+
+def _atualizar_caches():
+    for nome, stats in cache.stats().items():
+        for resultado in ('hits', 'misses', 'invalidacoes'):
+            CACHE_OPERACOES.labels(nome, resultado).set(stats[resultado])
+        CACHE_ITENS.labels(nome).set(stats['itens'])
+
+
+def _atualizar_limites():
+    for tipo, recusas in limites.stats().items():
+        LOGIN_RECUSADOS.labels(tipo).set(recusas)
+
+
+def _atualizar_estado():
+    _atualizar_pool()
+    _atualizar_caches()
+    _atualizar_limites()
+
+
+def metrics():
+    _atualizar_estado()
+    if MULTIPROCESSO:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """Registra os hooks de instrumentação e a rota /metrics."""
+    app.before_request(_inicio_requisicao)
+    app.after_request(_fim_requisicao)
+    app.teardown_request(_teardown_requisicao)
+    app.add_url_rule('/metrics', 'metrics', metrics)
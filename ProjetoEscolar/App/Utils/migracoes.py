@@ -0,0 +1,143 @@
+import os
+import re
+
+# Migrações versionadas do esquema: arquivos NNNN_descricao.sql em db/migracoes,
+# aplicados em ordem e registrados na tabela schema_version.
+#
+# Por padrão cada arquivo roda em uma transação junto com o seu registro.
+# Arquivos que começam com o marcador abaixo rodam fora de transação, uma
+# instrução por vez (necessário para CREATE INDEX CONCURRENTLY, que não bloqueia
+# escritas e pode ser aplicado com o banco em uso). Nesses arquivos cada
+# instrução deve ser idempotente (IF NOT EXISTS), pois uma falha no meio do
+# arquivo não desfaz as instruções anteriores.
+
+MARCADOR_SEM_TRANSACAO = '-- migracao: sem-transacao'
+
+# Chave do pg_advisory_lock que impede dois processos de migrar ao mesmo tempo
+LOCK_MIGRACOES = 5_731_001
+
+DIRETORIO_MIGRACOES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'db', 'migracoes'
+)
+
+_ARQUIVO = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+_INDICE_CONCORRENTE = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE
+)
+
+
+def listar_migracoes(diretorio=DIRETORIO_MIGRACOES):
+    """
+    Lista as migrações disponíveis em ordem de versão.
+    :return: lista de (versao, nome, caminho)
+    """
+    migracoes = []
+    for arquivo in os.listdir(diretorio):
+        encontrado = _ARQUIVO.match(arquivo)
+        if encontrado:
+            migracoes.append((int(encontrado.group(1)), encontrado.group(2), os.path.join(diretorio, arquivo)))
+    migracoes.sort()
+    versoes = [versao for versao, _, _ in migracoes]
+    if len(set(versoes)) != len(versoes):
+        raise ValueError("Há migrações com o mesmo número de versão")
+    return migracoes
+
+
+def instrucoes(sql):
+    """Separa um arquivo sem transação em instruções (sem suporte a corpos de função)."""
+    linhas = [linha for linha in sql.splitlines() if not linha.strip().startswith('--')]
+    return [instrucao.strip() for instrucao in '\n'.join(linhas).split(';') if instrucao.strip()]
+
+
+def _preparar_schema_version(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            nome VARCHAR(255) NOT NULL,
+            aplicada_em TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def versoes_aplicadas(cursor):
+    cursor.execute("SELECT versao FROM schema_version")
+    return {linha[0] for linha in cursor.fetchall()}
+
+
+def _remover_indice_invalido(cursor, instrucao):
+    # Um CREATE INDEX CONCURRENTLY interrompido deixa o índice marcado como
+    # inválido; o IF NOT EXISTS o ignoraria, então ele é removido antes.
+    encontrado = _INDICE_CONCORRENTE.search(instrucao)
+    if not encontrado:
+        return
+    cursor.execute("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND NOT i.indisvalid
+    """, (encontrado.group(1),))
+    if cursor.fetchone():
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {encontrado.group(1)}")
+
+
+def _aplicar(conn, versao, nome, caminho):
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        sql = arquivo.read()
+
+    cursor = conn.cursor()
+    try:
+        if sql.lstrip().startswith(MARCADOR_SEM_TRANSACAO):
+            for instrucao in instrucoes(sql):
+                _remover_indice_invalido(cursor, instrucao)
+                cursor.execute(instrucao)
+            cursor.execute("INSERT INTO schema_version (versao, nome) VALUES (%s, %s)", (versao, nome))
+        else:
+            conn.autocommit = False
+            try:
+                cursor.execute(sql)
+                cursor.execute("INSERT INTO schema_version (versao, nome) VALUES (%s, %s)", (versao, nome))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+    finally:
+        cursor.close()
+
+
+def upgrade(conn, diretorio=DIRETORIO_MIGRACOES, saida=print):
+    """
+    Aplica, em ordem, as migrações ainda não registradas em schema_version.
+    Seguro para execução simultânea (ex.: vários containers iniciando juntos).
+    :return: lista das versões aplicadas
+    """
+    conn.autocommit = True
+    cursor = conn.cursor()
+    aplicadas = []
+    try:
+        _preparar_schema_version(cursor)
+        cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_MIGRACOES,))
+        try:
+            existentes = versoes_aplicadas(cursor)
+            for versao, nome, caminho in listar_migracoes(diretorio):
+                if versao in existentes:
+                    continue
+                saida(f"Aplicando migração {versao:04d}_{nome}")
+                _aplicar(conn, versao, nome, caminho)
+                aplicadas.append(versao)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_MIGRACOES,))
+    finally:
+        cursor.close()
+    return aplicadas
+
+
+def status(conn, diretorio=DIRETORIO_MIGRACOES):
+    """:return: lista de (versao, nome, aplicada)"""
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        _preparar_schema_version(cursor)
+        existentes = versoes_aplicadas(cursor)
+    finally:
+        cursor.close()
+    return [(versao, nome, versao in existentes) for versao, nome, _ in listar_migracoes(diretorio)]
@@ -0,0 +1,144 @@
+import json
+import os
+import select
+import threading
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from . import bd, cache, tokens
+
+# Invalidação dos caches entre workers. Os triggers da migração
+# 0010_notificacoes_por_comando publicam no canal abaixo cada comando que
+# altera professor, turma, aluno ou atividade, com os ids das linhas, e o da
+# 0006 cada token revogado. Cada processo da API mantém uma thread com uma
+# conexão dedicada (fora do pool) em LISTEN, que invalida os caches afetados
+# assim que o commit acontece, em qualquer worker.
+
+CANAL = 'escola_alteracoes'
+
+# Intervalo máximo de espera no select, para a thread perceber o pedido de parada
+INTERVALO_ESPERA = 5.0
+# Espera entre tentativas de reconexão (dobra a cada falha até o máximo)
+ESPERA_RECONEXAO_MIN = 1.0
+ESPERA_RECONEXAO_MAX = 30.0
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def processar(payload):
+    """
+    Trata uma notificação do canal: {"tabela": ..., "operacao": ..., "ids": [...]}
+    das tabelas da escola, ou {"tabela": "token_revogado", "id": jti, ...}.
+    """
+    try:
+        notificacao = json.loads(payload)
+        tabela = notificacao['tabela']
+    except (ValueError, KeyError, TypeError):
+        # Payload desconhecido: invalidar tudo é sempre seguro
+        cache.invalidar_todos()
+        return
+    if tabela == 'token_revogado':
+        tokens.revogar_local(notificacao.get('id'))
+        return
+    cache.invalidar_tabela(tabela)
+
+
+class Listener(threading.Thread):
+    """Thread que escuta o canal de alterações e invalida os caches do processo."""
+
+    def __init__(self):
+        super().__init__(name='escola-notificacoes', daemon=True)
+        self._parar = threading.Event()
+        self.conectado = threading.Event()
+        self.conn = None
+
+    def _conectar(self):
+        conn = psycopg2.connect(**bd._connection_params())
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        cursor.execute(f"LISTEN {CANAL}")
+        cursor.close()
+        return conn
+
+    def _carregar_revogados(self):
+        try:
+            tokens.carregar_revogados(self.conn)
+        except psycopg2.ProgrammingError as e:
+            # Migração 0006 ainda não aplicada
+            print(f"Lista de tokens revogados indisponível: '{e}'")
+
+    def _escutar(self):
+        while not self._parar.is_set():
+            if select.select([self.conn], [], [], INTERVALO_ESPERA) == ([], [], []):
+                continue
+            self.conn.poll()
+            while self.conn.notifies:
+                processar(self.conn.notifies.pop(0).payload)
+
+    def run(self):
+        espera = ESPERA_RECONEXAO_MIN
+        while not self._parar.is_set():
+            try:
+                self.conn = self._conectar()
+                # Alterações feitas enquanto estávamos desconectados não foram recebidas
+                cache.invalidar_todos()
+                self._carregar_revogados()
+                self.conectado.set()
+                espera = ESPERA_RECONEXAO_MIN
+                self._escutar()
+            except (psycopg2.Error, OSError) as e:
+                print(f"Listener de notificações desconectado: '{e}'")
+            finally:
+                self.conectado.clear()
+                tokens.dessincronizar()
+                if self.conn is not None:
+                    try:
+                        self.conn.close()
+                    except psycopg2.Error:
+                        pass
+                    self.conn = None
+            self._parar.wait(espera)
+            espera = min(espera * 2, ESPERA_RECONEXAO_MAX)
+
+    def parar(self):
+        self._parar.set()
+
+
+def iniciar():
+    """
+    Inicia o listener do processo atual, se ainda não estiver rodando.
+    Após um fork (workers do servidor WSGI) a thread do processo pai não
+    existe no filho, então um novo listener é criado.
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return _listener
+    with _listener_lock:
+        if _listener is None or _listener_pid != os.getpid():
+            _listener = Listener()
+            _listener.start()
+            _listener_pid = os.getpid()
+    return _listener
+
+
+def parar():
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.parar()
+    _listener = None
+
+
+def init_app(app):
+    """
+    Inicia o listener na primeira requisição de cada worker (e não na criação
+    do app, que pode acontecer no processo mestre antes do fork).
+    Desativado em testes ou com cache_notificacoes: false em paramsBD.yml.
+    """
+    if app.config.get('TESTING') or not bd.config.get('cache_notificacoes', True):
+        return
+
+    def _garantir_listener():
+        iniciar()
+
+    app.before_request(_garantir_listener)
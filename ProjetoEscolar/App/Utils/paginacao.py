@@ -0,0 +1,242 @@
+import base64
+import json
+from urllib.parse import urlencode
+from flask import Response, request, jsonify
+from . import bd
+
+# Paginação por chave (keyset): o cursor guarda os valores da ordenação da
+# última linha entregue, e a próxima página começa logo após eles. Ao contrário
+# de OFFSET, o custo de cada página não cresce com a posição na listagem.
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+# Mudança de contrato: antes da paginação as listagens devolviam todos os
+# registros. Vai na descrição do swagger de cada listagem.
+AVISO_PAGINACAO = (f'Atenção: sem limit a resposta traz só os primeiros {LIMITE_PADRAO} registros '
+                   '(antes trazia todos); siga o cabeçalho X-Next-Cursor para as páginas seguintes.')
+
+PARAMETROS_PAGINACAO = [
+    {
+        'name': 'limit',
+        'in': 'query',
+        'type': 'integer',
+        'required': False,
+        'description': f'Quantidade máxima de registros por página (padrão {LIMITE_PADRAO}, máximo {LIMITE_MAXIMO})'
+    },
+    {
+        'name': 'cursor',
+        'in': 'query',
+        'type': 'string',
+        'required': False,
+        'description': 'Cursor retornado no cabeçalho X-Next-Cursor da página anterior'
+    }
+]
+
+# Busca em lote (ids=1,2,3): no máximo MAXIMO_IDS por requisição, em uma consulta
+MAXIMO_IDS = 500
+
+PARAMETRO_IDS = {
+    'name': 'ids',
+    'in': 'query',
+    'type': 'string',
+    'required': False,
+    'description': f'IDs separados por vírgula (até {MAXIMO_IDS}): devolve só esses registros, na ordem pedida e sem '
+                   'paginação; os IDs inexistentes vêm no cabeçalho X-Missing-Ids'
+}
+
+CABECALHOS_PAGINACAO = {
+    'X-Next-Cursor': {
+        'type': 'string',
+        'description': 'Cursor da próxima página (ausente na última página)'
+    }
+}
+
+
+def codificar_cursor(chave):
+    """Transforma os valores da chave de ordenação em um token opaco."""
+    bruto = json.dumps(list(chave), default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token, tamanho):
+    """Recupera os valores da chave de ordenação a partir do token."""
+    try:
+        bruto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        chave = json.loads(bruto.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(chave, list) or len(chave) != tamanho:
+        raise ValueError("Cursor inválido")
+    return chave
+
+
+def ler_paginacao(tamanho_chave):
+    """
+    Lê limit e cursor da query string.
+    :return: (limite, chave) onde chave é None na primeira página
+    """
+    limite = request.args.get('limit', LIMITE_PADRAO)
+    try:
+        limite = int(limite)
+    except (TypeError, ValueError):
+        raise ValueError("O parâmetro limit deve ser um número inteiro")
+    if limite < 1:
+        raise ValueError("O parâmetro limit deve ser maior que zero")
+    limite = min(limite, LIMITE_MAXIMO)
+
+    token = request.args.get('cursor')
+    chave = decodificar_cursor(token, tamanho_chave) if token else None
+    return limite, chave
+
+
+def ler_ids():
+    """
+    Lê o parâmetro ids da busca em lote, ex.: ids=3,1,2.
+    :return: IDs sem repetição na ordem pedida, ou None quando ids não é informado
+    """
+    valor = request.args.get('ids')
+    if valor is None:
+        return None
+    try:
+        ids = [int(item) for item in valor.split(',') if item.strip()]
+    except ValueError:
+        raise ValueError("O parâmetro ids deve ser uma lista de inteiros separados por vírgula")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError("O parâmetro ids deve ter ao menos um ID")
+    if len(ids) > MAXIMO_IDS:
+        raise ValueError(f"O parâmetro ids aceita no máximo {MAXIMO_IDS} IDs")
+    return ids
+
+
+def resposta_lote(cursor, query, ids, converter, completar=None):
+    """
+    Busca em lote com uma única consulta, em vez de um GET por ID.
+    :param query: consulta com "= ANY(%s)" sobre a chave, que deve ser a primeira coluna
+    :param converter: função que transforma uma linha no dicionário da resposta
+    :param completar: função opcional chamada com os registros antes da resposta
+                      (ex.: relações do include=, Utils/inclusoes.py)
+    :return: resposta JSON com os registros na ordem de ids; os IDs sem registro
+             vão no cabeçalho X-Missing-Ids
+    """
+    cursor.execute(query, (ids,))
+    por_id = {linha[0]: linha for linha in cursor.fetchall()}
+    registros = [converter(por_id[id_]) for id_ in ids if id_ in por_id]
+    if completar:
+        completar(registros)
+    resposta = jsonify(registros)
+    faltando = [str(id_) for id_ in ids if id_ not in por_id]
+    if faltando:
+        resposta.headers['X-Missing-Ids'] = ','.join(faltando)
+    return resposta
+
+
+def ler_ordenacao(permitidas, padrao):
+    """
+    Lê o parâmetro sort: uma das colunas permitidas, com '-' na frente para
+    ordem decrescente (ex.: sort=-valor_pago).
+    :param padrao: valor usado quando sort não é informado
+    :return: (coluna, descendente)
+    """
+    valor = request.args.get('sort') or padrao
+    coluna = valor[1:] if valor.startswith('-') else valor
+    if coluna not in permitidas:
+        raise ValueError(f"O parâmetro sort aceita: {', '.join(permitidas)} (com '-' para ordem decrescente)")
+    return coluna, valor.startswith('-')
+
+
+def ler_campos(disponiveis):
+    """
+    Lê o parâmetro fields (projeção), ex.: fields=id_pagamento,valor_pago.
+    :return: campos pedidos na ordem de disponiveis; todos quando fields não é informado
+    """
+    valor = request.args.get('fields')
+    if valor is None:
+        return list(disponiveis)
+    pedidos = {campo.strip() for campo in valor.split(',') if campo.strip()}
+    if not pedidos:
+        raise ValueError("O parâmetro fields deve listar ao menos um campo")
+    desconhecidos = sorted(pedidos - set(disponiveis))
+    if desconhecidos:
+        raise ValueError(f"Campos desconhecidos em fields: {', '.join(desconhecidos)}")
+    return [campo for campo in disponiveis if campo in pedidos]
+
+
+def filtro_keyset(colunas, chave, descendente=False):
+    """
+    Monta a condição que posiciona a consulta logo após a chave do cursor,
+    ex.: (data_presenca, id_presenca) < (%s, %s) para ordenação decrescente.
+    """
+    operador = '<' if descendente else '>'
+    marcadores = ', '.join(['%s'] * len(colunas))
+    return f"({', '.join(colunas)}) {operador} ({marcadores})", list(chave)
+
+
+def ordenacao(colunas, descendente=False):
+    direcao = ' DESC' if descendente else ''
+    return " ORDER BY " + ', '.join(coluna + direcao for coluna in colunas)
+
+
+def fatiar_pagina(linhas, limite, extrair_chave):
+    """
+    Recebe até limite + 1 linhas e separa a página do indicador de continuação.
+    :return: (linhas da página, cursor da próxima página ou None)
+    """
+    if len(linhas) <= limite:
+        return linhas, None
+    linhas = linhas[:limite]
+    return linhas, codificar_cursor(extrair_chave(linhas[-1]))
+
+
+def json_no_banco():
+    """Se as maiores listagens devem ter o JSON montado pelo Postgres (listagens_json_banco)."""
+    return bool(bd.config.get('listagens_json_banco', False))
+
+
+def pagina_json(cursor, query, valores, campos, chave_ordem, limite, descendente=False):
+    """
+    Executa a consulta da página (com LIMIT limite + 1) e deixa o Postgres
+    montar o JSON da lista com json_agg, já codificado em UTF-8.
+    :param campos: {nome no JSON: expressão SQL sobre as colunas da consulta}
+    :return: (corpo JSON em bytes, cursor da próxima página ou None)
+    """
+    objeto = ', '.join(f"'{nome}', {expressao}" for nome, expressao in sorted(campos.items()))
+    cursor.execute(
+        f"""
+        SELECT convert_to(COALESCE(json_agg(json_build_object({objeto}) ORDER BY n)
+                                   FILTER (WHERE n <= %s), '[]')::text, 'UTF8'),
+               (array_agg(json_build_array({', '.join(chave_ordem)})) FILTER (WHERE n = %s AND total > %s))[1]
+        FROM (
+            SELECT q.*, row_number() OVER ({ordenacao(chave_ordem, descendente).strip()}) AS n,
+                   count(*) OVER () AS total
+            FROM ({query}) q
+        ) pagina
+        """,
+        # Os marcadores externos vêm antes dos da consulta interna no texto
+        (limite, limite, limite) + tuple(valores)
+    )
+    corpo, chave = cursor.fetchone()
+    return bytes(corpo), codificar_cursor(chave) if chave else None
+
+
+def resposta_paginada(result, proximo):
+    """
+    Resposta JSON da página com o cursor seguinte nos cabeçalhos.
+    result pode ser a lista de registros ou o JSON já codificado (pagina_json).
+    """
+    if isinstance(result, bytes):
+        resposta = Response(result, mimetype='application/json')
+    else:
+        resposta = jsonify(result)
+    if proximo:
+        cabecalhos_proxima(resposta, proximo)
+    return resposta
+
+
+def cabecalhos_proxima(resposta, proximo):
+    """X-Next-Cursor e Link rel="next" da requisição atual apontando para a próxima página."""
+    resposta.headers['X-Next-Cursor'] = proximo
+    args = request.args.to_dict()
+    args['cursor'] = proximo
+    resposta.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from flask import jsonify
+from . import bd
+
+# Hash e verificação de senhas com bcrypt fora da thread da requisição.
+# Cada verificação custa centenas de milissegundos de CPU; elas rodam em um
+# pool de processos limitado (bcrypt_workers) e no máximo bcrypt_fila_max
+# operações podem estar em andamento ou na fila por processo da API. Acima
+# disso a requisição é recusada na hora com 503 + Retry-After, em vez de
+# acumular e atrasar todas as outras rotas.
+#
+# Com bcrypt_workers: 0 o hash roda na própria thread (ainda com o limite).
+
+
+class Sobrecarga(Exception):
+    """Fila de operações de senha cheia."""
+
+
+def rounds_configurado():
+    """Fator de trabalho do bcrypt (bcrypt_rounds em paramsBD.yml)."""
+    return int(bd.config.get('bcrypt_rounds', 12))
+
+
+def custo(hash_senha):
+    """Fator de trabalho de um hash no formato $2b$12$..., ou None se inválido."""
+    try:
+        return int(hash_senha.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+# Funções executadas nos processos do pool (precisam estar no nível do módulo)
+
+def _gerar_hash(senha, rounds):
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verificar(senha, hash_senha, rounds):
+    if not bcrypt.checkpw(senha.encode('utf-8'), hash_senha.encode('utf-8')):
+        return False, None
+    if custo(hash_senha) != rounds:
+        # Senha correta com fator antigo: aproveita a senha em claro para gerar o novo hash
+        return True, _gerar_hash(senha, rounds)
+    return True, None
+
+
+_executor = None
+_vagas = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _obter_executor():
+    """
+    Retorna (executor, vagas) do processo atual, criando-os na primeira chamada.
+    Após um fork (workers do servidor WSGI) um novo pool é criado. Os processos
+    do pool usam spawn, pois o fork de um processo com threads não é seguro.
+    """
+    global _executor, _vagas, _executor_pid
+    if _vagas is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _vagas is None or _executor_pid != os.getpid():
+                workers = int(bd.config.get('bcrypt_workers', 2))
+                _executor = None
+                if workers > 0:
+                    _executor = ProcessPoolExecutor(
+                        max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+                _vagas = threading.BoundedSemaphore(int(bd.config.get('bcrypt_fila_max', 16)))
+                _executor_pid = os.getpid()
+    return _executor, _vagas
+
+
+def _executar(funcao, *args):
+    global _executor_pid
+    executor, vagas = _obter_executor()
+    if not vagas.acquire(blocking=False):
+        raise Sobrecarga("Muitas operações de senha em andamento")
+    try:
+        if executor is None:
+            return funcao(*args)
+        return executor.submit(funcao, *args).result()
+    except BrokenProcessPool:
+        # Um processo do pool morreu: a próxima chamada cria um pool novo
+        with _executor_lock:
+            if _executor is executor:
+                _executor_pid = None
+        executor.shutdown(wait=False)
+        raise
+    finally:
+        vagas.release()
+
+
+def gerar_hash(senha):
+    """Gera o hash bcrypt da senha com o fator configurado."""
+    return _executar(_gerar_hash, senha, rounds_configurado())
+
+
+def verificar(senha, hash_senha):
+    """
+    Verifica a senha contra o hash salvo.
+    :return: (senha_correta, novo_hash) onde novo_hash só é preenchido quando
+             o hash salvo usa um fator diferente do configurado
+    """
+    return _executar(_verificar, senha, hash_senha, rounds_configurado())
+
+
+def resposta_sobrecarga():
+    resposta = jsonify({"error": "Servidor ocupado, tente novamente em instantes"})
+    resposta.headers['Retry-After'] = str(bd.config.get('bcrypt_retry_after', 1))
+    return resposta, 503
@@ -0,0 +1,70 @@
+import datetime
+import decimal
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Serialização JSON da API (app.json, usado por jsonify e request.get_json).
+# Datas saem no formato ISO (AAAA-MM-DD) e Decimal como número, então os
+# handlers entregam os valores do banco como vieram, sem conversão campo a
+# campo. Com o orjson instalado a codificação é feita em C; sem ele, vale o
+# json da biblioteca padrão com as mesmas regras.
+#
+# As chaves continuam ordenadas (sort_keys, padrão do Flask), então a saída é
+# a mesma de antes, exceto pelas datas, que o provedor padrão do Flask emitia
+# no formato de cabeçalho HTTP ("Mon, 15 Jan 2024 00:00:00 GMT").
+
+
+def padrao(valor):
+    """Tipos que o codificador não conhece nativamente."""
+    if isinstance(valor, decimal.Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    # dataclasses, UUID e objetos com __html__, como no provedor padrão
+    return DefaultJSONProvider.default(valor)
+
+
+def dumps_bytes(obj, ordenar=False):
+    """JSON compacto em bytes UTF-8 (ex.: linhas NDJSON da exportação)."""
+    if orjson is None:
+        return json.dumps(obj, default=padrao, ensure_ascii=False, separators=(',', ':'),
+                          sort_keys=ordenar).encode('utf-8')
+    return orjson.dumps(obj, default=padrao, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if ordenar else 0))
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Provedor JSON do app: orjson quando disponível, mesmas regras de tipos nos dois casos."""
+
+    default = staticmethod(padrao)
+
+    def _opcoes(self, indentar=False):
+        opcoes = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if indentar:
+            opcoes |= orjson.OPT_INDENT_2
+        return opcoes
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=padrao, option=self._opcoes()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # Indentado no modo debug, como o provedor padrão
+        indentar = self.compact is False or (self.compact is None and self._app.debug)
+        corpo = orjson.dumps(obj, default=padrao, option=self._opcoes(indentar))
+        return self._app.response_class(corpo + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,230 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from functools import wraps
+import psycopg2
+from flask import current_app, g, jsonify, request
+from . import bd
+
+# Tokens de sessão assinados com HMAC-SHA256 (SECRET_KEY do app), emitidos no
+# /login. O token de acesso vale token_acesso_ttl segundos e é verificado em
+# cada requisição só com a chave e o relógio, sem consultar o banco; o token
+# de refresh (token_refresh_ttl) gera novos tokens de acesso em /token/refresh.
+#
+# Formato: base64url(payload JSON).base64url(assinatura)
+#
+# Tokens revogados (/logout) ficam na tabela token_revogado; cada processo
+# mantém os identificadores (jti) em memória, atualizados pelo listener de
+# notificações (Utils/notificacoes.py) quando qualquer worker revoga um token.
+# Enquanto o listener do processo não estiver conectado com a lista carregada
+# (worker recém-iniciado, reconexão ou cache_notificacoes: false), a revogação
+# é conferida direto na tabela; sem banco, o token é recusado.
+
+# Rotas de autenticação (/login, /token/refresh, /logout) usam @token_opcional:
+# um token de acesso expirado ou inválido no cabeçalho não as bloqueia, senão
+# o cliente que continua enviando o token antigo nunca consegue renová-lo.
+
+# Chaves de exemplo que nunca assinam tokens
+CHAVES_INSEGURAS = {'dev'}
+
+ACESSO = 'acesso'
+REFRESH = 'refresh'
+
+
+class TokenInvalido(Exception):
+    """Token malformado, com assinatura inválida, expirado ou revogado."""
+
+
+class RevogacaoIndisponivel(TokenInvalido):
+    """Não foi possível conferir se o token foi revogado (banco indisponível)."""
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).decode('ascii').rstrip('=')
+
+
+def _b64_decodificar(texto):
+    return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+
+def _assinar(mensagem):
+    chave = current_app.config.get('SECRET_KEY')
+    if not chave:
+        raise RuntimeError("SECRET_KEY não configurada: necessária para assinar os tokens")
+    if chave in CHAVES_INSEGURAS:
+        raise RuntimeError("SECRET_KEY de exemplo: defina uma chave própria para assinar os tokens")
+    chave = chave.encode('utf-8') if isinstance(chave, str) else chave
+    return hmac.new(chave, mensagem, hashlib.sha256).digest()
+
+
+def ttl(tipo):
+    if tipo == ACESSO:
+        return int(bd.config.get('token_acesso_ttl', 900))
+    return int(bd.config.get('token_refresh_ttl', 7 * 24 * 3600))
+
+
+def emitir(usuario, tipo):
+    """
+    Emite um token para o usuário {'id_usuario', 'login', 'nivel_acesso'}.
+    :return: token em texto
+    """
+    agora = int(time.time())
+    payload = {
+        'sub': usuario['id_usuario'],
+        'login': usuario['login'],
+        'nivel_acesso': usuario['nivel_acesso'],
+        'tipo': tipo,
+        'iat': agora,
+        'exp': agora + ttl(tipo),
+        'jti': secrets.token_urlsafe(12),
+    }
+    corpo = _b64(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    return corpo + '.' + _b64(_assinar(corpo.encode('ascii')))
+
+
+def verificar(token, tipo):
+    """
+    Confere assinatura, tipo, validade e revogação do token.
+    :return: payload do token
+    """
+    try:
+        corpo, assinatura = token.split('.')
+        assinatura_ok = hmac.compare_digest(_b64_decodificar(assinatura), _assinar(corpo.encode('ascii')))
+    except (ValueError, UnicodeEncodeError):
+        raise TokenInvalido("Token malformado")
+    if not assinatura_ok:
+        raise TokenInvalido("Assinatura inválida")
+    try:
+        payload = json.loads(_b64_decodificar(corpo))
+    except ValueError:
+        raise TokenInvalido("Token malformado")
+    if not isinstance(payload, dict):
+        raise TokenInvalido("Token malformado")
+    if payload.get('tipo') != tipo:
+        raise TokenInvalido("Tipo de token incorreto")
+    if payload.get('exp', 0) <= time.time():
+        raise TokenInvalido("Token expirado")
+    if revogado(payload.get('jti')):
+        raise TokenInvalido("Token revogado")
+    return payload
+
+
+def resposta_tokens(usuario):
+    """Campos de tokens incluídos nas respostas de /login e /token/refresh."""
+    return {
+        "access_token": emitir(usuario, ACESSO),
+        "refresh_token": emitir(usuario, REFRESH),
+        "token_type": "Bearer",
+        "expires_in": ttl(ACESSO),
+    }
+
+
+# Lista de revogação em memória: jti -> instante de expiração do token
+
+_revogados = {}
+_revogados_lock = threading.Lock()
+# Processo em que a lista acompanha o banco (carregada com o LISTEN ativo)
+_sincronizada_pid = None
+
+
+def revogar_local(jti, exp=None):
+    """Marca o jti como revogado neste processo."""
+    agora = time.time()
+    with _revogados_lock:
+        _revogados[jti] = exp if exp is not None else agora + ttl(REFRESH)
+        for chave in [chave for chave, expira in _revogados.items() if expira <= agora]:
+            del _revogados[chave]
+
+
+def sincronizada():
+    return _sincronizada_pid == os.getpid()
+
+
+def revogado(jti):
+    """
+    Confere a lista em memória e, se ela ainda não acompanha o banco neste
+    processo, a tabela token_revogado.
+    :raises RevogacaoIndisponivel: lista não sincronizada e banco indisponível
+    """
+    if jti in _revogados:
+        return True
+    if sincronizada():
+        return False
+    return _revogado_no_banco(jti)
+
+
+def _revogado_no_banco(jti):
+    conn = bd.get_connection()
+    if conn is None:
+        raise RevogacaoIndisponivel("Não foi possível verificar a revogação do token")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM token_revogado WHERE jti = %s AND expira_em > now()", (jti,))
+        return cursor.fetchone() is not None
+    except psycopg2.Error:
+        conn.rollback()
+        raise RevogacaoIndisponivel("Não foi possível verificar a revogação do token")
+    finally:
+        cursor.close()
+
+
+def carregar_revogados(conn):
+    """
+    Recarrega a lista a partir da tabela token_revogado (tokens ainda não
+    expirados). conn já deve estar em LISTEN: a partir daqui as revogações
+    chegam por notificação e a lista passa a valer sem consultar o banco.
+    """
+    global _sincronizada_pid
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT jti, EXTRACT(EPOCH FROM expira_em) FROM token_revogado WHERE expira_em > now()")
+        linhas = cursor.fetchall()
+    finally:
+        cursor.close()
+    with _revogados_lock:
+        _revogados.clear()
+        _revogados.update({jti: float(expira) for jti, expira in linhas})
+    _sincronizada_pid = os.getpid()
+
+
+def dessincronizar():
+    """Listener desconectado: revogações de outros workers deixam de chegar."""
+    global _sincronizada_pid
+    _sincronizada_pid = None
+
+
+def token_opcional(funcao):
+    """Decorador para rotas que seguem sem g.usuario quando o token de acesso é inválido (coloque abaixo do @app.route)."""
+    @wraps(funcao)
+    def wrapper(*args, **kwargs):
+        return funcao(*args, **kwargs)
+    wrapper.token_opcional = True
+    return wrapper
+
+
+def _autenticar():
+    # Sem cabeçalho Authorization a requisição segue anônima; com um token de
+    # acesso válido, o usuário fica disponível em g.usuario para os handlers
+    cabecalho = request.headers.get('Authorization', '')
+    if not cabecalho.startswith('Bearer '):
+        return None
+    try:
+        g.usuario = verificar(cabecalho[len('Bearer '):].strip(), ACESSO)
+    except TokenInvalido as e:
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, 'token_opcional', False):
+            return None
+        if isinstance(e, RevogacaoIndisponivel):
+            return jsonify({"error": str(e)}), 503
+        return jsonify({"error": str(e)}), 401
+    return None
+
+
+def init_app(app):
+    """Registra a verificação do token de acesso em cada requisição."""
+    app.before_request(_autenticar)
@@ -1,13 +1,23 @@
 # Arquivo __init__.py para tornar a pasta app um pacote Python.
-from flask import Flask
+import os
+from flask import Flask, jsonify
 from flasgger import Swagger
+from .Utils import bd, cache, compressao, metricas, notificacoes, tokens
+from .Utils.serializacao import ProvedorJSON
 
 def create_app(teste_config=None):
     app = Flask(__name__)
+    
+    # JSON das respostas com orjson, datas ISO e Decimal como número
+    app.json = ProvedorJSON(app)
 
     if teste_config is None:
+        # Também assina os tokens de sessão: sem uma chave própria a API não sobe
+        secret_key = os.environ.get('SECRET_KEY')
+        if not secret_key or secret_key in tokens.CHAVES_INSEGURAS:
+            raise RuntimeError("Defina a variável de ambiente SECRET_KEY com uma chave própria")
         app.config.from_mapping(
-            SECRET_KEY='dev',
+            SECRET_KEY=secret_key,
             DATABASE='escola'
         )
     else:
@@ -45,6 +55,32 @@ def create_app(teste_config=None):
     def home():
         return "API feita para o gerenciamento de uma escola infantil, a documentação se encontra no seguinte link http://localhost:5000/docs/"
     
+    # Estatísticas do pool de conexões para monitoramento
+    @app.route('/pool/stats')
+    def pool_stats():
+        return jsonify(bd.pool_stats() or {}), 200
+    
+    # Acertos e falhas dos caches de dados de referência
+    @app.route('/cache/stats')
+    def cache_stats():
+        return jsonify(cache.stats()), 200
+    
+    # Compressão gzip/brotli das respostas; registrada primeiro para rodar
+    # depois de todos os outros hooks after_request
+    compressao.init_app(app)
+    
+    # Conexões do pool são devolvidas no teardown de cada requisição
+    bd.init_app(app)
+    
+    # Tokens de sessão assinados (emitidos no /login) verificados em cada requisição
+    tokens.init_app(app)
+    
+    # Invalidação dos caches entre workers via LISTEN/NOTIFY do Postgres
+    notificacoes.init_app(app)
+    
+    # Métricas Prometheus da API em /metrics
+    metricas.init_app(app)
+    
     # Registrar blueprints
     def register_blueprints(app):
         try:
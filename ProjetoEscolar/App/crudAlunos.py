@@ -1,9 +1,87 @@
+import psycopg2
 from flask import Blueprint, request, jsonify
-from .Utils.bd import create_connection
+from .Utils.bd import get_connection
+from .Utils.condicional import get_condicional
+from .Utils.escrita import resposta_integridade, campos_patch, atualizar_parcial
+from .Utils.importacao import importar_csv, arquivo_importacao
+from .Utils.paginacao import (AVISO_PAGINACAO, PARAMETROS_PAGINACAO, CABECALHOS_PAGINACAO, ler_paginacao,
+                              PARAMETRO_IDS, ler_ids, resposta_lote,
+                              filtro_keyset, ordenacao, fatiar_pagina, resposta_paginada,
+                              json_no_banco, pagina_json)
+from .Utils.exportacao import TIPOS_EXPORTACAO, formato_exportacao, resposta_exportacao
+from .Utils.inclusoes import parametro_include, ler_inclusoes, carregar, aninhar
+from .crudPagamentos import pagamento_para_dict
+from .crudPresencas import presenca_para_dict
 from flasgger import swag_from
 
 app = Blueprint('crud_alunos_app', __name__)
 
+COLUNAS_ALUNO = ['aluno_id', 'nome', 'data_nascimento', 'id_turma', 'nome_responsavel',
+                 'telefone_responsavel', 'email_responsavel', 'informacoes_adicionais']
+
+# Colunas da tabela aluno que o PATCH pode alterar, na ordem de COLUNAS_ALUNO
+EDITAVEIS_ALUNO = ['nome_completo', 'data_nascimento', 'id_turma', 'nome_responsavel',
+                   'telefone_responsavel', 'email_responsavel', 'informacoes_adicionais']
+
+# Restrições da tabela aluno -> resposta das rotas de escrita (Utils/escrita.py)
+ERROS_ALUNO = {
+    'aluno_id_turma_fkey': ("Turma não encontrada", 404),
+}
+
+def aluno_para_dict(aluno):
+    # Datas são serializadas pelo provedor JSON do app (Utils/serializacao.py)
+    return dict(zip(COLUNAS_ALUNO, aluno))
+
+# Mesmos campos de aluno_para_dict, montados pelo Postgres (listagens_json_banco)
+CAMPOS_JSON_ALUNO = {
+    'aluno_id': 'id_aluno',
+    'nome': 'nome_completo',
+    'data_nascimento': "to_char(data_nascimento, 'YYYY-MM-DD')",
+    'id_turma': 'id_turma',
+    'nome_responsavel': 'nome_responsavel',
+    'telefone_responsavel': 'telefone_responsavel',
+    'email_responsavel': 'email_responsavel',
+    'informacoes_adicionais': 'informacoes_adicionais',
+}
+
+# Relações aceitas em include= no GET /alunos/<id>, e as tabelas de cada uma (ETag)
+INCLUSOES_ALUNO = ['turma', 'presencas', 'pagamentos', 'atividades']
+TABELAS_INCLUSOES_ALUNO = {
+    'turma': ('turma',),
+    'presencas': ('presenca',),
+    'pagamentos': ('pagamento',),
+    'atividades': ('atividade_aluno', 'atividade'),
+}
+
+COLUNAS_TURMA_DO_ALUNO = ['id_turma', 'nome_turma', 'id_professor', 'horario']
+COLUNAS_ATIVIDADE_DO_ALUNO = ['id_atividade', 'descricao', 'data_realizacao', 'desempenho', 'observacoes']
+
+def incluir_relacoes_alunos(cursor, alunos, inclusoes):
+    """Embute nos alunos as relações pedidas em include=, com uma consulta por relação."""
+    ids = [aluno['aluno_id'] for aluno in alunos]
+    if 'turma' in inclusoes:
+        turmas = carregar(cursor, f"SELECT {', '.join(COLUNAS_TURMA_DO_ALUNO)} FROM turma WHERE id_turma = ANY(%s)",
+                          [aluno['id_turma'] for aluno in alunos],
+                          lambda turma: dict(zip(COLUNAS_TURMA_DO_ALUNO, turma)))
+        aninhar(alunos, 'turma', 'id_turma', turmas, unico=True)
+    if 'presencas' in inclusoes:
+        presencas = carregar(cursor, "SELECT * FROM presenca WHERE id_aluno = ANY(%s) ORDER BY data_presenca DESC, id_presenca DESC",
+                             ids, presenca_para_dict, posicao_chave=1)
+        aninhar(alunos, 'presencas', 'aluno_id', presencas)
+    if 'pagamentos' in inclusoes:
+        pagamentos = carregar(cursor, "SELECT * FROM pagamento WHERE id_aluno = ANY(%s) ORDER BY data_pagamento DESC, id_pagamento DESC",
+                              ids, pagamento_para_dict, posicao_chave=1)
+        aninhar(alunos, 'pagamentos', 'aluno_id', pagamentos)
+    if 'atividades' in inclusoes:
+        atividades = carregar(cursor, """
+            SELECT aa.id_aluno, a.id_atividade, a.descricao, a.data_realizacao, aa.desempenho, aa.observacoes
+            FROM atividade_aluno aa
+            JOIN atividade a ON a.id_atividade = aa.id_atividade
+            WHERE aa.id_aluno = ANY(%s)
+            ORDER BY a.data_realizacao DESC, a.id_atividade
+        """, ids, lambda atividade: dict(zip(COLUNAS_ATIVIDADE_DO_ALUNO, atividade[1:])))
+        aninhar(alunos, 'atividades', 'aluno_id', atividades)
+
 @app.route('/alunos', methods=['POST'])
 @swag_from({
     'tags': ['Alunos'],
@@ -48,7 +126,7 @@ def create_aluno():
     if not data or 'nome_completo' not in data:
         return jsonify({"error": "O campo nome_completo é obrigatório"}), 400
     
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -72,7 +150,6 @@ def create_aluno():
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/alunos/<string:aluno_id>', methods=['GET'])
 @swag_from({
@@ -83,7 +160,7 @@ def create_aluno():
         'in': 'path',
         'required': True,
         'type': 'string'
-    }],
+    }, parametro_include(INCLUSOES_ALUNO)],
     'responses': {
         200: {
             'description': 'Dados do aluno',
@@ -105,8 +182,14 @@ def create_aluno():
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('aluno', inclusoes=TABELAS_INCLUSOES_ALUNO)
 def read_aluno(aluno_id):
-    conn = create_connection()
+    try:
+        inclusoes = ler_inclusoes(INCLUSOES_ALUNO)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -117,36 +200,25 @@ def read_aluno(aluno_id):
         if aluno is None:
             return jsonify({"error": "Aluno não encontrado"}), 404
         
-        # Convertendo objetos não serializáveis (como datetime) para string
-        data_nascimento = aluno[2]
-        if data_nascimento:
-            data_nascimento = data_nascimento.strftime('%Y-%m-%d')
-            
-        result = {
-            "aluno_id": aluno[0],
-            "nome": aluno[1],
-            "data_nascimento": data_nascimento,
-            "id_turma": aluno[3],
-            "nome_responsavel": aluno[4],
-            "telefone_responsavel": aluno[5],
-            "email_responsavel": aluno[6],
-            "informacoes_adicionais": aluno[7]
-        }
-        
+        result = aluno_para_dict(aluno)
+        if inclusoes:
+            incluir_relacoes_alunos(cursor, [result], inclusoes)
         return jsonify(result), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/alunos', methods=['GET'])
 @swag_from({
     'tags': ['Alunos'],
-    'description': 'Lista todos os alunos cadastrados.',
+    'description': 'Lista os alunos cadastrados, paginados por nome. Com Accept application/x-ndjson ou text/csv, exporta todos os alunos em streaming. ' + AVISO_PAGINACAO,
+    'produces': TIPOS_EXPORTACAO,
+    'parameters': [PARAMETRO_IDS] + PARAMETROS_PAGINACAO,
     'responses': {
         200: {
             'description': 'Lista de alunos',
+            'headers': CABECALHOS_PAGINACAO,
             'schema': {
                 'type': 'array',
                 'items': {
@@ -167,40 +239,53 @@ def read_aluno(aluno_id):
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('aluno')
 def read_all_alunos():
-    conn = create_connection()
+    # Busca em lote (ids=1,2,3): uma consulta, sem paginação
+    try:
+        ids = ler_ids()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Exportação em streaming (NDJSON/CSV) conforme o cabeçalho Accept
+    formato = formato_exportacao()
+    if formato:
+        query = "SELECT * FROM aluno" + ordenacao(('nome_completo', 'id_aluno'))
+        return resposta_exportacao(formato, 'alunos', query, [], COLUNAS_ALUNO, aluno_para_dict)
+    
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM aluno ORDER BY nome_completo")
-        alunos = cursor.fetchall()
+        if ids is not None:
+            return resposta_lote(cursor, "SELECT * FROM aluno WHERE id_aluno = ANY(%s)", ids, aluno_para_dict), 200
         
-        result = []
-        for aluno in alunos:
-            # Convertendo objetos não serializáveis (como datetime) para string
-            data_nascimento = aluno[2]
-            if data_nascimento:
-                data_nascimento = data_nascimento.strftime('%Y-%m-%d')
-                
-            result.append({
-                "aluno_id": aluno[0],
-                "nome": aluno[1],
-                "data_nascimento": data_nascimento,
-                "id_turma": aluno[3],
-                "nome_responsavel": aluno[4],
-                "telefone_responsavel": aluno[5],
-                "email_responsavel": aluno[6],
-                "informacoes_adicionais": aluno[7]
-            })
+        chave_ordem = ('nome_completo', 'id_aluno')
+        limite, chave = ler_paginacao(len(chave_ordem))
         
-        return jsonify(result), 200
+        query = "SELECT * FROM aluno"
+        valores = []
+        if chave:
+            filtro, valores = filtro_keyset(chave_ordem, chave)
+            query += " WHERE " + filtro
+        query += ordenacao(chave_ordem) + " LIMIT %s"
+        valores.append(limite + 1)
+        
+        if json_no_banco():
+            corpo, proximo = pagina_json(cursor, query, valores, CAMPOS_JSON_ALUNO, chave_ordem, limite)
+            return resposta_paginada(corpo, proximo), 200
+        
+        cursor.execute(query, tuple(valores))
+        alunos, proximo = fatiar_pagina(cursor.fetchall(), limite, lambda aluno: (aluno[1], aluno[0]))
+        
+        result = [aluno_para_dict(aluno) for aluno in alunos]
+        return resposta_paginada(result, proximo), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/alunos/<string:aluno_id>', methods=['PUT'])
 @swag_from({
@@ -257,7 +342,7 @@ def update_aluno(aluno_id):
     if not data or 'nome_completo' not in data:
         return jsonify({"error": "O campo nome_completo é obrigatório"}), 400
     
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -283,7 +368,69 @@ def update_aluno(aluno_id):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
+
+@app.route('/alunos/<string:aluno_id>', methods=['PATCH'])
+@swag_from({
+    'tags': ['Alunos'],
+    'description': 'Atualiza só os campos enviados de um aluno e devolve o aluno atualizado.',
+    'parameters': [
+        {
+            'name': 'aluno_id',
+            'in': 'path',
+            'required': True,
+            'type': 'string'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'nome_completo': {'type': 'string'},
+                    'data_nascimento': {'type': 'string', 'format': 'date'},
+                    'id_turma': {'type': 'integer'},
+                    'nome_responsavel': {'type': 'string'},
+                    'telefone_responsavel': {'type': 'string'},
+                    'email_responsavel': {'type': 'string'},
+                    'informacoes_adicionais': {'type': 'string'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Aluno atualizado'},
+        400: {'description': 'Nenhum campo enviado, campo não editável ou erro na requisição'},
+        404: {'description': 'Aluno não encontrado'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def patch_aluno(aluno_id):
+    try:
+        campos = campos_patch(request.get_json(), EDITAVEIS_ALUNO)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        aluno = atualizar_parcial(cursor, 'aluno', campos, {'id_aluno': int(aluno_id)}, ['id_aluno'] + EDITAVEIS_ALUNO)
+        if aluno is None:
+            conn.rollback()
+            return jsonify({"error": "Aluno não encontrado"}), 404
+        conn.commit()
+        return jsonify(aluno_para_dict(aluno)), 200
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_ALUNO)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
 
 @app.route('/alunos/<string:aluno_id>', methods=['DELETE'])
 @swag_from({
@@ -303,7 +450,7 @@ def update_aluno(aluno_id):
     }
 })
 def delete_aluno(aluno_id):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -335,4 +482,55 @@ def delete_aluno(aluno_id):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+
+@app.route('/alunos/importacao', methods=['POST'])
+@swag_from({
+    'tags': ['Alunos'],
+    'description': 'Importa alunos em massa a partir de um CSV com cabeçalho (separado por vírgula ou ponto e vírgula). Colunas aceitas: nome_completo*, data_nascimento*, id_turma, nome_responsavel, telefone_responsavel, email_responsavel, informacoes_adicionais (* obrigatórias). Linhas inválidas são rejeitadas e listadas no relatório; as demais são gravadas.',
+    'consumes': ['text/csv', 'multipart/form-data'],
+    'parameters': [
+        {
+            'name': 'arquivo',
+            'in': 'formData',
+            'type': 'file',
+            'required': False,
+            'description': 'Arquivo CSV (alternativamente, envie o CSV como corpo com Content-Type text/csv)'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Relatório da importação',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'importados': {'type': 'integer'},
+                    'rejeitados': {'type': 'integer'},
+                    'erros': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'linha': {'type': 'integer'},
+                                'erro': {'type': 'string'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'CSV inválido'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def importar_alunos():
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
+    
+    try:
+        relatorio = importar_csv(conn, 'alunos', arquivo_importacao())
+        conn.commit()
+        return jsonify(relatorio), 200
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
\ No newline at end of file
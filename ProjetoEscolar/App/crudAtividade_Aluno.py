@@ -1,9 +1,15 @@
 from flask import Blueprint, request, jsonify
-from .Utils.bd import create_connection
+from .Utils.bd import get_connection
+from .Utils.condicional import get_condicional
+from .Utils.escrita import campos_patch, atualizar_parcial
+from .Utils.paginacao import (AVISO_PAGINACAO, PARAMETROS_PAGINACAO, CABECALHOS_PAGINACAO, ler_paginacao,
+                              filtro_keyset, ordenacao, fatiar_pagina, resposta_paginada)
 from flasgger import swag_from
 
 app = Blueprint('atividades_alunos', __name__)
 
+COLUNAS_ATIVIDADE_ALUNO = ['id_atividade', 'id_aluno', 'desempenho', 'observacoes']
+
 # CRUD para Atividade_Aluno
 @app.route('/atividades_alunos', methods=['POST'])
 @swag_from({
@@ -47,7 +53,7 @@ def create_atividade_aluno():
     desempenho = data.get('desempenho', None)
     observacoes = data.get('observacoes', None)
         
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -67,7 +73,6 @@ def create_atividade_aluno():
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/atividades_alunos/<int:id_atividade>/<int:id_aluno>', methods=['GET'])
 @swag_from({
@@ -104,8 +109,9 @@ def create_atividade_aluno():
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('atividade_aluno')
 def read_atividade_aluno(id_atividade, id_aluno):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -125,15 +131,16 @@ def read_atividade_aluno(id_atividade, id_aluno):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/atividades_alunos', methods=['GET'])
 @swag_from({
     'tags': ['Atividades_Alunos'],
-    'description': 'Lista todas as associações entre atividades e alunos.',
+    'description': 'Lista as associações entre atividades e alunos. ' + AVISO_PAGINACAO,
+    'parameters': PARAMETROS_PAGINACAO,
     'responses': {
         200: {
             'description': 'Lista de associações atividade-aluno',
+            'headers': CABECALHOS_PAGINACAO,
             'schema': {
                 'type': 'array',
                 'items': {
@@ -150,15 +157,27 @@ def read_atividade_aluno(id_atividade, id_aluno):
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('atividade_aluno')
 def read_all_atividades_alunos():
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM atividade_aluno")
-        atividades_alunos = cursor.fetchall()
+        chave_ordem = ('id_atividade', 'id_aluno')
+        limite, chave = ler_paginacao(len(chave_ordem))
+        
+        query = "SELECT * FROM atividade_aluno"
+        valores = []
+        if chave:
+            filtro, valores = filtro_keyset(chave_ordem, chave)
+            query += " WHERE " + filtro
+        query += ordenacao(chave_ordem) + " LIMIT %s"
+        valores.append(limite + 1)
+        
+        cursor.execute(query, tuple(valores))
+        atividades_alunos, proximo = fatiar_pagina(cursor.fetchall(), limite, lambda atividade_aluno: (atividade_aluno[0], atividade_aluno[1]))
         
         result = []
         for atividade_aluno in atividades_alunos:
@@ -169,12 +188,11 @@ def read_all_atividades_alunos():
                 "observacoes": atividade_aluno[3]
             })
         
-        return jsonify(result), 200
+        return resposta_paginada(result, proximo), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/atividades_alunos/<int:id_atividade>/<int:id_aluno>', methods=['PUT'])
 @swag_from({
@@ -222,47 +240,89 @@ def update_atividade_aluno(id_atividade, id_aluno):
     if not data:
         return jsonify({"error": "Dados incompletos"}), 400
         
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        # Verificar se o registro existe
-        cursor.execute("SELECT * FROM atividade_aluno WHERE id_atividade = %s AND id_aluno = %s", (id_atividade, id_aluno))
-        if cursor.fetchone() is None:
+        # Campos com valor null são ignorados (mantêm o valor atual)
+        campos = campos_patch({coluna: valor for coluna, valor in data.items()
+                               if coluna in COLUNAS_ATIVIDADE_ALUNO[2:] and valor is not None},
+                              COLUNAS_ATIVIDADE_ALUNO[2:])
+        chave = {'id_atividade': id_atividade, 'id_aluno': id_aluno}
+        if atualizar_parcial(cursor, 'atividade_aluno', campos, chave, ['id_atividade']) is None:
+            conn.rollback()
             return jsonify({"error": "Atividade-Aluno não encontrada"}), 404
-            
-        # Atualizar os campos
-        desempenho = data.get('desempenho')
-        observacoes = data.get('observacoes')
+        conn.commit()
         
-        update_query = "UPDATE atividade_aluno SET "
-        update_params = []
+        return jsonify({"message": "Atividade-Aluno atualizada com sucesso"}), 200
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
+
+@app.route('/atividades_alunos/<int:id_atividade>/<int:id_aluno>', methods=['PATCH'])
+@swag_from({
+    'tags': ['Atividades_Alunos'],
+    'description': 'Atualiza só os campos enviados de uma atividade-aluno e devolve o registro atualizado.',
+    'parameters': [
+        {
+            'name': 'id_atividade',
+            'in': 'path',
+            'required': True,
+            'type': 'integer'
+        },
+        {
+            'name': 'id_aluno',
+            'in': 'path',
+            'required': True,
+            'type': 'integer'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'desempenho': {'type': 'string'},
+                    'observacoes': {'type': 'string'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Atividade-Aluno atualizada'},
+        400: {'description': 'Nenhum campo enviado, campo não editável ou erro na requisição'},
+        404: {'description': 'Atividade-Aluno não encontrada'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def patch_atividade_aluno(id_atividade, id_aluno):
+    try:
+        campos = campos_patch(request.get_json(), COLUNAS_ATIVIDADE_ALUNO[2:])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
         
-        if desempenho is not None:
-            update_query += "desempenho = %s"
-            update_params.append(desempenho)
-            
-        if observacoes is not None:
-            if update_params:
-                update_query += ", "
-            update_query += "observacoes = %s"
-            update_params.append(observacoes)
-            
-        update_query += " WHERE id_atividade = %s AND id_aluno = %s"
-        update_params.extend([id_atividade, id_aluno])
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
-        cursor.execute(update_query, update_params)
+    cursor = conn.cursor()
+    try:
+        registro = atualizar_parcial(cursor, 'atividade_aluno', campos, {'id_atividade': id_atividade, 'id_aluno': id_aluno}, COLUNAS_ATIVIDADE_ALUNO)
+        if registro is None:
+            conn.rollback()
+            return jsonify({"error": "Atividade-Aluno não encontrada"}), 404
         conn.commit()
-        
-        return jsonify({"message": "Atividade-Aluno atualizada com sucesso"}), 200
+        return jsonify(dict(zip(COLUNAS_ATIVIDADE_ALUNO, registro))), 200
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/atividades_alunos/<int:id_atividade>/<int:id_aluno>', methods=['DELETE'])
 @swag_from({
@@ -289,7 +349,7 @@ def update_atividade_aluno(id_atividade, id_aluno):
     }
 })
 def delete_atividade_aluno(id_atividade, id_aluno):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -304,5 +364,4 @@ def delete_atividade_aluno(id_atividade, id_aluno):
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        cursor.close()
\ No newline at end of file
@@ -1,10 +1,21 @@
 from flask import Blueprint, request, jsonify
-from .Utils.bd import create_connection
+from .Utils.bd import get_connection
+from .Utils.condicional import get_condicional
+from .Utils.escrita import campos_patch, atualizar_parcial
+from .Utils.paginacao import (AVISO_PAGINACAO, PARAMETROS_PAGINACAO, CABECALHOS_PAGINACAO, ler_paginacao,
+                              PARAMETRO_IDS, ler_ids, resposta_lote,
+                              filtro_keyset, ordenacao, fatiar_pagina, resposta_paginada)
 from flasgger import swag_from
 from collections import OrderedDict
 
 app = Blueprint('atividades', __name__) 
 
+COLUNAS_ATIVIDADE = ['id_atividade', 'descricao', 'data_realizacao']
+
+def atividade_para_dict(atividade):
+    # Datas são serializadas pelo provedor JSON do app (Utils/serializacao.py)
+    return dict(zip(COLUNAS_ATIVIDADE, atividade))
+
 @app.route('/atividades', methods=['POST'])
 @swag_from({
     'tags': ['Atividades'],
@@ -48,7 +59,7 @@ def create_atividade():
     if not data or 'descricao' not in data or 'data_realizacao' not in data:
         return jsonify({"error": "Dados incompletos. Descrição e data_realizacao são obrigatórios"}), 400
         
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -70,7 +81,6 @@ def create_atividade():
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/atividades/<int:id_atividade>', methods=['GET'])
 @swag_from({
@@ -98,8 +108,9 @@ def create_atividade():
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('atividade')
 def read_atividade(id_atividade):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -109,24 +120,21 @@ def read_atividade(id_atividade):
         atividade = cursor.fetchone()
         if atividade is None:
             return jsonify({"error": "Atividade não encontrada"}), 404
-        return jsonify(OrderedDict([
-            ("id_atividade", atividade[0]),
-            ("descricao", atividade[1]),
-            ("data_realizacao", atividade[2].strftime('%Y-%m-%d') if hasattr(atividade[2], 'strftime') else atividade[2])
-        ])), 200
+        return jsonify(atividade_para_dict(atividade)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/atividades', methods=['GET'])
 @swag_from({
     'tags': ['Atividades'],
-    'description': 'Lista todas as atividades cadastradas.',
+    'description': 'Lista as atividades cadastradas por data de realização. ' + AVISO_PAGINACAO,
+    'parameters': [PARAMETRO_IDS] + PARAMETROS_PAGINACAO,
     'responses': {
         200: {
             'description': 'Lista de atividades',
+            'headers': CABECALHOS_PAGINACAO,
             'schema': {
                 'type': 'array',
                 'items': {
@@ -142,30 +150,44 @@ def read_atividade(id_atividade):
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('atividade')
 def read_all_atividades():
-    conn = create_connection()
+    # Busca em lote (ids=1,2,3): uma consulta, sem paginação
+    try:
+        ids = ler_ids()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM atividade ORDER BY data_realizacao")
-        atividades = cursor.fetchall()
+        if ids is not None:
+            return resposta_lote(cursor, "SELECT * FROM atividade WHERE id_atividade = ANY(%s)", ids,
+                                 atividade_para_dict), 200
+        
+        chave_ordem = ('data_realizacao', 'id_atividade')
+        limite, chave = ler_paginacao(len(chave_ordem))
+        
+        query = "SELECT * FROM atividade"
+        valores = []
+        if chave:
+            filtro, valores = filtro_keyset(chave_ordem, chave)
+            query += " WHERE " + filtro
+        query += ordenacao(chave_ordem) + " LIMIT %s"
+        valores.append(limite + 1)
         
-        result = []
-        for atividade in atividades:
-            result.append(OrderedDict([
-                ("id_atividade", atividade[0]),
-                ("descricao", atividade[1]),
-                ("data_realizacao", atividade[2].strftime('%Y-%m-%d') if hasattr(atividade[2], 'strftime') else atividade[2])
-            ]))
+        cursor.execute(query, tuple(valores))
+        atividades, proximo = fatiar_pagina(cursor.fetchall(), limite, lambda atividade: (atividade[2], atividade[0]))
         
-        return jsonify(result), 200
+        result = [atividade_para_dict(atividade) for atividade in atividades]
+        return resposta_paginada(result, proximo), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/atividades/<int:id_atividade>', methods=['PUT'])
 @swag_from({
@@ -210,7 +232,7 @@ def update_atividade(id_atividade):
     if not data or 'descricao' not in data or 'data_realizacao' not in data:
         return jsonify({"error": "Dados incompletos. Descrição e data_realizacao são obrigatórios"}), 400
         
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -233,7 +255,61 @@ def update_atividade(id_atividade):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
+
+@app.route('/atividades/<int:id_atividade>', methods=['PATCH'])
+@swag_from({
+    'tags': ['Atividades'],
+    'description': 'Atualiza só os campos enviados de uma atividade e devolve a atividade atualizada.',
+    'parameters': [
+        {
+            'name': 'id_atividade',
+            'in': 'path',
+            'required': True,
+            'type': 'integer'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'descricao': {'type': 'string'},
+                    'data_realizacao': {'type': 'string', 'format': 'date'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Atividade atualizada'},
+        400: {'description': 'Nenhum campo enviado, campo não editável ou erro na requisição'},
+        404: {'description': 'Atividade não encontrada'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def patch_atividade(id_atividade):
+    try:
+        campos = campos_patch(request.get_json(), COLUNAS_ATIVIDADE[1:])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        atividade = atualizar_parcial(cursor, 'atividade', campos, {'id_atividade': id_atividade}, COLUNAS_ATIVIDADE)
+        if atividade is None:
+            conn.rollback()
+            return jsonify({"error": "Atividade não encontrada"}), 404
+        conn.commit()
+        return jsonify(atividade_para_dict(atividade)), 200
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
 
 @app.route('/atividades/<int:id_atividade>', methods=['DELETE'])
 @swag_from({
@@ -253,7 +329,7 @@ def update_atividade(id_atividade):
     }
 })
 def delete_atividade(id_atividade):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -275,5 +351,4 @@ def delete_atividade(id_atividade):
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        cursor.close()
\ No newline at end of file
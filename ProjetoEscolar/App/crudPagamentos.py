@@ -1,10 +1,89 @@
+import psycopg2
+from decimal import Decimal, InvalidOperation
 from flask import Blueprint, request, jsonify
-from .Utils.bd import create_connection
-import datetime
+from .Utils.bd import get_connection
+from .Utils.condicional import get_condicional
+from .Utils.escrita import resposta_integridade, campos_patch, atualizar_parcial
+from .Utils.importacao import importar_csv, arquivo_importacao
+from .Utils.paginacao import (AVISO_PAGINACAO, PARAMETROS_PAGINACAO, CABECALHOS_PAGINACAO, ler_paginacao,
+                              filtro_keyset, ordenacao, fatiar_pagina, resposta_paginada,
+                              json_no_banco, pagina_json, ler_ordenacao, ler_campos)
+from .Utils.exportacao import TIPOS_EXPORTACAO, formato_exportacao, resposta_exportacao
 from flasgger import swag_from
 
 app = Blueprint('pagamentos', __name__)
 
+COLUNAS_PAGAMENTO = ['id_pagamento', 'id_aluno', 'data_pagamento', 'valor_pago', 'forma_pagamento', 'referencia', 'status']
+
+# Restrições da tabela pagamento -> resposta das rotas de escrita (Utils/escrita.py)
+ERROS_PAGAMENTO = {
+    'pagamento_id_aluno_fkey': ("Aluno não encontrado", 404),
+}
+
+def pagamento_para_dict(pagamento):
+    # Datas e Decimal (valor_pago) são serializados pelo provedor JSON do app (Utils/serializacao.py)
+    return dict(zip(COLUNAS_PAGAMENTO, pagamento))
+
+# Mesmos campos de pagamento_para_dict, montados pelo Postgres (listagens_json_banco)
+CAMPOS_JSON_PAGAMENTO = {
+    'id_pagamento': 'id_pagamento',
+    'id_aluno': 'id_aluno',
+    'data_pagamento': "to_char(data_pagamento, 'YYYY-MM-DD')",
+    'valor_pago': 'valor_pago',
+    'forma_pagamento': 'forma_pagamento',
+    'referencia': 'referencia',
+    'status': 'status',
+}
+
+# Ordenações aceitas em GET /pagamentos (sort=coluna ou sort=-coluna); id_pagamento desempata
+ORDENACOES_PAGAMENTO = ['data_pagamento', 'valor_pago', 'id_pagamento']
+
+def filtros_pagamentos():
+    """
+    Filtros opcionais da listagem (id_aluno, status, referencia, data_inicio,
+    data_fim, valor_min, valor_max), atendidos pelos índices da migração 0008.
+    """
+    filtros = []
+    valores = []
+    
+    id_aluno = request.args.get('id_aluno')
+    if id_aluno:
+        filtros.append("id_aluno = %s")
+        valores.append(id_aluno)
+        
+    data_inicio = request.args.get('data_inicio')
+    if data_inicio:
+        filtros.append("data_pagamento >= %s")
+        valores.append(data_inicio)
+        
+    data_fim = request.args.get('data_fim')
+    if data_fim:
+        filtros.append("data_pagamento <= %s")
+        valores.append(data_fim)
+    
+    # Um ou mais status separados por vírgula (ex.: status=Pendente,Atrasado)
+    status = request.args.get('status')
+    if status:
+        filtros.append("status = ANY(%s)")
+        valores.append([item.strip() for item in status.split(',') if item.strip()])
+        
+    referencia = request.args.get('referencia')
+    if referencia:
+        filtros.append("referencia = %s")
+        valores.append(referencia)
+        
+    for parametro, operador in (('valor_min', '>='), ('valor_max', '<=')):
+        valor = request.args.get(parametro)
+        if valor:
+            try:
+                valor = Decimal(valor)
+            except InvalidOperation:
+                raise ValueError(f"O parâmetro {parametro} deve ser um número")
+            filtros.append(f"valor_pago {operador} %s")
+            valores.append(valor)
+    
+    return filtros, valores
+
 @app.route('/pagamentos', methods=['POST'])
 @swag_from({
     'tags': ['Pagamentos'],
@@ -57,7 +136,7 @@ def create_pagamento():
     if not data or 'id_aluno' not in data or 'data_pagamento' not in data or 'valor_pago' not in data:
         return jsonify({"error": "Os campos id_aluno, data_pagamento e valor_pago são obrigatórios"}), 400
     
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -69,10 +148,7 @@ def create_pagamento():
         except ValueError:
             return jsonify({"error": "O ID do aluno deve ser um número inteiro"}), 400
             
-        cursor.execute("SELECT COUNT(*) FROM aluno WHERE id_aluno = %s", (id_aluno,))
-        if cursor.fetchone()[0] == 0:
-            return jsonify({"error": "Aluno não encontrado"}), 404
-            
+        # Aluno inexistente é barrado pela chave estrangeira (ERROS_PAGAMENTO)
         cursor.execute(
             """
             INSERT INTO pagamento (id_aluno, data_pagamento, valor_pago, forma_pagamento, referencia, status)
@@ -85,12 +161,14 @@ def create_pagamento():
         id_pagamento = cursor.fetchone()[0]
         conn.commit()
         return jsonify({"message": "Pagamento criado com sucesso", "id_pagamento": id_pagamento}), 201
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_PAGAMENTO)
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/pagamentos/<int:id_pagamento>', methods=['GET'])
 @swag_from({
@@ -122,8 +200,9 @@ def create_pagamento():
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('pagamento')
 def read_pagamento(id_pagamento):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -134,33 +213,88 @@ def read_pagamento(id_pagamento):
         if pagamento is None:
             return jsonify({"error": "Pagamento não encontrado"}), 404
             
-        # Convertendo objetos datetime para strings
-        data_pagamento = pagamento[2]
-        if isinstance(data_pagamento, datetime.datetime):
-            data_pagamento = data_pagamento.strftime('%Y-%m-%d')
-            
-        return jsonify({
-            "id_pagamento": pagamento[0],
-            "id_aluno": pagamento[1],
-            "data_pagamento": data_pagamento,
-            "valor_pago": float(pagamento[3]),  # Convertendo Decimal para float para serialização JSON
-            "forma_pagamento": pagamento[4],
-            "referencia": pagamento[5],
-            "status": pagamento[6]
-        }), 200
+        return jsonify(pagamento_para_dict(pagamento)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/pagamentos', methods=['GET'])
 @swag_from({
     'tags': ['Pagamentos'],
-    'description': 'Lista todos os pagamentos.',
+    'description': 'Lista os pagamentos, por padrão do mais recente para o mais antigo. Com Accept application/x-ndjson ou text/csv, exporta todos os pagamentos filtrados em streaming. ' + AVISO_PAGINACAO,
+    'produces': TIPOS_EXPORTACAO,
+    'parameters': [
+        {
+            'name': 'id_aluno',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': 'Filtrar por ID do aluno'
+        },
+        {
+            'name': 'data_inicio',
+            'in': 'query',
+            'type': 'string',
+            'format': 'date',
+            'required': False,
+            'description': 'Data inicial para filtro'
+        },
+        {
+            'name': 'data_fim',
+            'in': 'query',
+            'type': 'string',
+            'format': 'date',
+            'required': False,
+            'description': 'Data final para filtro'
+        },
+        {
+            'name': 'status',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Filtrar por status (um ou mais, separados por vírgula)'
+        },
+        {
+            'name': 'referencia',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Filtrar pela referência do pagamento'
+        },
+        {
+            'name': 'valor_min',
+            'in': 'query',
+            'type': 'number',
+            'required': False,
+            'description': 'Valor pago mínimo'
+        },
+        {
+            'name': 'valor_max',
+            'in': 'query',
+            'type': 'number',
+            'required': False,
+            'description': 'Valor pago máximo'
+        },
+        {
+            'name': 'sort',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': f"Ordenação: {', '.join(ORDENACOES_PAGAMENTO)}, com '-' para decrescente (padrão -data_pagamento)"
+        },
+        {
+            'name': 'fields',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Campos devolvidos, separados por vírgula (padrão: todos)'
+        }
+    ] + PARAMETROS_PAGINACAO,
     'responses': {
         200: {
             'description': 'Lista de pagamentos',
+            'headers': CABECALHOS_PAGINACAO,
             'schema': {
                 'type': 'array',
                 'items': {
@@ -180,41 +314,65 @@ def read_pagamento(id_pagamento):
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('pagamento')
 def read_all_pagamentos():
-    conn = create_connection()
+    try:
+        filtros, valores = filtros_pagamentos()
+        coluna, descendente = ler_ordenacao(ORDENACOES_PAGAMENTO, '-data_pagamento')
+        campos = ler_campos(COLUNAS_PAGAMENTO)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    chave_ordem = (coluna, 'id_pagamento') if coluna != 'id_pagamento' else ('id_pagamento',)
+    
+    # Exportação em streaming (NDJSON/CSV) conforme o cabeçalho Accept
+    formato = formato_exportacao()
+    if formato:
+        query = f"SELECT {', '.join(campos)} FROM pagamento"
+        if filtros:
+            query += " WHERE " + " AND ".join(filtros)
+        query += ordenacao(chave_ordem, descendente)
+        return resposta_exportacao(formato, 'pagamentos', query, valores, campos,
+                                   lambda pagamento: dict(zip(campos, pagamento)))
+    
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        # Consulta simples para listar todos os pagamentos
-        query = "SELECT * FROM pagamento ORDER BY data_pagamento DESC"
-        cursor.execute(query)
-        pagamentos = cursor.fetchall()
+        limite, chave = ler_paginacao(len(chave_ordem))
         
-        result = []
-        for pagamento in pagamentos:
-            # Convertendo objetos datetime para strings
-            data_pagamento = pagamento[2]
-            if isinstance(data_pagamento, datetime.datetime):
-                data_pagamento = data_pagamento.strftime('%Y-%m-%d')
-                
-            result.append({
-                "id_pagamento": pagamento[0],
-                "id_aluno": pagamento[1],
-                "data_pagamento": data_pagamento,
-                "valor_pago": float(pagamento[3]),  # Convertendo Decimal para float
-                "forma_pagamento": pagamento[4],
-                "referencia": pagamento[5],
-                "status": pagamento[6]
-            })
+        if chave:
+            filtro, params = filtro_keyset(chave_ordem, chave, descendente=descendente)
+            filtros.append(filtro)
+            valores.extend(params)
+        
+        # Só as colunas pedidas, mais as da ordenação (necessárias para o cursor)
+        selecionadas = [c for c in COLUNAS_PAGAMENTO if c in campos or c in chave_ordem]
+        query = f"SELECT {', '.join(selecionadas)} FROM pagamento"
+        if filtros:
+            query += " WHERE " + " AND ".join(filtros)
+        query += ordenacao(chave_ordem, descendente) + " LIMIT %s"
+        valores.append(limite + 1)
         
-        return jsonify(result), 200
+        if json_no_banco():
+            campos_json = {nome: expressao for nome, expressao in CAMPOS_JSON_PAGAMENTO.items() if nome in campos}
+            corpo, proximo = pagina_json(cursor, query, valores, campos_json, chave_ordem, limite,
+                                         descendente=descendente)
+            return resposta_paginada(corpo, proximo), 200
+        
+        cursor.execute(query, tuple(valores))
+        posicoes_chave = [selecionadas.index(c) for c in chave_ordem]
+        pagamentos, proximo = fatiar_pagina(cursor.fetchall(), limite,
+                                            lambda pagamento: tuple(pagamento[i] for i in posicoes_chave))
+        
+        posicoes = [(campo, selecionadas.index(campo)) for campo in campos]
+        result = [{campo: pagamento[i] for campo, i in posicoes} for pagamento in pagamentos]
+        return resposta_paginada(result, proximo), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/pagamentos/<int:id_pagamento>', methods=['PUT'])
 @swag_from({
@@ -266,7 +424,7 @@ def update_pagamento(id_pagamento):
     if not data:
         return jsonify({"error": "Dados inválidos"}), 400
         
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -316,7 +474,68 @@ def update_pagamento(id_pagamento):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
+
+@app.route('/pagamentos/<int:id_pagamento>', methods=['PATCH'])
+@swag_from({
+    'tags': ['Pagamentos'],
+    'description': 'Atualiza só os campos enviados de um pagamento e devolve o pagamento atualizado.',
+    'parameters': [
+        {
+            'name': 'id_pagamento',
+            'in': 'path',
+            'required': True,
+            'type': 'integer'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'id_aluno': {'type': 'integer'},
+                    'data_pagamento': {'type': 'string', 'format': 'date'},
+                    'valor_pago': {'type': 'number'},
+                    'forma_pagamento': {'type': 'string'},
+                    'referencia': {'type': 'string'},
+                    'status': {'type': 'string'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Pagamento atualizado'},
+        400: {'description': 'Nenhum campo enviado, campo não editável ou erro na requisição'},
+        404: {'description': 'Pagamento não encontrado'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def patch_pagamento(id_pagamento):
+    try:
+        campos = campos_patch(request.get_json(), COLUNAS_PAGAMENTO[1:])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        pagamento = atualizar_parcial(cursor, 'pagamento', campos, {'id_pagamento': id_pagamento}, COLUNAS_PAGAMENTO)
+        if pagamento is None:
+            conn.rollback()
+            return jsonify({"error": "Pagamento não encontrado"}), 404
+        conn.commit()
+        return jsonify(pagamento_para_dict(pagamento)), 200
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_PAGAMENTO)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
 
 @app.route('/pagamentos/<int:id_pagamento>', methods=['DELETE'])
 @swag_from({
@@ -336,7 +555,7 @@ def update_pagamento(id_pagamento):
     }
 })
 def delete_pagamento(id_pagamento):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -361,4 +580,55 @@ def delete_pagamento(id_pagamento):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+
+@app.route('/pagamentos/importacao', methods=['POST'])
+@swag_from({
+    'tags': ['Pagamentos'],
+    'description': 'Importa pagamentos em massa a partir de um CSV com cabeçalho (separado por vírgula ou ponto e vírgula). Colunas aceitas: id_aluno*, data_pagamento*, valor_pago*, forma_pagamento, referencia, status (* obrigatórias). Linhas inválidas são rejeitadas e listadas no relatório; as demais são gravadas.',
+    'consumes': ['text/csv', 'multipart/form-data'],
+    'parameters': [
+        {
+            'name': 'arquivo',
+            'in': 'formData',
+            'type': 'file',
+            'required': False,
+            'description': 'Arquivo CSV (alternativamente, envie o CSV como corpo com Content-Type text/csv)'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Relatório da importação',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'importados': {'type': 'integer'},
+                    'rejeitados': {'type': 'integer'},
+                    'erros': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'linha': {'type': 'integer'},
+                                'erro': {'type': 'string'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'CSV inválido'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def importar_pagamentos():
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
+    
+    try:
+        relatorio = importar_csv(conn, 'pagamentos', arquivo_importacao())
+        conn.commit()
+        return jsonify(relatorio), 200
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
\ No newline at end of file
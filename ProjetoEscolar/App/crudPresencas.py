@@ -1,10 +1,63 @@
+import psycopg2
 from flask import Blueprint, request, jsonify
-from .Utils.bd import create_connection
-import datetime
+from .Utils.bd import get_connection
+from .Utils.escrita import resposta_integridade, atribuicoes, campos_patch, atualizar_parcial
+from .Utils.condicional import get_condicional
+from .Utils.paginacao import (AVISO_PAGINACAO, PARAMETROS_PAGINACAO, CABECALHOS_PAGINACAO, ler_paginacao,
+                              filtro_keyset, ordenacao, fatiar_pagina, resposta_paginada,
+                              json_no_banco, pagina_json)
+from .Utils.exportacao import TIPOS_EXPORTACAO, formato_exportacao, resposta_exportacao
 from flasgger import swag_from
 
 app = Blueprint('presencas', __name__)
 
+COLUNAS_PRESENCA = ['id_presenca', 'id_aluno', 'data_presenca', 'presente']
+
+# Restrições da tabela presenca -> resposta das rotas de escrita (Utils/escrita.py)
+ERROS_PRESENCA = {
+    'presenca_id_aluno_fkey': ("Aluno não encontrado", 404),
+    'uq_presenca_aluno_data': ("Já existe um registro de presença para este aluno nesta data", 400),
+}
+
+def presenca_para_dict(presenca):
+    # Datas são serializadas pelo provedor JSON do app (Utils/serializacao.py)
+    return dict(zip(COLUNAS_PRESENCA, presenca))
+
+# Mesmos campos de presenca_para_dict, montados pelo Postgres (listagens_json_banco)
+CAMPOS_JSON_PRESENCA = {
+    'id_presenca': 'id_presenca',
+    'id_aluno': 'id_aluno',
+    'data_presenca': "to_char(data_presenca, 'YYYY-MM-DD')",
+    'presente': 'presente',
+}
+
+def filtros_presencas():
+    """Filtros opcionais da listagem (id_aluno, data_inicio, data_fim, presente)"""
+    filtros = []
+    valores = []
+    
+    id_aluno = request.args.get('id_aluno')
+    if id_aluno:
+        filtros.append("id_aluno = %s")
+        valores.append(id_aluno)
+        
+    data_inicio = request.args.get('data_inicio')
+    if data_inicio:
+        filtros.append("data_presenca >= %s")
+        valores.append(data_inicio)
+        
+    data_fim = request.args.get('data_fim')
+    if data_fim:
+        filtros.append("data_presenca <= %s")
+        valores.append(data_fim)
+        
+    presente = request.args.get('presente')
+    if presente is not None:
+        filtros.append("presente = %s")
+        valores.append(presente.lower() == 'true')
+    
+    return filtros, valores
+
 @app.route('/presencas', methods=['POST'])
 @swag_from({
     'tags': ['Presencas'],
@@ -42,25 +95,13 @@ def create_presenca():
     if not data or 'id_aluno' not in data or 'data_presenca' not in data or 'presente' not in data:
         return jsonify({"error": "Os campos id_aluno, data_presenca e presente são obrigatórios"}), 400
     
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        # Verificar se o aluno existe
-        cursor.execute("SELECT COUNT(*) FROM aluno WHERE id_aluno = %s", (data['id_aluno'],))
-        if cursor.fetchone()[0] == 0:
-            return jsonify({"error": "Aluno não encontrado"}), 404
-            
-        # Verificar se já existe uma presença para este aluno nesta data
-        cursor.execute(
-            "SELECT COUNT(*) FROM presenca WHERE id_aluno = %s AND data_presenca = %s",
-            (data['id_aluno'], data['data_presenca'])
-        )
-        if cursor.fetchone()[0] > 0:
-            return jsonify({"error": "Já existe um registro de presença para este aluno nesta data"}), 400
-            
+        # Aluno inexistente e presença duplicada são barrados pelas restrições da tabela
         cursor.execute(
             """
             INSERT INTO presenca (id_aluno, data_presenca, presente)
@@ -72,12 +113,137 @@ def create_presenca():
         id_presenca = cursor.fetchone()[0]
         conn.commit()
         return jsonify({"message": "Presença registrada com sucesso", "id_presenca": id_presenca}), 201
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_PRESENCA)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
+
+@app.route('/turmas/<int:id_turma>/presencas', methods=['POST'])
+@swag_from({
+    'tags': ['Presencas'],
+    'description': 'Registra a chamada de uma turma em uma data. Presenças já existentes para o aluno na data são atualizadas.',
+    'parameters': [
+        {
+            'name': 'id_turma',
+            'in': 'path',
+            'required': True,
+            'type': 'integer'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'data_presenca': {'type': 'string', 'format': 'date'},
+                    'presencas': {
+                        'type': 'object',
+                        'description': 'Mapa id_aluno -> presente',
+                        'additionalProperties': {'type': 'boolean'}
+                    }
+                },
+                'required': ['data_presenca', 'presencas'],
+                'example': {
+                    'data_presenca': '',
+                    'presencas': {'1': True, '2': False}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Chamada registrada; resultado por aluno (criado, atualizado ou aluno_nao_encontrado)',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'message': {'type': 'string'},
+                    'data_presenca': {'type': 'string', 'format': 'date'},
+                    'resultados': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'id_aluno': {'type': 'integer'},
+                                'status': {'type': 'string'},
+                                'id_presenca': {'type': 'integer'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'Erro na requisição'},
+        404: {'description': 'Turma não encontrada'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def create_presencas_turma(id_turma):
+    data = request.get_json()
+    
+    # Validação dos dados de entrada
+    if not data or 'data_presenca' not in data or not isinstance(data.get('presencas'), dict) or not data['presencas']:
+        return jsonify({"error": "Os campos data_presenca e presencas (mapa id_aluno -> presente) são obrigatórios"}), 400
+    
+    try:
+        chamada = {int(id_aluno): presente for id_aluno, presente in data['presencas'].items()}
+    except ValueError:
+        return jsonify({"error": "Os IDs dos alunos devem ser números inteiros"}), 400
+    if not all(isinstance(presente, bool) for presente in chamada.values()):
+        return jsonify({"error": "Os valores de presencas devem ser true ou false"}), 400
+    
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM turma WHERE id_turma = %s", (id_turma,))
+        if cursor.fetchone() is None:
+            return jsonify({"error": "Turma não encontrada"}), 404
+        
+        # Uma única instrução para a turma inteira; alunos de outras turmas são ignorados.
+        # xmax = 0 identifica linhas inseridas (as atualizadas pelo ON CONFLICT têm xmax != 0)
+        cursor.execute(
+            """
+            INSERT INTO presenca (id_aluno, data_presenca, presente)
+            SELECT a.id_aluno, %s::date, v.presente
+            FROM unnest(%s::int[], %s::boolean[]) AS v(id_aluno, presente)
+            JOIN aluno a ON a.id_aluno = v.id_aluno AND a.id_turma = %s
+            ON CONFLICT (id_aluno, data_presenca) DO UPDATE SET presente = EXCLUDED.presente
+            RETURNING id_presenca, id_aluno, (xmax = 0) AS inserido
+            """,
+            (data['data_presenca'], list(chamada.keys()), list(chamada.values()), id_turma)
+        )
+        gravados = {linha[1]: linha for linha in cursor.fetchall()}
+        conn.commit()
+        
+        resultados = []
+        for id_aluno in chamada:
+            linha = gravados.get(id_aluno)
+            if linha is None:
+                resultados.append({"id_aluno": id_aluno, "status": "aluno_nao_encontrado"})
+            else:
+                resultados.append({
+                    "id_aluno": id_aluno,
+                    "status": "criado" if linha[2] else "atualizado",
+                    "id_presenca": linha[0]
+                })
+        
+        return jsonify({
+            "message": "Chamada registrada com sucesso",
+            "data_presenca": data['data_presenca'],
+            "resultados": resultados
+        }), 200
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/presencas/<int:id_presenca>', methods=['GET'])
 @swag_from({
@@ -106,8 +272,9 @@ def create_presenca():
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('presenca')
 def read_presenca(id_presenca):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -118,27 +285,17 @@ def read_presenca(id_presenca):
         if presenca is None:
             return jsonify({"error": "Presença não encontrada"}), 404
             
-        # Convertendo objetos datetime para strings
-        data_presenca = presenca[2]
-        if isinstance(data_presenca, datetime.datetime):
-            data_presenca = data_presenca.strftime('%Y-%m-%d')
-            
-        return jsonify({
-            "id_presenca": presenca[0],
-            "id_aluno": presenca[1],
-            "data_presenca": data_presenca,
-            "presente": bool(presenca[3])  # Convertendo para booleano
-        }), 200
+        return jsonify(presenca_para_dict(presenca)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/presencas', methods=['GET'])
 @swag_from({
     'tags': ['Presencas'],
-    'description': 'Lista todas as presenças com opções de filtro.',
+    'description': 'Lista as presenças com opções de filtro. Com Accept application/x-ndjson ou text/csv, exporta todas as presenças filtradas em streaming. ' + AVISO_PAGINACAO,
+    'produces': TIPOS_EXPORTACAO,
     'parameters': [
         {
             'name': 'id_aluno',
@@ -170,10 +327,11 @@ def read_presenca(id_presenca):
             'required': False,
             'description': 'Filtrar por status de presença'
         }
-    ],
+    ] + PARAMETROS_PAGINACAO,
     'responses': {
         200: {
             'description': 'Lista de presenças',
+            'headers': CABECALHOS_PAGINACAO,
             'schema': {
                 'type': 'array',
                 'items': {
@@ -190,66 +348,56 @@ def read_presenca(id_presenca):
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('presenca')
 def read_all_presencas():
-    conn = create_connection()
+    # Exportação em streaming (NDJSON/CSV) conforme o cabeçalho Accept
+    formato = formato_exportacao()
+    if formato:
+        filtros, valores = filtros_presencas()
+        query = "SELECT * FROM presenca"
+        if filtros:
+            query += " WHERE " + " AND ".join(filtros)
+        query += ordenacao(('data_presenca', 'id_presenca'), descendente=True)
+        return resposta_exportacao(formato, 'presencas', query, valores, COLUNAS_PRESENCA, presenca_para_dict)
+    
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
+        chave_ordem = ('data_presenca', 'id_presenca')
+        limite, chave = ler_paginacao(len(chave_ordem))
+        
         # Adicionando parâmetros de filtro opcionais
-        filtros = []
-        valores = []
+        filtros, valores = filtros_presencas()
         
-        id_aluno = request.args.get('id_aluno')
-        if id_aluno:
-            filtros.append("id_aluno = %s")
-            valores.append(id_aluno)
-            
-        data_inicio = request.args.get('data_inicio')
-        if data_inicio:
-            filtros.append("data_presenca >= %s")
-            valores.append(data_inicio)
-            
-        data_fim = request.args.get('data_fim')
-        if data_fim:
-            filtros.append("data_presenca <= %s")
-            valores.append(data_fim)
-            
-        presente = request.args.get('presente')
-        if presente is not None:
-            filtros.append("presente = %s")
-            valores.append(presente.lower() == 'true')
+        if chave:
+            filtro, params = filtro_keyset(chave_ordem, chave, descendente=True)
+            filtros.append(filtro)
+            valores.extend(params)
         
         # Construir a consulta com os filtros
         query = "SELECT * FROM presenca"
         if filtros:
             query += " WHERE " + " AND ".join(filtros)
-        query += " ORDER BY data_presenca DESC"
+        query += ordenacao(chave_ordem, descendente=True) + " LIMIT %s"
+        valores.append(limite + 1)
         
-        cursor.execute(query, tuple(valores))
-        presencas = cursor.fetchall()
+        if json_no_banco():
+            corpo, proximo = pagina_json(cursor, query, valores, CAMPOS_JSON_PRESENCA, chave_ordem, limite,
+                                         descendente=True)
+            return resposta_paginada(corpo, proximo), 200
         
-        result = []
-        for presenca in presencas:
-            # Convertendo objetos datetime para strings
-            data_presenca = presenca[2]
-            if isinstance(data_presenca, datetime.datetime):
-                data_presenca = data_presenca.strftime('%Y-%m-%d')
-                
-            result.append({
-                "id_presenca": presenca[0],
-                "id_aluno": presenca[1],
-                "data_presenca": data_presenca,
-                "presente": bool(presenca[3])  # Convertendo para booleano
-            })
+        cursor.execute(query, tuple(valores))
+        presencas, proximo = fatiar_pagina(cursor.fetchall(), limite, lambda presenca: (presenca[2], presenca[0]))
         
-        return jsonify(result), 200
+        result = [presenca_para_dict(presenca) for presenca in presencas]
+        return resposta_paginada(result, proximo), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/presencas/<int:id_presenca>', methods=['PUT'])
 @swag_from({
@@ -295,62 +443,89 @@ def update_presenca(id_presenca):
     if not data:
         return jsonify({"error": "Dados inválidos"}), 400
         
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        # Verificar se a presença existe
-        cursor.execute("SELECT * FROM presenca WHERE id_presenca = %s", (id_presenca,))
-        presenca_atual = cursor.fetchone()
-        if presenca_atual is None:
-            return jsonify({"error": "Presença não encontrada"}), 404
-            
-        # Verificar se o aluno existe, se estiver sendo atualizado
-        if 'id_aluno' in data:
-            cursor.execute("SELECT COUNT(*) FROM aluno WHERE id_aluno = %s", (data['id_aluno'],))
-            if cursor.fetchone()[0] == 0:
-                return jsonify({"error": "Aluno não encontrado"}), 404
-                
-        # Verificar se já existe uma presença para este aluno nesta data (evitar duplicidade)
-        if 'id_aluno' in data or 'data_presenca' in data:
-            id_aluno = data.get('id_aluno', presenca_atual[1])
-            data_presenca = data.get('data_presenca', presenca_atual[2])
-            
-            cursor.execute(
-                """
-                SELECT COUNT(*) FROM presenca 
-                WHERE id_aluno = %s 
-                AND data_presenca = %s 
-                AND id_presenca != %s
-                """,
-                (id_aluno, data_presenca, id_presenca)
-            )
-            if cursor.fetchone()[0] > 0:
-                return jsonify({"error": "Já existe um registro de presença para este aluno nesta data"}), 400
-        
+        conjunto, valores = atribuicoes(data, ['id_aluno', 'data_presenca', 'presente'], 'id_presenca')
         cursor.execute(
-            """
-            UPDATE presenca
-            SET id_aluno = %s, data_presenca = %s, presente = %s
-            WHERE id_presenca = %s
-            """,
-            (
-                data.get('id_aluno', presenca_atual[1]),
-                data.get('data_presenca', presenca_atual[2]),
-                data.get('presente', presenca_atual[3]),
-                id_presenca
-            )
+            f"UPDATE presenca SET {conjunto} WHERE id_presenca = %s RETURNING id_presenca",
+            tuple(valores) + (id_presenca,)
         )
+        if cursor.fetchone() is None:
+            conn.rollback()
+            return jsonify({"error": "Presença não encontrada"}), 404
         conn.commit()
         return jsonify({"message": "Presença atualizada com sucesso"}), 200
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_PRESENCA)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
+
+@app.route('/presencas/<int:id_presenca>', methods=['PATCH'])
+@swag_from({
+    'tags': ['Presencas'],
+    'description': 'Atualiza só os campos enviados de uma presença e devolve a presença atualizada.',
+    'parameters': [
+        {
+            'name': 'id_presenca',
+            'in': 'path',
+            'required': True,
+            'type': 'integer'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'id_aluno': {'type': 'integer'},
+                    'data_presenca': {'type': 'string', 'format': 'date'},
+                    'presente': {'type': 'boolean'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Presença atualizada'},
+        400: {'description': 'Nenhum campo enviado, campo não editável ou erro na requisição'},
+        404: {'description': 'Presença não encontrada'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def patch_presenca(id_presenca):
+    try:
+        campos = campos_patch(request.get_json(), COLUNAS_PRESENCA[1:])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        presenca = atualizar_parcial(cursor, 'presenca', campos, {'id_presenca': id_presenca}, COLUNAS_PRESENCA)
+        if presenca is None:
+            conn.rollback()
+            return jsonify({"error": "Presença não encontrada"}), 404
+        conn.commit()
+        return jsonify(presenca_para_dict(presenca)), 200
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_PRESENCA)
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/presencas/<int:id_presenca>', methods=['DELETE'])
 @swag_from({
@@ -369,7 +544,7 @@ def update_presenca(id_presenca):
     }
 })
 def delete_presenca(id_presenca):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Não foi possível conectar ao banco de dados"}), 500
         
@@ -384,5 +559,4 @@ def delete_presenca(id_presenca):
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        cursor.close()
\ No newline at end of file
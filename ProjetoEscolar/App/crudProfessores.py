@@ -1,10 +1,19 @@
 from flask import Blueprint, request, jsonify
-from .Utils.bd import create_connection
+from .Utils.bd import get_connection
+from .Utils.condicional import get_condicional, chave_listagem
+from .Utils.escrita import campos_patch, atualizar_parcial
+from .Utils import cache
+from .Utils.importacao import importar_csv, arquivo_importacao
+from .Utils.paginacao import (AVISO_PAGINACAO, PARAMETROS_PAGINACAO, CABECALHOS_PAGINACAO, ler_paginacao,
+                              PARAMETRO_IDS, ler_ids, resposta_lote,
+                              filtro_keyset, ordenacao, fatiar_pagina, resposta_paginada)
 from flasgger import swag_from
 
 # Blueprint para rotas de professores
 app = Blueprint('professores', __name__)
 
+COLUNAS_PROFESSOR = ['id_professor', 'nome_completo', 'email', 'telefone']
+
 @app.route('/professores', methods=['POST'])
 @swag_from({
     'tags': ['Professores'],
@@ -45,7 +54,7 @@ app = Blueprint('professores', __name__)
 })
 def create_professor():
     data = request.get_json()
-    conn = create_connection()
+    conn = get_connection()
     if conn is None:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
     
@@ -61,6 +70,7 @@ def create_professor():
         )
         id_professor = cursor.fetchone()[0]
         conn.commit()
+        cache.invalidar('professores')
         return jsonify({"message": "Professor criado com sucesso", "id_professor": id_professor}), 201
     except Exception as e:
         conn.rollback()
@@ -68,7 +78,6 @@ def create_professor():
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/professores/<int:id_professor>', methods=['GET'])
 @swag_from({
@@ -97,8 +106,10 @@ def create_professor():
         500: {'description': 'Erro no servidor'}
     }
 })
+# Cache no get_condicional, com as versões das tabelas: um acerto não usa conexão do pool
+@get_condicional('professor', cache=cache.professores, chave=lambda id_professor: ('professor', id_professor))
 def read_professor(id_professor):
-    conn = create_connection()
+    conn = get_connection()
     if conn is None:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
     
@@ -108,26 +119,28 @@ def read_professor(id_professor):
         professor = cursor.fetchone()
         if professor is None:
             return jsonify({"error": "Professor não encontrado"}), 404
-        return jsonify({
+        result = {
             "id_professor": professor[0],
             "nome_completo": professor[1],
             "email": professor[2],
             "telefone": professor[3]
-        }), 200
+        }
+        return jsonify(result), 200
     except Exception as e:
         print(f"Erro ao buscar professor: {str(e)}")
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/professores', methods=['GET'])
 @swag_from({
     'tags': ['Professores'],
-    'description': 'Lista todos os professores cadastrados.',
+    'description': 'Lista os professores cadastrados, paginados por nome. ' + AVISO_PAGINACAO,
+    'parameters': [PARAMETRO_IDS] + PARAMETROS_PAGINACAO,
     'responses': {
         200: {
             'description': 'Lista de professores',
+            'headers': CABECALHOS_PAGINACAO,
             'schema': {
                 'type': 'array',
                 'items': {
@@ -144,15 +157,37 @@ def read_professor(id_professor):
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('professor', cache=cache.professores, chave=chave_listagem)
 def read_all_professores():
-    conn = create_connection()
+    # Busca em lote (ids=1,2,3): uma consulta, sem paginação
+    try:
+        ids = ler_ids()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    conn = get_connection()
     if conn is None:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
     
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM professor ORDER BY nome_completo")
-        professores = cursor.fetchall()
+        if ids is not None:
+            return resposta_lote(cursor, f"SELECT {', '.join(COLUNAS_PROFESSOR)} FROM professor WHERE id_professor = ANY(%s)",
+                                 ids, lambda professor: dict(zip(COLUNAS_PROFESSOR, professor))), 200
+        
+        chave_ordem = ('nome_completo', 'id_professor')
+        limite, chave = ler_paginacao(len(chave_ordem))
+        
+        query = "SELECT * FROM professor"
+        valores = []
+        if chave:
+            filtro, valores = filtro_keyset(chave_ordem, chave)
+            query += " WHERE " + filtro
+        query += ordenacao(chave_ordem) + " LIMIT %s"
+        valores.append(limite + 1)
+        
+        cursor.execute(query, tuple(valores))
+        professores, proximo = fatiar_pagina(cursor.fetchall(), limite, lambda professor: (professor[1], professor[0]))
         
         result = []
         for professor in professores:
@@ -163,13 +198,12 @@ def read_all_professores():
                 "telefone": professor[3]
             })
         
-        return jsonify(result), 200
+        return resposta_paginada(result, proximo), 200
     except Exception as e:
         print(f"Erro ao listar professores: {str(e)}")
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/professores/<int:id_professor>', methods=['PUT'])
 @swag_from({
@@ -211,7 +245,7 @@ def read_all_professores():
 })
 def update_professor(id_professor):
     data = request.get_json()
-    conn = create_connection()
+    conn = get_connection()
     if conn is None:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
     
@@ -226,6 +260,8 @@ def update_professor(id_professor):
             (data['nome_completo'], data.get('email'), data.get('telefone'), id_professor)
         )
         conn.commit()
+        # O nome do professor também aparece nas turmas
+        cache.invalidar('professores', 'turmas')
         if cursor.rowcount == 0:
             return jsonify({"error": "Professor não encontrado"}), 404
         return jsonify({"message": "Professor atualizado com sucesso"}), 200
@@ -235,7 +271,64 @@ def update_professor(id_professor):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
+
+@app.route('/professores/<int:id_professor>', methods=['PATCH'])
+@swag_from({
+    'tags': ['Professores'],
+    'description': 'Atualiza só os campos enviados de um professor e devolve o professor atualizado.',
+    'parameters': [
+        {
+            'name': 'id_professor',
+            'in': 'path',
+            'required': True,
+            'type': 'integer'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'nome_completo': {'type': 'string'},
+                    'email': {'type': 'string'},
+                    'telefone': {'type': 'string'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Professor atualizado'},
+        400: {'description': 'Nenhum campo enviado, campo não editável ou erro na requisição'},
+        404: {'description': 'Professor não encontrado'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def patch_professor(id_professor):
+    try:
+        campos = campos_patch(request.get_json(), COLUNAS_PROFESSOR[1:])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        professor = atualizar_parcial(cursor, 'professor', campos, {'id_professor': id_professor}, COLUNAS_PROFESSOR)
+        if professor is None:
+            conn.rollback()
+            return jsonify({"error": "Professor não encontrado"}), 404
+        conn.commit()
+        # O nome do professor também aparece nas turmas
+        cache.invalidar('professores', 'turmas')
+        return jsonify(dict(zip(COLUNAS_PROFESSOR, professor))), 200
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
 
 @app.route('/professores/<int:id_professor>', methods=['DELETE'])
 @swag_from({
@@ -255,7 +348,7 @@ def update_professor(id_professor):
     }
 })
 def delete_professor(id_professor):
-    conn = create_connection()
+    conn = get_connection()
     if conn is None:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
     
@@ -275,6 +368,7 @@ def delete_professor(id_professor):
         # Excluir o professor
         cursor.execute("DELETE FROM professor WHERE id_professor = %s", (id_professor,))
         conn.commit()
+        cache.invalidar('professores', 'turmas')
         return jsonify({"message": "Professor deletado com sucesso"}), 200
     except Exception as e:
         conn.rollback()
@@ -282,4 +376,56 @@ def delete_professor(id_professor):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+
+@app.route('/professores/importacao', methods=['POST'])
+@swag_from({
+    'tags': ['Professores'],
+    'description': 'Importa professores em massa a partir de um CSV com cabeçalho (separado por vírgula ou ponto e vírgula). Colunas aceitas: nome_completo*, email, telefone (* obrigatórias). Linhas inválidas são rejeitadas e listadas no relatório; as demais são gravadas.',
+    'consumes': ['text/csv', 'multipart/form-data'],
+    'parameters': [
+        {
+            'name': 'arquivo',
+            'in': 'formData',
+            'type': 'file',
+            'required': False,
+            'description': 'Arquivo CSV (alternativamente, envie o CSV como corpo com Content-Type text/csv)'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Relatório da importação',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'importados': {'type': 'integer'},
+                    'rejeitados': {'type': 'integer'},
+                    'erros': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'linha': {'type': 'integer'},
+                                'erro': {'type': 'string'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'CSV inválido'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def importar_professores():
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+    
+    try:
+        relatorio = importar_csv(conn, 'professores', arquivo_importacao())
+        conn.commit()
+        cache.invalidar('professores')
+        return jsonify(relatorio), 200
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
\ No newline at end of file
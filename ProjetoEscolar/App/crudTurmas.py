@@ -1,9 +1,42 @@
+import psycopg2
 from flask import Blueprint, request, jsonify
-from .Utils.bd import create_connection
+from .Utils.bd import get_connection
+from .Utils.condicional import get_condicional, chave_listagem
+from .Utils.escrita import resposta_integridade, campos_patch, atualizar_parcial
+from .Utils import cache
+from .Utils.inclusoes import parametro_include, pedidas, ler_inclusoes, carregar, aninhar
+from .Utils.paginacao import (AVISO_PAGINACAO, PARAMETROS_PAGINACAO, CABECALHOS_PAGINACAO, ler_paginacao,
+                              PARAMETRO_IDS, ler_ids, resposta_lote,
+                              filtro_keyset, ordenacao, fatiar_pagina, resposta_paginada)
+from .crudAlunos import aluno_para_dict
+from .crudProfessores import COLUNAS_PROFESSOR
 from flasgger import swag_from
 
 app = Blueprint('turmas', __name__)
 
+COLUNAS_TURMA = ['id_turma', 'nome_turma', 'id_professor', 'horario']
+
+# Relações aceitas em include= nas rotas GET de turmas, e as tabelas de cada uma (ETag)
+INCLUSOES_TURMA = ['alunos', 'professor']
+TABELAS_INCLUSOES_TURMA = {'alunos': ('aluno',)}
+
+def incluir_relacoes_turmas(cursor, turmas, inclusoes):
+    """Embute nas turmas as relações pedidas em include=, com uma consulta por relação."""
+    if 'alunos' in inclusoes:
+        alunos = carregar(cursor, "SELECT * FROM aluno WHERE id_turma = ANY(%s) ORDER BY nome_completo, id_aluno",
+                          [turma['id_turma'] for turma in turmas], aluno_para_dict, posicao_chave=3)
+        aninhar(turmas, 'alunos', 'id_turma', alunos)
+    if 'professor' in inclusoes:
+        professores = carregar(cursor, f"SELECT {', '.join(COLUNAS_PROFESSOR)} FROM professor WHERE id_professor = ANY(%s)",
+                               [turma['id_professor'] for turma in turmas],
+                               lambda professor: dict(zip(COLUNAS_PROFESSOR, professor)))
+        aninhar(turmas, 'professor', 'id_professor', professores, unico=True)
+
+# Restrições da tabela turma -> resposta das rotas de escrita (Utils/escrita.py)
+ERROS_TURMA = {
+    'turma_id_professor_fkey': ("Professor não encontrado", 400),
+}
+
 @app.route('/turmas', methods=['POST'])
 @swag_from({
     'tags': ['Turmas'],
@@ -49,18 +82,13 @@ def create_turma():
     if not data or 'nome_turma' not in data:
         return jsonify({"error": "Nome da turma é obrigatório"}), 400
         
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        # Verificar se o professor existe, caso tenha sido informado
-        if 'id_professor' in data and data['id_professor']:
-            cursor.execute("SELECT COUNT(*) FROM professor WHERE id_professor = %s", (data['id_professor'],))
-            if cursor.fetchone()[0] == 0:
-                return jsonify({"error": "Professor não encontrado"}), 400
-        
+        # Professor inexistente é barrado pela chave estrangeira (ERROS_TURMA)
         cursor.execute(
             """
             INSERT INTO turma (nome_turma, id_professor, horario)
@@ -71,13 +99,16 @@ def create_turma():
         )
         id_turma = cursor.fetchone()[0]
         conn.commit()
+        cache.invalidar('turmas')
         return jsonify({"message": "Turma criada com sucesso", "id_turma": id_turma}), 201
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_TURMA)
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/turmas/<int:id_turma>', methods=['GET'])
 @swag_from({
@@ -88,7 +119,7 @@ def create_turma():
         'in': 'path',
         'required': True,
         'type': 'integer'
-    }],
+    }, parametro_include(INCLUSOES_TURMA)],
     'responses': {
         200: {
             'description': 'Dados da turma',
@@ -107,8 +138,18 @@ def create_turma():
         500: {'description': 'Erro no servidor'}
     }
 })
+# O cache fica no get_condicional, com as versões das tabelas: um acerto não usa
+# conexão do pool. Com include= a resposta depende de outras tabelas (alunos) e
+# fica fora do cache
+@get_condicional('turma', 'professor', inclusoes=TABELAS_INCLUSOES_TURMA, cache=cache.turmas,
+                 chave=lambda id_turma: None if pedidas() else ('turma', id_turma))
 def read_turma(id_turma):
-    conn = create_connection()
+    try:
+        inclusoes = ler_inclusoes(INCLUSOES_TURMA)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -123,26 +164,30 @@ def read_turma(id_turma):
         turma = cursor.fetchone()
         if turma is None:
             return jsonify({"error": "Turma não encontrada"}), 404
-        return jsonify({
+        result = {
             "id_turma": turma[0],
             "nome_turma": turma[1],
             "id_professor": turma[2],
             "horario": turma[3],
             "nome_professor": turma[4]
-        }), 200
+        }
+        if inclusoes:
+            incluir_relacoes_turmas(cursor, [result], inclusoes)
+        return jsonify(result), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/turmas', methods=['GET'])
 @swag_from({
     'tags': ['Turmas'],
-    'description': 'Lista todas as turmas cadastradas.',
+    'description': 'Lista as turmas cadastradas, paginadas por nome. ' + AVISO_PAGINACAO,
+    'parameters': [PARAMETRO_IDS, parametro_include(INCLUSOES_TURMA)] + PARAMETROS_PAGINACAO,
     'responses': {
         200: {
             'description': 'Lista de turmas',
+            'headers': CABECALHOS_PAGINACAO,
             'schema': {
                 'type': 'array',
                 'items': {
@@ -160,20 +205,51 @@ def read_turma(id_turma):
         500: {'description': 'Erro no servidor'}
     }
 })
+# Mesmo cache do read_turma, com limit/cursor/ids na chave e fora dele com include=
+@get_condicional('turma', 'professor', inclusoes=TABELAS_INCLUSOES_TURMA, cache=cache.turmas,
+                 chave=lambda: None if pedidas() else chave_listagem())
 def read_all_turmas():
-    conn = create_connection()
+    # Busca em lote (ids=1,2,3): uma consulta, sem paginação
+    try:
+        ids = ler_ids()
+        inclusoes = ler_inclusoes(INCLUSOES_TURMA)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        cursor.execute("""
+        if ids is not None:
+            query = """
+                SELECT t.id_turma, t.nome_turma, t.id_professor, t.horario, p.nome_completo as nome_professor
+                FROM turma t
+                LEFT JOIN professor p ON t.id_professor = p.id_professor
+                WHERE t.id_turma = ANY(%s)
+            """
+            return resposta_lote(cursor, query, ids,
+                                 lambda turma: dict(zip(COLUNAS_TURMA + ['nome_professor'], turma)),
+                                 lambda turmas: incluir_relacoes_turmas(cursor, turmas, inclusoes)), 200
+        
+        chave_ordem = ('t.nome_turma', 't.id_turma')
+        limite, chave = ler_paginacao(len(chave_ordem))
+        
+        query = """
             SELECT t.id_turma, t.nome_turma, t.id_professor, t.horario, p.nome_completo as nome_professor
             FROM turma t
             LEFT JOIN professor p ON t.id_professor = p.id_professor
-            ORDER BY t.nome_turma
-        """)
-        turmas = cursor.fetchall()
+        """
+        valores = []
+        if chave:
+            filtro, valores = filtro_keyset(chave_ordem, chave)
+            query += " WHERE " + filtro
+        query += ordenacao(chave_ordem) + " LIMIT %s"
+        valores.append(limite + 1)
+        
+        cursor.execute(query, tuple(valores))
+        turmas, proximo = fatiar_pagina(cursor.fetchall(), limite, lambda turma: (turma[1], turma[0]))
         
         result = []
         for turma in turmas:
@@ -185,12 +261,13 @@ def read_all_turmas():
                 "nome_professor": turma[4]
             })
         
-        return jsonify(result), 200
+        if inclusoes:
+            incluir_relacoes_turmas(cursor, result, inclusoes)
+        return resposta_paginada(result, proximo), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/turmas/<int:id_turma>', methods=['PUT'])
 @swag_from({
@@ -237,39 +314,95 @@ def update_turma(id_turma):
     if not data or 'nome_turma' not in data:
         return jsonify({"error": "Nome da turma é obrigatório"}), 400
         
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        # Verificar se a turma existe
-        cursor.execute("SELECT COUNT(*) FROM turma WHERE id_turma = %s", (id_turma,))
-        if cursor.fetchone()[0] == 0:
-            return jsonify({"error": "Turma não encontrada"}), 404
-            
-        # Verificar se o professor existe, caso tenha sido informado
-        if 'id_professor' in data and data['id_professor']:
-            cursor.execute("SELECT COUNT(*) FROM professor WHERE id_professor = %s", (data['id_professor'],))
-            if cursor.fetchone()[0] == 0:
-                return jsonify({"error": "Professor não encontrado"}), 400
-                
         cursor.execute(
             """
             UPDATE turma
             SET nome_turma = %s, id_professor = %s, horario = %s
             WHERE id_turma = %s
+            RETURNING id_turma
             """,
             (data['nome_turma'], data.get('id_professor'), data.get('horario'), id_turma)
         )
+        if cursor.fetchone() is None:
+            conn.rollback()
+            return jsonify({"error": "Turma não encontrada"}), 404
         conn.commit()
+        cache.invalidar('turmas')
         return jsonify({"message": "Turma atualizada com sucesso"}), 200
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_TURMA)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
+
+@app.route('/turmas/<int:id_turma>', methods=['PATCH'])
+@swag_from({
+    'tags': ['Turmas'],
+    'description': 'Atualiza só os campos enviados de uma turma e devolve a turma atualizada.',
+    'parameters': [
+        {
+            'name': 'id_turma',
+            'in': 'path',
+            'required': True,
+            'type': 'integer'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'nome_turma': {'type': 'string'},
+                    'id_professor': {'type': 'integer'},
+                    'horario': {'type': 'string'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Turma atualizada'},
+        400: {'description': 'Nenhum campo enviado, campo não editável ou erro na requisição'},
+        404: {'description': 'Turma não encontrada'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+def patch_turma(id_turma):
+    try:
+        campos = campos_patch(request.get_json(), COLUNAS_TURMA[1:])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        turma = atualizar_parcial(cursor, 'turma', campos, {'id_turma': id_turma}, COLUNAS_TURMA)
+        if turma is None:
+            conn.rollback()
+            return jsonify({"error": "Turma não encontrada"}), 404
+        conn.commit()
+        cache.invalidar('turmas')
+        return jsonify(dict(zip(COLUNAS_TURMA, turma))), 200
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_TURMA)
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/turmas/<int:id_turma>', methods=['DELETE'])
 @swag_from({
@@ -289,7 +422,7 @@ def update_turma(id_turma):
     }
 })
 def delete_turma(id_turma):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -306,10 +439,10 @@ def delete_turma(id_turma):
         # Excluir a turma
         cursor.execute("DELETE FROM turma WHERE id_turma = %s", (id_turma,))
         conn.commit()
+        cache.invalidar('turmas')
         return jsonify({"message": "Turma deletada com sucesso"}), 200
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        cursor.close()
\ No newline at end of file
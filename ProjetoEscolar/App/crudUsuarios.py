@@ -1,11 +1,26 @@
-from flask import Blueprint, request, jsonify
-from .Utils.bd import create_connection
-import bcrypt
+import psycopg2
+from flask import Blueprint, request, jsonify, g
+from .Utils.bd import get_connection
+from .Utils.condicional import get_condicional
+from .Utils.escrita import resposta_integridade, atribuicoes, campos_patch, atualizar_parcial
+from .Utils import limites, senhas, tokens
+from .Utils.compressao import sem_compressao
+from .Utils.paginacao import (AVISO_PAGINACAO, PARAMETROS_PAGINACAO, CABECALHOS_PAGINACAO, ler_paginacao,
+                              filtro_keyset, ordenacao, fatiar_pagina, resposta_paginada)
 import re
 from flasgger import swag_from
 
 app = Blueprint('usuarios', __name__)
 
+# Colunas devolvidas nas respostas (a senha nunca sai da tabela)
+COLUNAS_USUARIO = ['id_usuario', 'login', 'nivel_acesso', 'id_professor']
+
+# Restrições da tabela usuario -> resposta das rotas de escrita (Utils/escrita.py)
+ERROS_USUARIO = {
+    'usuario_login_key': ("Login já existe", 400),
+    'usuario_id_professor_fkey': ("Professor não encontrado", 400),
+}
+
 def validar_senha(senha):
     """Verifica se a senha tem pelo menos 8 caracteres, incluindo letras e números"""
     if len(senha) < 8:
@@ -51,7 +66,8 @@ def validar_senha(senha):
             }
         },
         400: {'description': 'Erro na requisição ou dados inválidos'},
-        500: {'description': 'Erro no servidor'}
+        500: {'description': 'Erro no servidor'},
+        503: {'description': 'Muitas operações de senha em andamento (ver Retry-After)'}
     }
 })
 def create_usuario():
@@ -65,19 +81,20 @@ def create_usuario():
     if not validar_senha(data['senha']):
         return jsonify({"error": "Senha deve ter pelo menos 8 caracteres, incluindo letras e números"}), 400
     
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
     
     cursor = conn.cursor()
     try:
-        # Verificar se o login já existe
+        # Verificar se o login já existe antes do hash (caro); a restrição UNIQUE
+        # cobre o caso de dois cadastros simultâneos com o mesmo login
         cursor.execute("SELECT COUNT(*) FROM usuario WHERE login = %s", (data['login'],))
         if cursor.fetchone()[0] > 0:
             return jsonify({"error": "Login já existe"}), 400
         
-        # Criptografia da senha usando bcrypt
-        hashed_password = bcrypt.hashpw(data['senha'].encode('utf-8'), bcrypt.gensalt())
+        # Criptografia da senha usando bcrypt (no pool de processos de senhas)
+        hashed_password = senhas.gerar_hash(data['senha'])
         
         cursor.execute(
             """
@@ -85,17 +102,22 @@ def create_usuario():
             VALUES (%s, %s, %s, %s)
             RETURNING id_usuario
             """,
-            (data['login'], hashed_password.decode('utf-8'), data.get('nivel_acesso', 'usuario'), data.get('id_professor'))
+            (data['login'], hashed_password, data.get('nivel_acesso', 'usuario'), data.get('id_professor'))
         )
         id_usuario = cursor.fetchone()[0]
         conn.commit()
         return jsonify({"message": "Usuário criado com sucesso", "id_usuario": id_usuario}), 201
+    except senhas.Sobrecarga:
+        conn.rollback()
+        return senhas.resposta_sobrecarga()
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_USUARIO)
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/usuarios/<int:id_usuario>', methods=['GET'])
 @swag_from({
@@ -124,8 +146,9 @@ def create_usuario():
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('usuario')
 def read_usuario(id_usuario):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -145,15 +168,16 @@ def read_usuario(id_usuario):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/usuarios', methods=['GET'])
 @swag_from({
     'tags': ['Usuários'],
-    'description': 'Lista todos os usuários cadastrados.',
+    'description': 'Lista os usuários cadastrados. ' + AVISO_PAGINACAO,
+    'parameters': PARAMETROS_PAGINACAO,
     'responses': {
         200: {
             'description': 'Lista de usuários',
+            'headers': CABECALHOS_PAGINACAO,
             'schema': {
                 'type': 'array',
                 'items': {
@@ -170,15 +194,27 @@ def read_usuario(id_usuario):
         500: {'description': 'Erro no servidor'}
     }
 })
+@get_condicional('usuario')
 def read_all_usuarios():
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT id_usuario, login, nivel_acesso, id_professor FROM usuario")
-        usuarios = cursor.fetchall()
+        chave_ordem = ('id_usuario',)
+        limite, chave = ler_paginacao(len(chave_ordem))
+        
+        query = "SELECT id_usuario, login, nivel_acesso, id_professor FROM usuario"
+        valores = []
+        if chave:
+            filtro, valores = filtro_keyset(chave_ordem, chave)
+            query += " WHERE " + filtro
+        query += ordenacao(chave_ordem) + " LIMIT %s"
+        valores.append(limite + 1)
+        
+        cursor.execute(query, tuple(valores))
+        usuarios, proximo = fatiar_pagina(cursor.fetchall(), limite, lambda usuario: (usuario[0],))
         
         result = []
         for usuario in usuarios:
@@ -189,12 +225,11 @@ def read_all_usuarios():
                 "id_professor": usuario[3]
             })
         
-        return jsonify(result), 200
+        return resposta_paginada(result, proximo), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/usuarios/<int:id_usuario>', methods=['PUT'])
 @swag_from({
@@ -232,7 +267,8 @@ def read_all_usuarios():
         200: {'description': 'Usuário atualizado com sucesso'},
         400: {'description': 'Erro na requisição ou dados inválidos'},
         404: {'description': 'Usuário não encontrado'},
-        500: {'description': 'Erro no servidor'}
+        500: {'description': 'Erro no servidor'},
+        503: {'description': 'Muitas operações de senha em andamento (ver Retry-After)'}
     }
 })
 def update_usuario(id_usuario):
@@ -241,58 +277,112 @@ def update_usuario(id_usuario):
     # Validação básica
     if not data:
         return jsonify({"error": "Dados inválidos"}), 400
+    if 'senha' in data and not validar_senha(data['senha']):
+        return jsonify({"error": "Senha deve ter pelo menos 8 caracteres, incluindo letras e números"}), 400
         
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
-        # Verificar se o usuário existe
-        cursor.execute("SELECT * FROM usuario WHERE id_usuario = %s", (id_usuario,))
-        if cursor.fetchone() is None:
-            return jsonify({"error": "Usuário não encontrado"}), 404
-        
-        # Se a senha for atualizada, validar e criptografar
-        if 'senha' in data:
-            if not validar_senha(data['senha']):
-                return jsonify({"error": "Senha deve ter pelo menos 8 caracteres, incluindo letras e números"}), 400
-            hashed_password = bcrypt.hashpw(data['senha'].encode('utf-8'), bcrypt.gensalt())
-            password_value = hashed_password.decode('utf-8')
-        else:
-            # Manter a senha atual
-            cursor.execute("SELECT senha FROM usuario WHERE id_usuario = %s", (id_usuario,))
-            password_value = cursor.fetchone()[0]
-        
-        # Se o login for atualizado, verificar duplicidade
+        # Login e senha só mudam se enviados; nivel_acesso e id_professor são substituídos
+        campos = {'nivel_acesso': data.get('nivel_acesso'), 'id_professor': data.get('id_professor')}
         if 'login' in data:
-            cursor.execute("SELECT COUNT(*) FROM usuario WHERE login = %s AND id_usuario != %s", (data['login'], id_usuario))
-            if cursor.fetchone()[0] > 0:
-                return jsonify({"error": "Login já existe"}), 400
-            login_value = data['login']
-        else:
-            cursor.execute("SELECT login FROM usuario WHERE id_usuario = %s", (id_usuario,))
-            login_value = cursor.fetchone()[0]
-            
-        nivel_acesso = data.get('nivel_acesso')
-        id_professor = data.get('id_professor')
+            campos['login'] = data['login']
+        if 'senha' in data:
+            campos['senha'] = senhas.gerar_hash(data['senha'])
         
+        # Usuário inexistente: nenhuma linha no RETURNING; login repetido: restrição UNIQUE
+        conjunto, valores = atribuicoes(campos, ['login', 'senha', 'nivel_acesso', 'id_professor'], 'id_usuario')
         cursor.execute(
-            """
-            UPDATE usuario
-            SET login = %s, senha = %s, nivel_acesso = %s, id_professor = %s
-            WHERE id_usuario = %s
-            """,
-            (login_value, password_value, nivel_acesso, id_professor, id_usuario)
+            f"UPDATE usuario SET {conjunto} WHERE id_usuario = %s RETURNING id_usuario",
+            tuple(valores) + (id_usuario,)
         )
+        if cursor.fetchone() is None:
+            conn.rollback()
+            return jsonify({"error": "Usuário não encontrado"}), 404
         conn.commit()
         return jsonify({"message": "Usuário atualizado com sucesso"}), 200
+    except senhas.Sobrecarga:
+        conn.rollback()
+        return senhas.resposta_sobrecarga()
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_USUARIO)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
+
+@app.route('/usuarios/<int:id_usuario>', methods=['PATCH'])
+@swag_from({
+    'tags': ['Usuários'],
+    'description': 'Atualiza só os campos enviados de um usuário e devolve o usuário atualizado (sem a senha).',
+    'parameters': [
+        {
+            'name': 'id_usuario',
+            'in': 'path',
+            'required': True,
+            'type': 'integer'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'login': {'type': 'string'},
+                    'senha': {'type': 'string'},
+                    'nivel_acesso': {'type': 'string'},
+                    'id_professor': {'type': 'integer'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Usuário atualizado (sem a senha)'},
+        400: {'description': 'Nenhum campo enviado, campo não editável ou erro na requisição'},
+        404: {'description': 'Usuário não encontrado'},
+        500: {'description': 'Erro no servidor'},
+        503: {'description': 'Muitas operações de senha em andamento (ver Retry-After)'}
+    }
+})
+def patch_usuario(id_usuario):
+    try:
+        campos = campos_patch(request.get_json(), COLUNAS_USUARIO[1:] + ['senha'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if 'senha' in campos and not validar_senha(campos['senha'] or ''):
+        return jsonify({"error": "Senha deve ter pelo menos 8 caracteres, incluindo letras e números"}), 400
+        
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        if 'senha' in campos:
+            campos = dict(campos, senha=senhas.gerar_hash(campos['senha']))
+        usuario = atualizar_parcial(cursor, 'usuario', campos, {'id_usuario': id_usuario}, COLUNAS_USUARIO)
+        if usuario is None:
+            conn.rollback()
+            return jsonify({"error": "Usuário não encontrado"}), 404
+        conn.commit()
+        return jsonify(dict(zip(COLUNAS_USUARIO, usuario))), 200
+    except senhas.Sobrecarga:
+        conn.rollback()
+        return senhas.resposta_sobrecarga()
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        return resposta_integridade(e, ERROS_USUARIO)
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 @app.route('/usuarios/<int:id_usuario>', methods=['DELETE'])
 @swag_from({
@@ -311,7 +401,7 @@ def update_usuario(id_usuario):
     }
 })
 def delete_usuario(id_usuario):
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
@@ -327,7 +417,6 @@ def delete_usuario(id_usuario):
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
 
 # Rota de autenticação
 @app.route('/login', methods=['POST'])
@@ -357,45 +446,216 @@ def delete_usuario(id_usuario):
             'schema': {
                 'type': 'object',
                 'properties': {
-                    'message': {'type': 'string'}
+                    'message': {'type': 'string'},
+                    'access_token': {'type': 'string'},
+                    'refresh_token': {'type': 'string'},
+                    'token_type': {'type': 'string'},
+                    'expires_in': {'type': 'integer'}
                 }
             }
         },
-        400: {'description': 'Dados incompletos'},
+        400: {'description': 'Dados incompletos ou login/senha que não são texto'},
         401: {'description': 'Usuário ou senha inválidos'},
-        500: {'description': 'Erro no servidor'}
+        429: {'description': 'Muitas tentativas de login (ver Retry-After)'},
+        500: {'description': 'Erro no servidor'},
+        503: {'description': 'Muitas operações de senha em andamento (ver Retry-After)'}
     }
 })
+@sem_compressao
+@tokens.token_opcional
 def login():
     data = request.get_json()
     
-    if not data or 'login' not in data or 'senha' not in data:
+    if not isinstance(data, dict) or 'login' not in data or 'senha' not in data:
         return jsonify({"error": "Informe login e senha"}), 400
+    if not isinstance(data['login'], str) or not isinstance(data['senha'], str):
+        return jsonify({"error": "Login e senha devem ser texto"}), 400
+    
+    # Limite de tentativas por IP e por login, antes de qualquer trabalho do
+    # bcrypt. Com os baldes em memória, também antes de reservar uma conexão:
+    # uma rajada de tentativas recusadas não ocupa o pool.
+    limite_no_banco = limites.no_banco()
+    if not limite_no_banco:
+        espera = limites.verificar_login(None, request.remote_addr, data['login'])
+        if espera is not None:
+            return limites.resposta_limite(espera)
     
-    conn = create_connection()
+    conn = get_connection()
     if not conn:
         return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
         
     cursor = conn.cursor()
     try:
+        if limite_no_banco:
+            espera = limites.verificar_login(conn, request.remote_addr, data['login'])
+            if espera is not None:
+                return limites.resposta_limite(espera)
+        
         cursor.execute("SELECT id_usuario, login, senha, nivel_acesso FROM usuario WHERE login = %s", (data['login'],))
         usuario = cursor.fetchone()
         
         if not usuario:
             return jsonify({"error": "Usuário ou senha inválidos"}), 401
             
-        # Verificar senha com bcrypt
-        if bcrypt.checkpw(data['senha'].encode('utf-8'), usuario[2].encode('utf-8')):
-            return jsonify({
+        # Verificar senha com bcrypt (no pool de processos de senhas)
+        senha_correta, novo_hash = senhas.verificar(data['senha'], usuario[2])
+        if senha_correta:
+            if novo_hash:
+                # Hash salvo com fator de trabalho diferente do configurado: atualiza
+                cursor.execute(
+                    "UPDATE usuario SET senha = %s WHERE id_usuario = %s AND senha = %s",
+                    (novo_hash, usuario[0], usuario[2])
+                )
+                conn.commit()
+            result = {
                 "id_usuario": usuario[0],
                 "login": usuario[1],
                 "nivel_acesso": usuario[3],
                 "message": "Login bem-sucedido"
-            }), 200
+            }
+            result.update(tokens.resposta_tokens(result))
+            return jsonify(result), 200
         else:
             return jsonify({"error": "Usuário ou senha inválidos"}), 401
+    except senhas.Sobrecarga:
+        return senhas.resposta_sobrecarga()
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+
+@app.route('/token/refresh', methods=['POST'])
+@swag_from({
+    'tags': ['Usuários'],
+    'description': 'Emite um novo token de acesso a partir do token de refresh, sem reenviar a senha.',
+    'parameters': [{
+        'name': 'body',
+        'in': 'body',
+        'required': True,
+        'schema': {
+            'type': 'object',
+            'properties': {
+                'refresh_token': {'type': 'string'}
+            },
+            'required': ['refresh_token'],
+            'example': {
+                'refresh_token': ''
+            }
+        }
+    }],
+    'responses': {
+        200: {'description': 'Novos tokens de acesso e refresh'},
+        400: {'description': 'Dados incompletos'},
+        401: {'description': 'Token de refresh inválido, expirado ou revogado'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+@sem_compressao
+@tokens.token_opcional
+def refresh_token():
+    data = request.get_json(silent=True)
+    
+    if not data or 'refresh_token' not in data:
+        return jsonify({"error": "Informe o refresh_token"}), 400
+    
+    try:
+        payload = tokens.verificar(data['refresh_token'], tokens.REFRESH)
+    except tokens.TokenInvalido as e:
+        return jsonify({"error": str(e)}), 401
+    
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        # Recarrega login e nível de acesso, que podem ter mudado desde o login
+        cursor.execute("SELECT id_usuario, login, nivel_acesso FROM usuario WHERE id_usuario = %s", (payload['sub'],))
+        usuario = cursor.fetchone()
+        if not usuario:
+            return jsonify({"error": "Usuário não encontrado"}), 401
+        
+        # O refresh usado é revogado: cada token de refresh vale uma única vez
+        if not revogar_token(cursor, payload):
+            conn.rollback()
+            return jsonify({"error": "Token revogado"}), 401
+        conn.commit()
+        
+        return jsonify(tokens.resposta_tokens({
+            "id_usuario": usuario[0],
+            "login": usuario[1],
+            "nivel_acesso": usuario[2]
+        })), 200
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
+
+@app.route('/logout', methods=['POST'])
+@swag_from({
+    'tags': ['Usuários'],
+    'description': 'Revoga o token de acesso do cabeçalho Authorization e o refresh_token informado.',
+    'parameters': [{
+        'name': 'body',
+        'in': 'body',
+        'required': False,
+        'schema': {
+            'type': 'object',
+            'properties': {
+                'refresh_token': {'type': 'string'}
+            }
+        }
+    }],
+    'responses': {
+        200: {'description': 'Tokens revogados'},
+        401: {'description': 'Token inválido'},
+        500: {'description': 'Erro no servidor'}
+    }
+})
+@tokens.token_opcional
+def logout():
+    data = request.get_json(silent=True) or {}
+    
+    revogar = []
+    if 'usuario' in g:
+        revogar.append(g.usuario)
+    if data.get('refresh_token'):
+        try:
+            revogar.append(tokens.verificar(data['refresh_token'], tokens.REFRESH))
+        except tokens.TokenInvalido as e:
+            return jsonify({"error": str(e)}), 401
+    if not revogar:
+        return jsonify({"error": "Informe o token de acesso ou o refresh_token"}), 401
+    
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Falha na conexão com o banco de dados"}), 500
+        
+    cursor = conn.cursor()
+    try:
+        for payload in revogar:
+            revogar_token(cursor, payload)
+        conn.commit()
+        return jsonify({"message": "Logout realizado com sucesso"}), 200
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
+
+def revogar_token(cursor, payload):
+    """
+    Registra o jti em token_revogado (propagado aos outros workers) e na lista local.
+    :return: False se o token já estava revogado
+    """
+    cursor.execute(
+        """
+        INSERT INTO token_revogado (jti, expira_em)
+        VALUES (%s, to_timestamp(%s))
+        ON CONFLICT (jti) DO NOTHING
+        """,
+        (payload['jti'], payload['exp'])
+    )
+    tokens.revogar_local(payload['jti'], payload['exp'])
+    return cursor.rowcount == 1
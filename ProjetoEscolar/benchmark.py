@@ -0,0 +1,445 @@
+"""
+Benchmark de carga da API contra um Postgres local.
+
+Cria um cluster temporário (initdb/pg_ctl do PATH), aplica db/escola.sql e as
+migrações, gera o volume de dados (App/Utils/geracao.py, o mesmo de
+gerar_dados.py), sobe a API no gunicorn (gunicorn.conf.py) e executa
+os cenários de carga, imprimindo um relatório JSON com latência p50/p95/p99,
+throughput e consultas SQL por requisição (lidas de /metrics) por endpoint.
+
+Uso:
+    python benchmark.py                                  # todos os cenários
+    python benchmark.py --cenarios chamada login --duracao 20 --concorrencia 32
+    python benchmark.py --saida resultados/$(git rev-parse --short HEAD).json
+    python benchmark.py --escolas 50 --anos 10           # volume de 50 escolas
+    python benchmark.py --cenarios dashboard --json-no-banco   # compara com a execução sem a opção
+    python benchmark.py --sem-cluster                    # banco de DB_HOST/DB_PORT..., dados já existentes
+
+Cenários:
+    dashboard  listagens e detalhes (metade dos clientes revalida com If-None-Match)
+    chamada    chamada da turma inteira em POST /turmas/<id>/presencas
+    login      rajada de logins (bcrypt)
+    misto      70% dashboard, 20% chamada, 10% login
+    exportacao exportação NDJSON das presenças mais recentes (--linhas-exportacao linhas)
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+import psycopg2
+from prometheus_client.parser import text_string_to_metric_families
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+CENARIOS = ('dashboard', 'chamada', 'login', 'misto', 'exportacao')
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def aguardar(condicao, limite, descricao):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if condicao():
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f"Tempo esgotado aguardando {descricao}")
+
+
+# Banco ----------------------------------------------------------------------
+
+class ClusterTemporario:
+    """Cluster Postgres descartável em um diretório temporário (autenticação trust)."""
+
+    def __init__(self):
+        self.diretorio = tempfile.mkdtemp(prefix='escola_bench_pg_')
+        self.porta = porta_livre()
+
+    def __enter__(self):
+        dados = os.path.join(self.diretorio, 'dados')
+        subprocess.run(['initdb', '-D', dados, '-U', 'admin', '--auth=trust', '-E', 'UTF8'],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run(['pg_ctl', '-D', dados, '-w', '-l', os.path.join(self.diretorio, 'postgres.log'),
+                        '-o', f"-p {self.porta} -k {self.diretorio} -c listen_addresses=127.0.0.1"
+                              " -c max_connections=200 -c fsync=off",
+                        'start'], check=True, stdout=subprocess.DEVNULL)
+        conn = psycopg2.connect(host='127.0.0.1', port=self.porta, user='admin', dbname='postgres')
+        conn.autocommit = True
+        conn.cursor().execute("CREATE DATABASE escola")
+        conn.close()
+        return self
+
+    def parametros(self):
+        return {'DB_HOST': '127.0.0.1', 'DB_PORT': str(self.porta), 'DB_NAME': 'escola', 'DB_USER': 'admin'}
+
+    def __exit__(self, *exc):
+        subprocess.run(['pg_ctl', '-D', os.path.join(self.diretorio, 'dados'), '-m', 'fast', 'stop'],
+                       stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+
+def conectar(parametros):
+    return psycopg2.connect(host=parametros['DB_HOST'], port=parametros['DB_PORT'],
+                            dbname=parametros['DB_NAME'], user=parametros['DB_USER'],
+                            password=parametros.get('DB_PASSWORD') or None)
+
+
+def preparar_banco(parametros, args):
+    """
+    Aplica o esquema e as migrações e, no cluster temporário, gera o volume de
+    benchmark com App/Utils/geracao.py (o mesmo de gerar_dados.py).
+    """
+    from App.Utils import geracao, migracoes
+
+    conn = conectar(parametros)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT to_regclass('aluno')")
+        if cursor.fetchone()[0] is None:
+            with open(os.path.join(DIRETORIO, 'db', 'escola.sql'), encoding='utf-8') as arquivo:
+                cursor.execute(arquivo.read())
+        # O upgrade roda em autocommit, que não pode ser ligado com a transação aberta
+        conn.commit()
+        migracoes.upgrade(conn, saida=lambda _: None)
+
+        conn.autocommit = False
+        if not args.sem_cluster:
+            volumes = geracao.volumes(args.escolas, anos=args.anos)
+            gerador = geracao.Gerador(volumes, semente=args.semente, data_final=args.data_final,
+                                      senha=args.senha, rounds=args.bcrypt_rounds)
+            geracao.gerar(conn, gerador, saida=lambda texto: print(texto, file=sys.stderr))
+            conn.commit()
+            conn.autocommit = True
+            conn.cursor().execute("ANALYZE")
+            conn.autocommit = False
+
+        # Alunos de cada turma, para montar as chamadas
+        cursor = conn.cursor()
+        cursor.execute("SELECT id_turma, array_agg(id_aluno) FROM aluno WHERE id_turma IS NOT NULL GROUP BY id_turma")
+        turmas = {id_turma: alunos for id_turma, alunos in cursor.fetchall()}
+        cursor.execute("SELECT login FROM usuario WHERE nivel_acesso = 'professor'")
+        logins = [linha[0] for linha in cursor.fetchall()]
+        cursor.execute("SELECT max(id_aluno) FROM aluno")
+        max_aluno = cursor.fetchone()[0]
+        # Data a partir da qual a exportação de presenças tem --linhas-exportacao linhas
+        cursor.execute("SELECT data_presenca FROM presenca ORDER BY data_presenca DESC OFFSET %s LIMIT 1",
+                       (args.linhas_exportacao - 1,))
+        linha = cursor.fetchone()
+        exportacao_desde = linha[0].isoformat() if linha else '1900-01-01'
+        conn.commit()
+    finally:
+        conn.close()
+    return {'turmas': turmas, 'logins': logins, 'max_aluno': max_aluno, 'senha': args.senha,
+            'exportacao_desde': exportacao_desde}
+
+
+# Servidor -------------------------------------------------------------------
+
+class Servidor:
+    """API rodando no gunicorn com gunicorn.conf.py, como no container."""
+
+    def __init__(self, parametros, args):
+        self.porta = porta_livre()
+        self.metricas = tempfile.mkdtemp(prefix='escola_bench_prom_')
+        self.ambiente = dict(os.environ, **parametros,
+                             PROMETHEUS_MULTIPROC_DIR=self.metricas,
+                             WEB_CONCURRENCY=str(args.workers),
+                             GUNICORN_THREADS=str(args.threads),
+                             BCRYPT_ROUNDS=str(args.bcrypt_rounds),
+                             LISTAGENS_JSON_BANCO='true' if args.json_no_banco else 'false')
+        if not args.manter_limites:
+            # O benchmark dispara todos os logins do mesmo IP
+            self.ambiente.update(LOGIN_LIMITE_IP_BURST='1000000', LOGIN_LIMITE_IP_REFILL='1000000',
+                                 LOGIN_LIMITE_LOGIN_BURST='1000000', LOGIN_LIMITE_LOGIN_REFILL='1000000')
+        # A API não sobe sem uma SECRET_KEY própria; uma chave descartável por execução
+        self.ambiente.setdefault('SECRET_KEY', secrets.token_urlsafe(32))
+        self.processo = None
+
+    def __enter__(self):
+        self.processo = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+             '--bind', f'127.0.0.1:{self.porta}', '--access-logfile', os.devnull, 'app:app'],
+            cwd=DIRETORIO, env=self.ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        aguardar(self._no_ar, 30, "o gunicorn iniciar")
+        return self
+
+    def _no_ar(self):
+        try:
+            return requisitar(http.client.HTTPConnection('127.0.0.1', self.porta, timeout=2), 'GET', '/')[0] == 200
+        except OSError:
+            return False
+
+    def metricas_texto(self):
+        return requisitar(http.client.HTTPConnection('127.0.0.1', self.porta, timeout=10), 'GET', '/metrics')[1]
+
+    def __exit__(self, *exc):
+        self.processo.terminate()
+        self.processo.wait(timeout=40)
+        shutil.rmtree(self.metricas, ignore_errors=True)
+
+
+def requisitar(conn, metodo, caminho, corpo=None, cabecalhos=None):
+    cabecalhos = dict(cabecalhos or {})
+    dados = None
+    if corpo is not None:
+        dados = json.dumps(corpo).encode('utf-8')
+        cabecalhos['Content-Type'] = 'application/json'
+    conn.request(metodo, caminho, body=dados, headers=cabecalhos)
+    resposta = conn.getresponse()
+    return resposta.status, resposta.read().decode('utf-8', 'replace'), resposta.getheader('ETag')
+
+
+# Cenários -------------------------------------------------------------------
+
+LISTAGENS = ['/alunos', '/turmas', '/professores', '/atividades', '/pagamentos', '/presencas',
+             '/atividades_alunos', '/usuarios']
+
+
+def gerar_dashboard(dados, rng, etags, revalidar):
+    escolha = rng.random()
+    if escolha < 0.6:
+        base = rng.choice(LISTAGENS)
+        nome, caminho = f'GET {base}', f"{base}?{urlencode({'limit': 50})}"
+    elif escolha < 0.8:
+        nome, caminho = 'GET /alunos/<id>', f"/alunos/{rng.randint(1, dados['max_aluno'])}"
+    else:
+        nome, caminho = 'GET /turmas/<id>', f"/turmas/{rng.choice(list(dados['turmas']))}"
+    cabecalhos = {}
+    if revalidar and caminho in etags:
+        cabecalhos['If-None-Match'] = etags[caminho]
+    return nome, 'GET', caminho, None, cabecalhos
+
+
+def gerar_chamada(dados, rng, etags, revalidar):
+    id_turma = rng.choice(list(dados['turmas']))
+    data = datetime.date.today() - datetime.timedelta(days=rng.randint(0, 30))
+    presencas = {str(id_aluno): rng.random() < 0.92 for id_aluno in dados['turmas'][id_turma]}
+    return ('POST /turmas/<id>/presencas', 'POST', f'/turmas/{id_turma}/presencas',
+            {'data_presenca': data.isoformat(), 'presencas': presencas}, {})
+
+
+def gerar_login(dados, rng, etags, revalidar):
+    return 'POST /login', 'POST', '/login', {'login': rng.choice(dados['logins']), 'senha': dados['senha']}, {}
+
+
+def gerar_misto(dados, rng, etags, revalidar):
+    escolha = rng.random()
+    gerador = gerar_dashboard if escolha < 0.7 else gerar_chamada if escolha < 0.9 else gerar_login
+    return gerador(dados, rng, etags, revalidar)
+
+
+def gerar_exportacao(dados, rng, etags, revalidar):
+    return ('GET /presencas (ndjson)', 'GET', f"/presencas?{urlencode({'data_inicio': dados['exportacao_desde']})}",
+            None, {'Accept': 'application/x-ndjson'})
+
+
+GERADORES = {'dashboard': gerar_dashboard, 'chamada': gerar_chamada, 'login': gerar_login, 'misto': gerar_misto,
+             'exportacao': gerar_exportacao}
+
+
+def executar_cenario(servidor, dados, nome, args):
+    """Dispara o cenário com args.concorrencia clientes por args.duracao segundos."""
+    amostras = []
+    amostras_lock = threading.Lock()
+    fim = time.monotonic() + args.duracao
+
+    def cliente(indice):
+        rng = random.Random(args.semente * 1000 + indice)
+        conn = http.client.HTTPConnection('127.0.0.1', servidor.porta, timeout=60)
+        etags = {}
+        locais = []
+        while time.monotonic() < fim:
+            endpoint, metodo, caminho, corpo, cabecalhos = GERADORES[nome](dados, rng, etags, indice % 2 == 0)
+            inicio = time.perf_counter()
+            try:
+                status, _, etag = requisitar(conn, metodo, caminho, corpo, cabecalhos)
+            except (OSError, http.client.HTTPException):
+                status, etag = 0, None
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', servidor.porta, timeout=60)
+            locais.append((endpoint, status, time.perf_counter() - inicio))
+            if etag:
+                etags[caminho] = etag
+        conn.close()
+        with amostras_lock:
+            amostras.extend(locais)
+
+    antes = ler_metricas(servidor.metricas_texto())
+    inicio = time.perf_counter()
+    clientes = [threading.Thread(target=cliente, args=(i,)) for i in range(args.concorrencia)]
+    for thread in clientes:
+        thread.start()
+    for thread in clientes:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    depois = ler_metricas(servidor.metricas_texto())
+
+    resultado = resumir(amostras, duracao)
+    resultado['servidor'] = diferenca_metricas(antes, depois)
+    return resultado
+
+
+# Relatório ------------------------------------------------------------------
+
+def percentil(valores_ordenados, p):
+    """Percentil pelo método do posto mais próximo."""
+    if not valores_ordenados:
+        return None
+    posto = max(1, int(-(-p * len(valores_ordenados) // 100)))
+    return valores_ordenados[posto - 1]
+
+
+def _estatisticas(latencias, erros, duracao):
+    latencias = sorted(latencias)
+    return {
+        'requisicoes': len(latencias),
+        'erros': erros,
+        'throughput_rps': round(len(latencias) / duracao, 1) if duracao else None,
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2) if latencias else None,
+        'p95_ms': round(percentil(latencias, 95) * 1000, 2) if latencias else None,
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2) if latencias else None,
+    }
+
+
+def resumir(amostras, duracao):
+    """Agrega as amostras (endpoint, status, segundos) do cenário."""
+    por_endpoint = {}
+    for endpoint, status, segundos in amostras:
+        por_endpoint.setdefault(endpoint, []).append((status, segundos))
+
+    def erros(lista):
+        return sum(1 for status, _ in lista if status == 0 or status >= 500)
+
+    resultado = _estatisticas([s for _, _, s in amostras], erros([(st, s) for _, st, s in amostras]), duracao)
+    resultado['duracao_s'] = round(duracao, 2)
+    resultado['endpoints'] = {}
+    for endpoint, lista in sorted(por_endpoint.items()):
+        estatisticas = _estatisticas([s for _, s in lista], erros(lista), duracao)
+        estatisticas['status'] = {}
+        for status, _ in lista:
+            estatisticas['status'][str(status)] = estatisticas['status'].get(str(status), 0) + 1
+        resultado['endpoints'][endpoint] = estatisticas
+    return resultado
+
+
+def ler_metricas(texto):
+    """:return: {endpoint Flask: {'requisicoes', 'consultas', 'tempo_db'}} acumulados"""
+    totais = {}
+    for familia in text_string_to_metric_families(texto):
+        if familia.name not in ('escola_db_queries_per_request', 'escola_db_time_per_request_seconds'):
+            continue
+        for amostra in familia.samples:
+            endpoint = amostra.labels.get('endpoint')
+            item = totais.setdefault(endpoint, {'requisicoes': 0.0, 'consultas': 0.0, 'tempo_db': 0.0})
+            if familia.name == 'escola_db_queries_per_request':
+                if amostra.name.endswith('_count'):
+                    item['requisicoes'] += amostra.value
+                elif amostra.name.endswith('_sum'):
+                    item['consultas'] += amostra.value
+            elif amostra.name.endswith('_sum'):
+                item['tempo_db'] += amostra.value
+    return totais
+
+
+def diferenca_metricas(antes, depois):
+    """Consultas SQL e tempo no banco por requisição, por endpoint Flask, durante o cenário."""
+    resultado = {}
+    for endpoint, item in depois.items():
+        anterior = antes.get(endpoint, {'requisicoes': 0.0, 'consultas': 0.0, 'tempo_db': 0.0})
+        requisicoes = item['requisicoes'] - anterior['requisicoes']
+        if requisicoes <= 0:
+            continue
+        resultado[endpoint] = {
+            'requisicoes': int(requisicoes),
+            'consultas_por_requisicao': round((item['consultas'] - anterior['consultas']) / requisicoes, 2),
+            'tempo_db_medio_ms': round((item['tempo_db'] - anterior['tempo_db']) / requisicoes * 1000, 3),
+        }
+    return resultado
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=DIRETORIO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API da escola.")
+    parser.add_argument('--cenarios', nargs='+', choices=CENARIOS, default=list(CENARIOS))
+    parser.add_argument('--duracao', type=float, default=15, help="segundos por cenário")
+    parser.add_argument('--concorrencia', type=int, default=16, help="clientes simultâneos")
+    parser.add_argument('--workers', type=int, default=2, help="processos do gunicorn")
+    parser.add_argument('--threads', type=int, default=8, help="threads por processo do gunicorn")
+    parser.add_argument('--escolas', type=int, default=5, help="volume gerado (ver gerar_dados.py)")
+    parser.add_argument('--anos', type=int, default=1, help="anos de presenças e pagamentos gerados")
+    parser.add_argument('--data-final', type=datetime.date.fromisoformat, default=datetime.date(2025, 12, 31),
+                        help="último dia dos dados gerados (fixo, para resultados comparáveis)")
+    parser.add_argument('--senha', default='senha123', help="senha dos usuários usados no cenário de login")
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--linhas-exportacao', type=int, default=100000,
+                        help="presenças por requisição no cenário exportacao")
+    parser.add_argument('--json-no-banco', action='store_true',
+                        help="listagens de alunos, pagamentos e presenças com JSON montado pelo Postgres")
+    parser.add_argument('--manter-limites', action='store_true',
+                        help="não desativa o limite de tentativas de /login")
+    parser.add_argument('--sem-cluster', action='store_true',
+                        help="usa o banco das variáveis DB_HOST, DB_PORT, DB_NAME, DB_USER e DB_PASSWORD, "
+                             "com os dados já existentes (ex.: de gerar_dados.py)")
+    parser.add_argument('--saida', help="arquivo JSON do relatório (padrão: saída padrão)")
+    args = parser.parse_args()
+
+    if args.sem_cluster:
+        from App.Utils.bd import config
+        parametros = {chave.upper(): str(config[chave])
+                      for chave in ('db_host', 'db_port', 'db_name', 'db_user', 'db_password')}
+        return rodar(parametros, args)
+    with ClusterTemporario() as cluster:
+        return rodar(cluster.parametros(), args)
+
+
+def rodar(parametros, args):
+    inicio = time.perf_counter()
+    dados = preparar_banco(parametros, args)
+    print(f"Banco pronto em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+
+    relatorio = {
+        'commit': commit_atual(),
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'configuracao': {chave: valor for chave, valor in vars(args).items() if chave != 'saida'},
+        'cenarios': {},
+    }
+    with Servidor(parametros, args) as servidor:
+        for nome in args.cenarios:
+            print(f"Cenário {nome}...", file=sys.stderr)
+            relatorio['cenarios'][nome] = executar_cenario(servidor, dados, nome, args)
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2, default=str)
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
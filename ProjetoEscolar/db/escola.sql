@@ -50,7 +50,8 @@ CREATE TABLE presenca (
     id_aluno INT,
     data_presenca DATE NOT NULL,
     presente BOOLEAN,
-    FOREIGN KEY (id_aluno) REFERENCES aluno(id_aluno)
+    FOREIGN KEY (id_aluno) REFERENCES aluno(id_aluno),
+    CONSTRAINT uq_presenca_aluno_data UNIQUE (id_aluno, data_presenca)
 );
 
 CREATE TABLE atividade (
@@ -0,0 +1,32 @@
+-- migracao: sem-transacao
+-- Garante no máximo uma presença por aluno por dia (necessário para o
+-- ON CONFLICT da chamada da turma) em bancos criados antes da restrição
+-- uq_presenca_aluno_data existir em escola.sql. Também atende às consultas
+-- presenca WHERE id_aluno = ? AND data_presenca ...
+--
+-- Presenças repetidas do mesmo aluno no mesmo dia fariam o índice falhar (e
+-- ficar inválido), então antes ficam em presenca só as mais recentes (maior
+-- id_presenca) - a última chamada registrada é a que vale. As demais não são
+-- apagadas: vão para presenca_duplicada, num único comando (o DELETE e o
+-- INSERT são atômicos), para conferência e eventual restauração. Se o índice
+-- falhar mesmo assim (duplicata inserida durante a criação), a migração pode
+-- ser repetida: o índice inválido é removido e o arquivamento roda de novo.
+CREATE TABLE IF NOT EXISTS presenca_duplicada (
+    id_presenca INT PRIMARY KEY,
+    id_aluno INT,
+    data_presenca DATE NOT NULL,
+    presente BOOLEAN,
+    arquivada_em TIMESTAMP NOT NULL DEFAULT now()
+);
+WITH duplicadas AS (
+    DELETE FROM presenca p
+        USING presenca mais_recente
+        WHERE mais_recente.id_aluno = p.id_aluno
+          AND mais_recente.data_presenca = p.data_presenca
+          AND mais_recente.id_presenca > p.id_presenca
+        RETURNING p.id_presenca, p.id_aluno, p.data_presenca, p.presente
+)
+INSERT INTO presenca_duplicada (id_presenca, id_aluno, data_presenca, presente)
+    SELECT id_presenca, id_aluno, data_presenca, presente FROM duplicadas;
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_presenca_aluno_data
+    ON presenca (id_aluno, data_presenca);
@@ -0,0 +1,21 @@
+-- migracao: sem-transacao
+-- Índices para os filtros por chave estrangeira usados pela API.
+
+-- delete_aluno: pagamentos pendentes do aluno
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pagamento_aluno_status
+    ON pagamento (id_aluno, status);
+
+-- delete_turma: alunos da turma
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aluno_turma
+    ON aluno (id_turma);
+
+-- delete_professor: turmas e usuários do professor
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_turma_professor
+    ON turma (id_professor);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usuario_professor
+    ON usuario (id_professor);
+
+-- delete_aluno: a chave primária de atividade_aluno começa por id_atividade
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_atividade_aluno_aluno
+    ON atividade_aluno (id_aluno);
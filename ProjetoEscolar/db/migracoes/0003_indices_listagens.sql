@@ -0,0 +1,21 @@
+-- migracao: sem-transacao
+-- Índices na ordem da paginação por chave (keyset) de cada listagem, para que
+-- cada página seja uma leitura de intervalo do índice em vez de ordenar a tabela.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_presenca_data
+    ON presenca (data_presenca DESC, id_presenca DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pagamento_data
+    ON pagamento (data_pagamento DESC, id_pagamento DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aluno_nome
+    ON aluno (nome_completo, id_aluno);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_professor_nome
+    ON professor (nome_completo, id_professor);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_turma_nome
+    ON turma (nome_turma, id_turma);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_atividade_data
+    ON atividade (data_realizacao, id_atividade);
@@ -0,0 +1,43 @@
+-- Publica no canal escola_alteracoes (LISTEN/NOTIFY) cada linha alterada em
+-- professor, turma, aluno e atividade, com payload {"tabela", "id", "operacao"}.
+-- Cada worker da API escuta o canal (App/Utils/notificacoes.py) e invalida os
+-- caches em memória que dependem da tabela. As notificações só são entregues
+-- no commit, e nunca para transações desfeitas.
+
+CREATE OR REPLACE FUNCTION notificar_alteracao() RETURNS trigger AS $$
+DECLARE
+    registro RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        registro := OLD;
+    ELSE
+        registro := NEW;
+    END IF;
+    PERFORM pg_notify('escola_alteracoes', json_build_object(
+        'tabela', TG_TABLE_NAME,
+        'id', to_jsonb(registro) ->> TG_ARGV[0],
+        'operacao', TG_OP
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notificar_professor ON professor;
+CREATE TRIGGER trg_notificar_professor
+    AFTER INSERT OR UPDATE OR DELETE ON professor
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('id_professor');
+
+DROP TRIGGER IF EXISTS trg_notificar_turma ON turma;
+CREATE TRIGGER trg_notificar_turma
+    AFTER INSERT OR UPDATE OR DELETE ON turma
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('id_turma');
+
+DROP TRIGGER IF EXISTS trg_notificar_aluno ON aluno;
+CREATE TRIGGER trg_notificar_aluno
+    AFTER INSERT OR UPDATE OR DELETE ON aluno
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('id_aluno');
+
+DROP TRIGGER IF EXISTS trg_notificar_atividade ON atividade;
+CREATE TRIGGER trg_notificar_atividade
+    AFTER INSERT OR UPDATE OR DELETE ON atividade
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('id_atividade');
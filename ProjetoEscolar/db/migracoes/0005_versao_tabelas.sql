@@ -0,0 +1,68 @@
+-- Contador de versão por tabela, incrementado a cada comando que altera a
+-- tabela (trigger por comando, não por linha). As rotas GET derivam o ETag
+-- desses contadores (App/Utils/condicional.py), então um GET condicional sem
+-- alterações custa só a leitura desta tabela. O incremento faz parte da
+-- transação da escrita: o novo valor só fica visível junto com os dados.
+
+CREATE TABLE IF NOT EXISTS versao_tabela (
+    tabela VARCHAR(63) PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO versao_tabela (tabela) VALUES
+    ('aluno'),
+    ('turma'),
+    ('professor'),
+    ('atividade'),
+    ('atividade_aluno'),
+    ('pagamento'),
+    ('presenca'),
+    ('usuario')
+ON CONFLICT (tabela) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION incrementar_versao_tabela() RETURNS trigger AS $$
+BEGIN
+    UPDATE versao_tabela SET versao = versao + 1 WHERE tabela = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_versao_aluno ON aluno;
+CREATE TRIGGER trg_versao_aluno
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON aluno
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_tabela();
+
+DROP TRIGGER IF EXISTS trg_versao_turma ON turma;
+CREATE TRIGGER trg_versao_turma
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON turma
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_tabela();
+
+DROP TRIGGER IF EXISTS trg_versao_professor ON professor;
+CREATE TRIGGER trg_versao_professor
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON professor
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_tabela();
+
+DROP TRIGGER IF EXISTS trg_versao_atividade ON atividade;
+CREATE TRIGGER trg_versao_atividade
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON atividade
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_tabela();
+
+DROP TRIGGER IF EXISTS trg_versao_atividade_aluno ON atividade_aluno;
+CREATE TRIGGER trg_versao_atividade_aluno
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON atividade_aluno
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_tabela();
+
+DROP TRIGGER IF EXISTS trg_versao_pagamento ON pagamento;
+CREATE TRIGGER trg_versao_pagamento
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pagamento
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_tabela();
+
+DROP TRIGGER IF EXISTS trg_versao_presenca ON presenca;
+CREATE TRIGGER trg_versao_presenca
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON presenca
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_tabela();
+
+DROP TRIGGER IF EXISTS trg_versao_usuario ON usuario;
+CREATE TRIGGER trg_versao_usuario
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON usuario
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_tabela();
@@ -0,0 +1,13 @@
+-- Tokens de sessão revogados antes de expirar (/logout). Cada worker da API
+-- mantém os jti em memória; o trigger publica a revogação no canal
+-- escola_alteracoes (função da migração 0004) para os demais workers.
+
+CREATE TABLE IF NOT EXISTS token_revogado (
+    jti VARCHAR(64) PRIMARY KEY,
+    expira_em TIMESTAMPTZ NOT NULL
+);
+
+DROP TRIGGER IF EXISTS trg_notificar_token_revogado ON token_revogado;
+CREATE TRIGGER trg_notificar_token_revogado
+    AFTER INSERT ON token_revogado
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('jti');
@@ -0,0 +1,10 @@
+-- Baldes de fichas do limite de tentativas de /login compartilhados entre os
+-- workers da API (login_limite_backend: postgres em paramsBD.yml). Uma linha
+-- por chave ('ip:...' ou 'login:...'), atualizada por um único UPSERT.
+
+CREATE TABLE IF NOT EXISTS limite_login (
+    chave VARCHAR(255) PRIMARY KEY,
+    fichas DOUBLE PRECISION NOT NULL,
+    permitido BOOLEAN NOT NULL,
+    atualizado_em TIMESTAMPTZ NOT NULL
+);
@@ -0,0 +1,21 @@
+-- migracao: sem-transacao
+-- Índices dos filtros e ordenações de GET /pagamentos. Cada filtro de
+-- igualdade é seguido da ordenação padrão (data_pagamento DESC, id_pagamento
+-- DESC), então a página filtrada é uma leitura de intervalo do índice já na
+-- ordem da resposta. Filtro só por período usa idx_pagamento_data (0003).
+
+-- status=Pendente,Atrasado (tela financeira)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pagamento_status_data
+    ON pagamento (status, data_pagamento DESC, id_pagamento DESC);
+
+-- id_aluno=...: histórico do aluno (idx_pagamento_aluno_status segue atendendo delete_aluno)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pagamento_aluno_data
+    ON pagamento (id_aluno, data_pagamento DESC, id_pagamento DESC);
+
+-- referencia=2024-03
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pagamento_referencia_data
+    ON pagamento (referencia, data_pagamento DESC, id_pagamento DESC);
+
+-- sort=valor_pago / sort=-valor_pago e faixas valor_min/valor_max
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pagamento_valor
+    ON pagamento (valor_pago, id_pagamento);
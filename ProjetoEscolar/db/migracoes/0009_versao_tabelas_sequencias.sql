@@ -0,0 +1,71 @@
+-- Contadores de versão em sequências (uma por tabela) no lugar das linhas de
+-- versao_tabela (migração 0005). O UPDATE na linha da tabela segurava o
+-- bloqueio dessa linha até o commit: escritas concorrentes na mesma tabela
+-- esperavam umas pelas outras, e transações que alteram várias tabelas em
+-- ordens diferentes podiam entrar em deadlock. nextval não bloqueia.
+--
+-- nextval, porém, não é transacional: a versão nova fica visível antes do
+-- commit da escrita. Para um GET não associar a versão nova aos dados antigos,
+-- o trigger também pega um advisory lock compartilhado da tabela, que só é
+-- solto no fim da transação (compartilhado: escritores não esperam uns pelos
+-- outros). ler_versoes_tabelas confere em pg_locks, depois de ler as
+-- sequências, se alguma transação segura esse lock e devolve NULL se houver
+-- escrita em andamento - a rota responde sem ETag. Leitores não pegam lock
+-- nenhum, então não interferem uns com os outros.
+-- Um rollback ainda consome a versão, o que só gera um ETag novo à toa.
+
+DO $$
+DECLARE
+    nome TEXT;
+BEGIN
+    FOREACH nome IN ARRAY ARRAY['aluno', 'turma', 'professor', 'atividade',
+                                'atividade_aluno', 'pagamento', 'presenca', 'usuario'] LOOP
+        EXECUTE format('CREATE SEQUENCE IF NOT EXISTS %I', 'versao_' || nome);
+        -- Continua depois da versão atual, sem repetir ETags já emitidos
+        PERFORM setval(('versao_' || nome)::regclass,
+                       COALESCE((SELECT versao FROM versao_tabela WHERE tabela = nome), 0) + 1);
+    END LOOP;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION incrementar_versao_tabela() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock_shared(hashtext('versao_tabela'), hashtext(TG_TABLE_NAME));
+    PERFORM nextval(('versao_' || TG_TABLE_NAME)::regclass);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ler_versoes_tabelas(tabelas TEXT[]) RETURNS BIGINT[] AS $$
+DECLARE
+    nome TEXT;
+    versao BIGINT;
+    versoes BIGINT[] := '{}';
+BEGIN
+    FOREACH nome IN ARRAY tabelas LOOP
+        EXECUTE format('SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM %I', 'versao_' || nome)
+            INTO versao;
+        versoes := versoes || versao;
+    END LOOP;
+    -- Lidas as versões: se ainda há escrita sem commit, a versão pode ser a
+    -- nova e os dados que o GET vai consultar, os antigos. O lock dos
+    -- escritores é conferido em pg_locks, sem tentar pegá-lo: um lock
+    -- exclusivo de teste faria leitores simultâneos falharem uns com os outros.
+    -- Chaves advisory de dois inteiros aparecem como classid/objid (objsubid 2).
+    IF EXISTS (
+        SELECT 1 FROM pg_locks
+        WHERE locktype = 'advisory'
+          AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+          AND classid = hashtext('versao_tabela')::oid
+          AND objid IN (SELECT hashtext(t)::oid FROM unnest(tabelas) t)
+          AND objsubid = 2
+          AND granted
+          AND pid <> pg_backend_pid()
+    ) THEN
+        RETURN NULL;
+    END IF;
+    RETURN versoes;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TABLE IF EXISTS versao_tabela;
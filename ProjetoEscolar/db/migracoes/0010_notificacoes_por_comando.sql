@@ -0,0 +1,66 @@
+-- Notificações de alteração por comando, não por linha (substitui os triggers
+-- da migração 0004). Com um trigger por linha, uma importação de milhares de
+-- linhas publicava milhares de notificações. Agora cada comando em professor,
+-- turma, aluno e atividade publica uma só, com os ids das linhas alteradas
+-- lidos da tabela de transição:
+--     {"tabela": ..., "operacao": ..., "ids": [...]}
+-- Acima de maximo_ids linhas (e no TRUNCATE) "ids" vem null: a alteração vale
+-- para a tabela inteira. O limite mantém o payload abaixo dos 8000 bytes do
+-- NOTIFY. A revogação de tokens (migração 0006) continua por linha.
+--
+-- Tabelas de transição exigem um trigger por evento (INSERT, UPDATE, DELETE).
+
+CREATE OR REPLACE FUNCTION notificar_alteracoes() RETURNS trigger AS $$
+DECLARE
+    maximo_ids CONSTANT INTEGER := 500;
+    ids JSON;
+    quantidade INTEGER;
+BEGIN
+    IF TG_OP <> 'TRUNCATE' THEN
+        EXECUTE format('SELECT json_agg(%I), count(*) FROM (SELECT %I FROM alteradas LIMIT %s) limitadas',
+                       TG_ARGV[0], TG_ARGV[0], maximo_ids + 1)
+            INTO ids, quantidade;
+        IF quantidade = 0 THEN
+            RETURN NULL;
+        END IF;
+        IF quantidade > maximo_ids THEN
+            ids := NULL;
+        END IF;
+    END IF;
+    PERFORM pg_notify('escola_alteracoes', json_build_object(
+        'tabela', TG_TABLE_NAME,
+        'operacao', TG_OP,
+        'ids', ids
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tabela TEXT;
+    chave TEXT;
+BEGIN
+    FOR tabela, chave IN VALUES ('professor', 'id_professor'), ('turma', 'id_turma'),
+                                ('aluno', 'id_aluno'), ('atividade', 'id_atividade') LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_notificar_' || tabela, tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_notificar_insercao_' || tabela, tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_notificar_atualizacao_' || tabela, tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_notificar_exclusao_' || tabela, tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_notificar_truncate_' || tabela, tabela);
+
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS alteradas '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes(%L)',
+                       'trg_notificar_insercao_' || tabela, tabela, chave);
+        EXECUTE format('CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING NEW TABLE AS alteradas '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes(%L)',
+                       'trg_notificar_atualizacao_' || tabela, tabela, chave);
+        EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS alteradas '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes(%L)',
+                       'trg_notificar_exclusao_' || tabela, tabela, chave);
+        EXECUTE format('CREATE TRIGGER %I AFTER TRUNCATE ON %I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes(%L)',
+                       'trg_notificar_truncate_' || tabela, tabela, chave);
+    END LOOP;
+END;
+$$;
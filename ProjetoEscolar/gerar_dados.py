@@ -0,0 +1,73 @@
+"""
+Geração de dados sintéticos para testes de escala e benchmarks.
+
+SUBSTITUI os dados de todas as tabelas da escola (professor, turma, aluno,
+presenca, pagamento, atividade, atividade_aluno e usuario).
+
+Uso:
+    python gerar_dados.py --substituir                          # uma escola, 10 anos
+    python gerar_dados.py --substituir --escolas 50             # 20 mil alunos, ~45 milhões de presenças
+    python gerar_dados.py --substituir --alunos 5000 --anos 2 --semente 7 --data-final 2025-12-31
+
+A mesma semente, os mesmos volumes e a mesma --data-final (padrão: hoje)
+geram exatamente os mesmos dados. Todos os usuários gerados (admin e um por
+professor) usam a senha de --senha.
+"""
+import argparse
+import datetime
+import json
+import sys
+
+from App.Utils.bd import create_connection
+from App.Utils import geracao, senhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos via COPY no banco da escola.")
+    parser.add_argument('--substituir', action='store_true', required=True,
+                        help="confirma a substituição dos dados atuais das tabelas")
+    parser.add_argument('--escolas', type=int, default=1,
+                        help="multiplica os volumes de uma escola (%s)" % ', '.join(
+                            f"{valor} {chave}" for chave, valor in geracao.VOLUMES_POR_ESCOLA.items()))
+    parser.add_argument('--alunos', type=int)
+    parser.add_argument('--turmas', type=int)
+    parser.add_argument('--professores', type=int, help="no mínimo um por turma")
+    parser.add_argument('--atividades-por-ano', type=int)
+    parser.add_argument('--anos', type=int, help="anos de presenças e pagamentos (padrão: 10)")
+    parser.add_argument('--data-final', type=datetime.date.fromisoformat, help="último dia dos dados (AAAA-MM-DD)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--senha', default='senha123', help="senha dos usuários gerados")
+    parser.add_argument('--rounds', type=int, default=senhas.rounds_configurado(),
+                        help="fator de trabalho do bcrypt da senha (padrão: bcrypt_rounds)")
+    args = parser.parse_args()
+
+    volumes = geracao.volumes(args.escolas, alunos=args.alunos, turmas=args.turmas, professores=args.professores,
+                              atividades_por_ano=args.atividades_por_ano, anos=args.anos)
+    gerador = geracao.Gerador(volumes, semente=args.semente, data_final=args.data_final,
+                              senha=args.senha, rounds=args.rounds)
+
+    conn = create_connection()
+    if not conn:
+        return 1
+    try:
+        relatorio = geracao.gerar(conn, gerador, saida=lambda texto: print(texto, file=sys.stderr))
+        conn.commit()
+        # Estatísticas do planejador para as tabelas recém-carregadas
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute(f"ANALYZE {', '.join(geracao.TABELAS)}")
+        cursor.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro na geração: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+    relatorio.update(volumes=volumes, semente=args.semente, data_final=gerador.data_final.isoformat())
+    print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
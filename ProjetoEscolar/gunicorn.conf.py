@@ -0,0 +1,66 @@
+"""
+Configuração do gunicorn para servir a API em produção.
+
+Uso:
+    gunicorn -c gunicorn.conf.py app:app
+
+Modelo de workers: processos (workers) com threads (gthread). Cada processo
+tem seu próprio pool de conexões (pool_max em App/Utils/paramsBD.yml), então
+workers * pool_max deve caber no max_connections do Postgres, e threads não
+deve passar de pool_max (senão as threads esperam por conexão livre).
+
+Os valores podem ser ajustados por variáveis de ambiente sem rebuild:
+    WEB_CONCURRENCY     número de processos (padrão: núcleos de CPU)
+    GUNICORN_THREADS    threads por processo (padrão: 8)
+    GUNICORN_WORKER     classe de worker (padrão: gthread). gevent exige
+                        também o psycogreen para não bloquear no psycopg2.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+worker_class = os.environ.get('GUNICORN_WORKER', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# O app (blueprints, especificações do Swagger) é criado uma vez no processo
+# mestre antes do fork. Conexões, pools de senhas e o listener de notificações
+# são criados sob demanda em cada worker (verificação de PID em Utils/).
+preload_app = True
+
+# Reciclagem de workers: limita o efeito de vazamentos de memória. O jitter
+# evita que todos os workers reiniciem ao mesmo tempo.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# Reinício gracioso (SIGHUP / reciclagem): requisições em andamento têm até
+# graceful_timeout segundos para terminar
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+# Métricas Prometheus com vários processos: cada worker grava em arquivos
+# neste diretório e /metrics agrega todos (ver App/Utils/metricas.py).
+# Precisa existir antes de o app (preload) importar o prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/escola_prometheus')
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    # Arquivos deixados por workers de uma execução anterior (mesmo diretório
+    # reaproveitado no restart do container) seriam somados pelo /metrics
+    diretorio = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    for nome in os.listdir(diretorio):
+        caminho = os.path.join(diretorio, nome)
+        if os.path.isfile(caminho):
+            os.remove(caminho)
+
+
+def child_exit(server, worker):
+    # Gauges livesum do worker que saiu (reciclagem, falha) deixam de contar
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,51 @@
+"""
+Importação em massa de alunos, professores ou pagamentos a partir de um CSV.
+
+Uso:
+    python importar.py alunos alunos.csv
+    python importar.py pagamentos pagamentos.csv --dry-run
+"""
+import argparse
+import json
+import sys
+import time
+
+from App.Utils.bd import create_connection
+from App.Utils.importacao import ENTIDADES, importar_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa um CSV via COPY para o banco da escola.")
+    parser.add_argument('entidade', choices=sorted(ENTIDADES))
+    parser.add_argument('arquivo', help="caminho do CSV (use - para ler da entrada padrão)")
+    parser.add_argument('--dry-run', action='store_true', help="valida e mostra o relatório sem gravar")
+    args = parser.parse_args()
+
+    conn = create_connection()
+    if not conn:
+        return 1
+
+    arquivo = sys.stdin.buffer if args.arquivo == '-' else open(args.arquivo, 'rb')
+    inicio = time.perf_counter()
+    try:
+        relatorio = importar_csv(conn, args.entidade, arquivo)
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro na importação: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if arquivo is not sys.stdin.buffer:
+            arquivo.close()
+        conn.close()
+
+    relatorio['segundos'] = round(time.perf_counter() - inicio, 2)
+    print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
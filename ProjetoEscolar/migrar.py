@@ -0,0 +1,53 @@
+"""
+Migrações do esquema do banco (arquivos em db/migracoes).
+
+Uso:
+    python migrar.py upgrade               # aplica as migrações pendentes
+    python migrar.py upgrade --aguardar 60 # espera o banco ficar disponível (início do container)
+    python migrar.py status                # lista migrações aplicadas e pendentes
+"""
+import argparse
+import sys
+import time
+
+from App.Utils.bd import create_connection
+from App.Utils import migracoes
+
+
+def conectar(aguardar):
+    limite = time.monotonic() + aguardar
+    while True:
+        conn = create_connection()
+        if conn or time.monotonic() >= limite:
+            return conn
+        time.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrações do esquema do banco da escola.")
+    parser.add_argument('comando', choices=['upgrade', 'status'])
+    parser.add_argument('--aguardar', type=int, default=0, metavar='SEGUNDOS',
+                        help="tempo máximo de espera pela conexão com o banco")
+    args = parser.parse_args()
+
+    conn = conectar(args.aguardar)
+    if not conn:
+        return 1
+
+    try:
+        if args.comando == 'upgrade':
+            aplicadas = migracoes.upgrade(conn)
+            print(f"{len(aplicadas)} migração(ões) aplicada(s)" if aplicadas else "Esquema já está atualizado")
+        else:
+            for versao, nome, aplicada in migracoes.status(conn):
+                print(f"{versao:04d}_{nome}: {'aplicada' if aplicada else 'pendente'}")
+    except Exception as e:
+        print(f"Erro na migração: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
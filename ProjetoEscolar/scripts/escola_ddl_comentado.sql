@@ -49,12 +49,14 @@ CREATE TABLE pagamento (
 
 -- TABELA: presenca
 -- Cada presença está ligada a um único aluno (N:1)
+-- Um aluno tem no máximo uma presença por data
 CREATE TABLE presenca (
     id_presenca INTEGER PRIMARY KEY,
     id_aluno INT,
     data_presenca DATE NOT NULL,
     presente BOOLEAN,
-    FOREIGN KEY (id_aluno) REFERENCES aluno(id_aluno)
+    FOREIGN KEY (id_aluno) REFERENCES aluno(id_aluno),
+    CONSTRAINT uq_presenca_aluno_data UNIQUE (id_aluno, data_presenca)
 );
 
 -- TABELA: atividade
@@ -4,11 +4,55 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from flask import Flask
+from unittest.mock import patch
+
+@pytest.fixture(autouse=True)
+def sem_versoes_tabelas():
+    # Os testes não têm banco: as rotas GET seguem sem ETag, salvo quando o
+    # próprio teste define as versões das tabelas
+    with patch('App.Utils.condicional.versoes', return_value=None) as mock_versoes:
+        yield mock_versoes
+
+@pytest.fixture(autouse=True)
+def limites_login_zerados():
+    # Cada teste começa com os baldes do limite de /login cheios
+    from App.Utils import limites
+    with patch.object(limites, '_memoria', limites.BaldesMemoria()):
+        yield
+
+@pytest.fixture
+def conectar_banco():
+    # Testes que precisam de um PostgreSQL real (concorrência entre conexões).
+    # Rodam só com TESTES_BANCO=1 e as variáveis DB_* apontando para um banco
+    # com escola.sql e as migrações aplicadas.
+    if os.environ.get('TESTES_BANCO') != '1':
+        pytest.skip("defina TESTES_BANCO=1 para os testes com banco")
+    import psycopg2
+    from App.Utils import bd
+    conexoes = []
+
+    def conectar():
+        conn = psycopg2.connect(**bd._connection_params())
+        conexoes.append(conn)
+        return conn
+
+    yield conectar
+    for conn in conexoes:
+        conn.close()
 
 @pytest.fixture
 def app():
     app = Flask(__name__)
     app.config['TESTING'] = True
+    app.config['SECRET_KEY'] = 'teste'
+    
+    from App.Utils.serializacao import ProvedorJSON
+    app.json = ProvedorJSON(app)
+    
+    # Cada teste começa com os caches de turmas/professores vazios
+    from App.Utils import cache
+    for c in cache.caches.values():
+        c.invalidar()
     
     from App.crudAlunos import app as alunos_bp
     from App.crudProfessores import app as professores_bp
@@ -4,7 +4,7 @@ from datetime import datetime
 class TestPytestMocks:
     
     # TESTES ALUNOS
-    @patch('App.crudAlunos.create_connection')
+    @patch('App.crudAlunos.get_connection')
     def test_create_aluno(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -14,7 +14,7 @@ class TestPytestMocks:
         response = client.post('/alunos', json=data)
         assert response.status_code == 201
 
-    @patch('App.crudAlunos.create_connection')
+    @patch('App.crudAlunos.get_connection')
     def test_read_aluno(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -23,7 +23,7 @@ class TestPytestMocks:
         response = client.get('/alunos/1')
         assert response.status_code == 200
 
-    @patch('App.crudAlunos.create_connection')
+    @patch('App.crudAlunos.get_connection')
     def test_update_aluno(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -33,7 +33,7 @@ class TestPytestMocks:
         response = client.put('/alunos/1', json=data)
         assert response.status_code == 200
 
-    @patch('App.crudAlunos.create_connection')
+    @patch('App.crudAlunos.get_connection')
     def test_delete_aluno(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -42,7 +42,7 @@ class TestPytestMocks:
         response = client.delete('/alunos/1')
         assert response.status_code == 200
 
-    @patch('App.crudAlunos.create_connection')
+    @patch('App.crudAlunos.get_connection')
     def test_list_alunos(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -52,7 +52,7 @@ class TestPytestMocks:
         assert response.status_code == 200
 
     # TESTES PROFESSORES
-    @patch('App.crudProfessores.create_connection')
+    @patch('App.crudProfessores.get_connection')
     def test_create_professor(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -62,7 +62,7 @@ class TestPytestMocks:
         response = client.post('/professores', json=data)
         assert response.status_code == 201
 
-    @patch('App.crudProfessores.create_connection')
+    @patch('App.crudProfessores.get_connection')
     def test_read_professor(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -71,7 +71,7 @@ class TestPytestMocks:
         response = client.get('/professores/1')
         assert response.status_code == 200
 
-    @patch('App.crudProfessores.create_connection')
+    @patch('App.crudProfessores.get_connection')
     def test_update_professor(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -81,7 +81,7 @@ class TestPytestMocks:
         response = client.put('/professores/1', json=data)
         assert response.status_code == 200
 
-    @patch('App.crudProfessores.create_connection')
+    @patch('App.crudProfessores.get_connection')
     def test_delete_professor(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -90,7 +90,7 @@ class TestPytestMocks:
         response = client.delete('/professores/1')
         assert response.status_code == 200
 
-    @patch('App.crudProfessores.create_connection')
+    @patch('App.crudProfessores.get_connection')
     def test_list_professores(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -100,7 +100,7 @@ class TestPytestMocks:
         assert response.status_code == 200
 
     # TESTES TURMAS
-    @patch('App.crudTurmas.create_connection')
+    @patch('App.crudTurmas.get_connection')
     def test_create_turma(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -110,7 +110,7 @@ class TestPytestMocks:
         response = client.post('/turmas', json=data)
         assert response.status_code == 201
 
-    @patch('App.crudTurmas.create_connection')
+    @patch('App.crudTurmas.get_connection')
     def test_list_turmas(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -120,7 +120,7 @@ class TestPytestMocks:
         assert response.status_code == 200
 
     # TESTES USUARIOS
-    @patch('App.crudUsuarios.create_connection')
+    @patch('App.crudUsuarios.get_connection')
     def test_create_usuario(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -130,7 +130,7 @@ class TestPytestMocks:
         response = client.post('/usuarios', json=data)
         assert response.status_code == 201
 
-    @patch('App.crudUsuarios.create_connection')
+    @patch('App.crudUsuarios.get_connection')
     def test_list_usuarios(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -140,7 +140,7 @@ class TestPytestMocks:
         assert response.status_code == 200
 
     # TESTES ATIVIDADES
-    @patch('App.crudAtividades.create_connection')
+    @patch('App.crudAtividades.get_connection')
     def test_create_atividade(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -150,7 +150,7 @@ class TestPytestMocks:
         response = client.post('/atividades', json=data)
         assert response.status_code == 201
 
-    @patch('App.crudAtividades.create_connection')
+    @patch('App.crudAtividades.get_connection')
     def test_list_atividades(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -160,7 +160,7 @@ class TestPytestMocks:
         assert response.status_code == 200
 
     # TESTES PAGAMENTOS
-    @patch('App.crudPagamentos.create_connection')
+    @patch('App.crudPagamentos.get_connection')
     def test_create_pagamento(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -170,7 +170,7 @@ class TestPytestMocks:
         response = client.post('/pagamentos', json=data)
         assert response.status_code == 201
 
-    @patch('App.crudPagamentos.create_connection')
+    @patch('App.crudPagamentos.get_connection')
     def test_list_pagamentos(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -180,7 +180,7 @@ class TestPytestMocks:
         assert response.status_code == 200
 
     # TESTES PRESENCAS
-    @patch('App.crudPresencas.create_connection')
+    @patch('App.crudPresencas.get_connection')
     def test_create_presenca(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -190,7 +190,7 @@ class TestPytestMocks:
         response = client.post('/presencas', json=data)
         assert response.status_code == 201
 
-    @patch('App.crudPresencas.create_connection')
+    @patch('App.crudPresencas.get_connection')
     def test_list_presencas(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -200,7 +200,7 @@ class TestPytestMocks:
         assert response.status_code == 200
 
     # TESTES ATIVIDADE_ALUNO
-    @patch('App.crudAtividade_Aluno.create_connection')
+    @patch('App.crudAtividade_Aluno.get_connection')
     def test_create_atividade_aluno(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
@@ -209,11 +209,1016 @@ class TestPytestMocks:
         response = client.post('/atividades_alunos', json=data)
         assert response.status_code == 201
 
-    @patch('App.crudAtividade_Aluno.create_connection')
+    @patch('App.crudAtividade_Aluno.get_connection')
     def test_list_atividades_alunos(self, mock_conn, client):
         mock_cursor = MagicMock()
         mock_conn.return_value.cursor.return_value = mock_cursor
         mock_cursor.fetchall.return_value = [[1, 1]]
         
         response = client.get('/atividades_alunos')
-        assert response.status_code == 200
\ No newline at end of file
+        assert response.status_code == 200
+
+    # TESTES POOL DE CONEXÕES
+    @patch('App.Utils.bd.get_pool')
+    def test_conexao_unica_por_requisicao(self, mock_pool, app):
+        from App.Utils import bd
+        with app.app_context():
+            conn1 = bd.get_connection()
+            conn2 = bd.get_connection()
+            assert conn1 is conn2
+            bd.release_connection()
+        mock_pool.return_value.getconn.assert_called_once()
+        mock_pool.return_value.putconn.assert_called_once_with(conn1)
+
+    @patch('App.Utils.bd.pool.ThreadedConnectionPool')
+    def test_pool_rollback_ao_devolver(self, mock_threaded):
+        from App.Utils.bd import ConnectionPool
+        from psycopg2.extensions import TRANSACTION_STATUS_INTRANS
+        conn = MagicMock(closed=0)
+        conn.get_transaction_status.return_value = TRANSACTION_STATUS_INTRANS
+        mock_threaded.return_value.getconn.return_value = conn
+
+        pool = ConnectionPool(1, 1, timeout=0.01)
+        assert pool.getconn() is conn
+        pool.putconn(conn)
+        conn.rollback.assert_called_once()
+        assert pool.stats()['checkouts'] == 1
+
+    # TESTES PAGINAÇÃO
+    @patch('App.crudPresencas.get_connection')
+    def test_list_presencas_paginado(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [[3, 1, '2024-01-16', True], [2, 1, '2024-01-15', True], [1, 1, '2024-01-15', False]]
+
+        response = client.get('/presencas?limit=2')
+        assert response.status_code == 200
+        assert len(response.get_json()) == 2
+        proximo = response.headers['X-Next-Cursor']
+
+        mock_cursor.fetchall.return_value = [[1, 1, '2024-01-15', False]]
+        response = client.get(f'/presencas?limit=2&cursor={proximo}')
+        assert response.status_code == 200
+        assert 'X-Next-Cursor' not in response.headers
+        query, params = mock_cursor.execute.call_args[0]
+        assert '(data_presenca, id_presenca) < (%s, %s)' in query
+        assert params == ('2024-01-15', 2, 3)
+
+    @patch('App.crudAlunos.get_connection')
+    def test_list_alunos_cursor_invalido(self, mock_conn, client):
+        response = client.get('/alunos?cursor=invalido')
+        assert response.status_code == 400
+
+    # TESTES EXPORTAÇÃO EM STREAMING
+    @patch('App.Utils.exportacao.get_pool')
+    def test_exportar_presencas_ndjson(self, mock_pool, client):
+        mock_cursor = MagicMock()
+        conn = mock_pool.return_value.getconn.return_value
+        conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchmany.side_effect = [[[1, 1, '2024-01-15', True], [2, 2, '2024-01-15', False]], []]
+
+        response = client.get('/presencas?id_aluno=1', headers={'Accept': 'application/x-ndjson'})
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert len(response.get_data(as_text=True).splitlines()) == 2
+        conn.cursor.assert_called_once_with(name='exportacao_presencas')
+        mock_pool.return_value.putconn.assert_called_once_with(conn)
+
+    @patch('App.Utils.exportacao.get_pool')
+    def test_exportar_pagamentos_csv(self, mock_pool, client):
+        mock_cursor = MagicMock()
+        mock_pool.return_value.getconn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchmany.side_effect = [[[1, 1, '2024-01-15', 150.00, 'PIX', 'REF001', 'Pago']], []]
+
+        response = client.get('/pagamentos', headers={'Accept': 'text/csv'})
+        assert response.status_code == 200
+        linhas = response.get_data(as_text=True).splitlines()
+        assert linhas[0].startswith('id_pagamento,id_aluno,data_pagamento')
+        assert len(linhas) == 2
+
+    @patch('App.Utils.exportacao.get_pool')
+    def test_exportacao_devolve_conexao_sem_ler_o_corpo(self, mock_pool, client):
+        conn = mock_pool.return_value.getconn.return_value
+
+        # O servidor WSGI fecha a resposta mesmo sem iterar o corpo (HEAD, desconexão)
+        response = client.head('/presencas', headers={'Accept': 'application/x-ndjson'})
+        assert response.status_code == 200
+        response.close()
+        mock_pool.return_value.putconn.assert_called_once_with(conn)
+
+        mock_pool.return_value.putconn.reset_mock()
+        response = client.get('/presencas', headers={'Accept': 'text/csv'}, buffered=False)
+        response.close()
+        mock_pool.return_value.putconn.assert_called_once_with(conn)
+
+    # TESTES CHAMADA DA TURMA
+    @patch('App.crudPresencas.get_connection')
+    def test_chamada_turma(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1]
+        mock_cursor.fetchall.return_value = [[10, 1, True], [11, 2, False]]
+
+        data = {'data_presenca': '2024-01-15', 'presencas': {'1': True, '2': False, '99': True}}
+        response = client.post('/turmas/1/presencas', json=data)
+        assert response.status_code == 200
+        resultados = {r['id_aluno']: r['status'] for r in response.get_json()['resultados']}
+        assert resultados == {1: 'criado', 2: 'atualizado', 99: 'aluno_nao_encontrado'}
+        assert mock_cursor.execute.call_count == 2
+
+    @patch('App.crudPresencas.get_connection')
+    def test_chamada_turma_inexistente(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
+
+        data = {'data_presenca': '2024-01-15', 'presencas': {'1': True}}
+        response = client.post('/turmas/99/presencas', json=data)
+        assert response.status_code == 404
+
+    # TESTES IMPORTAÇÃO CSV
+    @patch('App.crudAlunos.get_connection')
+    def test_importar_alunos(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.rowcount = 1
+        mock_cursor.fetchone.return_value = [1]
+        mock_cursor.fetchall.return_value = [[3, 'O campo data_nascimento é obrigatório']]
+
+        csv = 'nome_completo;data_nascimento;id_turma\nJoão;10/05/2015;1\nMaria;;1\n'
+        response = client.post('/alunos/importacao', data=csv.encode('utf-8'), content_type='text/csv')
+        assert response.status_code == 200
+        assert response.get_json() == {
+            'importados': 1, 'rejeitados': 1,
+            'erros': [{'linha': 3, 'erro': 'O campo data_nascimento é obrigatório'}]
+        }
+        copy_sql = mock_cursor.copy_expert.call_args[0][0]
+        assert '(nome_completo, data_nascimento, id_turma)' in copy_sql
+        assert "DELIMITER ';'" in copy_sql
+        mock_conn.return_value.commit.assert_called_once()
+
+    @patch('App.crudPagamentos.get_connection')
+    def test_importar_pagamentos_coluna_obrigatoria(self, mock_conn, client):
+        csv = 'id_aluno,valor_pago\n1,150.00\n'
+        response = client.post('/pagamentos/importacao', data=csv.encode('utf-8'), content_type='text/csv')
+        assert response.status_code == 400
+        assert 'data_pagamento' in response.get_json()['error']
+
+    # TESTES MIGRAÇÕES
+    def test_migracoes_ordenadas(self):
+        from App.Utils.migracoes import listar_migracoes, instrucoes
+        migracoes = listar_migracoes()
+        versoes = [versao for versao, _, _ in migracoes]
+        assert versoes == sorted(versoes) and versoes[:3] == [1, 2, 3]
+        with open(migracoes[1][2], encoding='utf-8') as arquivo:
+            for instrucao in instrucoes(arquivo.read()):
+                assert instrucao.startswith('CREATE INDEX CONCURRENTLY IF NOT EXISTS')
+
+    def test_migracao_presenca_unica_arquiva_duplicatas_antes_do_indice(self):
+        from App.Utils.migracoes import listar_migracoes, instrucoes
+        with open(listar_migracoes()[0][2], encoding='utf-8') as arquivo:
+            arquivo_morto, limpeza, indice = instrucoes(arquivo.read())
+        assert arquivo_morto.startswith('CREATE TABLE IF NOT EXISTS presenca_duplicada')
+        # As duplicatas saem de presenca e entram no arquivo no mesmo comando
+        assert limpeza.startswith('WITH duplicadas AS (\n    DELETE FROM presenca p')
+        assert 'id_presenca > p.id_presenca' in limpeza
+        assert 'INSERT INTO presenca_duplicada' in limpeza
+        assert indice.startswith('CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_presenca_aluno_data')
+
+    def test_upgrade_aplica_apenas_pendentes(self, tmp_path):
+        from App.Utils import migracoes
+        (tmp_path / '0001_a.sql').write_text('CREATE TABLE a (id int);')
+        (tmp_path / '0002_b.sql').write_text('-- migracao: sem-transacao\nCREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON a (id);')
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = [[1]]
+        cursor.fetchone.return_value = None
+
+        aplicadas = migracoes.upgrade(conn, diretorio=str(tmp_path), saida=lambda msg: None)
+        assert aplicadas == [2]
+        executadas = [c[0][0] for c in cursor.execute.call_args_list]
+        assert 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON a (id)' in executadas
+        assert 'CREATE TABLE a (id int);' not in executadas
+
+    # TESTES MÉTRICAS
+    @patch('App.crudProfessores.get_connection')
+    def test_metricas_por_endpoint(self, mock_conn):
+        from App import create_app
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [[1, 'Prof. Maria', 'maria@escola.com', '11999999999']]
+
+        client = create_app({'TESTING': True}).test_client()
+        assert client.get('/professores').status_code == 200
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        corpo = response.get_data(as_text=True)
+        assert 'escola_http_requests_total{blueprint="professores",endpoint="professores.read_all_professores",method="GET",status="200"}' in corpo
+        assert 'escola_http_request_duration_seconds_bucket' in corpo
+
+    # TESTES INSTRUMENTAÇÃO DE CONSULTAS
+    def test_consulta_lenta_registrada_sem_valores(self, app, caplog):
+        from App.Utils import bd
+        with app.test_request_context('/professores'), \
+                patch.dict(bd.config, {'slow_query_ms': 100}):
+            bd.registrar_consulta("SELECT * FROM usuarios WHERE login = %s AND senha = %s",
+                                  ('admin', 'segredo'), 0.05)
+            with caplog.at_level('WARNING', logger='escola.sql'):
+                bd.registrar_consulta("SELECT * FROM usuarios WHERE login = %s AND senha = %s",
+                                      ('admin', 'segredo'), 0.25)
+            from flask import g
+            assert g.consultas == 2
+            assert abs(g.tempo_db - 0.3) < 1e-9
+        assert len(caplog.records) == 1
+        mensagem = caplog.records[0].getMessage()
+        assert "['str', 'str']" in mensagem
+        assert 'segredo' not in mensagem
+
+    @patch('App.crudProfessores.get_connection')
+    def test_cabecalho_contagem_consultas_em_debug(self, mock_conn):
+        from App import create_app
+        from App.Utils import bd
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.execute.side_effect = lambda query, vars=None: bd.registrar_consulta(query, vars, 0.001)
+        mock_cursor.fetchall.return_value = []
+
+        app = create_app({'TESTING': True})
+        assert 'X-Query-Count' not in app.test_client().get('/professores?limit=10').headers
+        app.debug = True
+        assert app.test_client().get('/professores?limit=20').headers['X-Query-Count'] == '1'
+
+    # TESTES CACHE DE TURMAS E PROFESSORES
+    @patch('App.crudProfessores.get_connection')
+    def test_cache_professor_invalidado_na_escrita(self, mock_conn, client):
+        from App.Utils import cache
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1, 'Prof. Maria', 'maria@escola.com', '11999999999']
+        mock_cursor.rowcount = 1
+
+        hits = cache.professores.stats()['hits']
+        assert client.get('/professores/1').status_code == 200
+        assert client.get('/professores/1').get_json()['nome_completo'] == 'Prof. Maria'
+        assert mock_cursor.execute.call_count == 1
+        assert cache.professores.stats()['hits'] == hits + 1
+
+        versao_turmas = cache.turmas.versao
+        assert client.put('/professores/1', json={'nome_completo': 'Prof. Ana'}).status_code == 200
+        assert cache.turmas.versao == versao_turmas + 1
+
+        mock_cursor.fetchone.return_value = [1, 'Prof. Ana', 'maria@escola.com', '11999999999']
+        assert client.get('/professores/1').get_json()['nome_completo'] == 'Prof. Ana'
+
+    @patch('App.crudTurmas.get_connection')
+    def test_cache_turma_responde_etag_sem_ler_versoes(self, mock_conn, client, sem_versoes_tabelas):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1, 'Turma A', 1, '08:00', 'Prof. Maria']
+        sem_versoes_tabelas.return_value = (4, 2)
+
+        etag = client.get('/turmas/1').headers['ETag']
+        sem_versoes_tabelas.reset_mock()
+        mock_conn.reset_mock()
+
+        # Acerto no cache: versões guardadas com o corpo, sem conexão do pool
+        assert client.get('/turmas/1', headers={'If-None-Match': etag}).status_code == 304
+        response = client.get('/turmas/1')
+        assert response.headers['ETag'] == etag and response.get_json()['nome_turma'] == 'Turma A'
+        sem_versoes_tabelas.assert_not_called()
+        mock_conn.assert_not_called()
+
+        # include= depende de alunos: fora do cache
+        mock_cursor.fetchall.return_value = []
+        assert client.get('/turmas/1?include=alunos').status_code == 200
+        sem_versoes_tabelas.assert_called_once()
+
+    @patch('App.crudProfessores.get_connection')
+    def test_cache_listagem_professores_sem_ler_versoes(self, mock_conn, client, sem_versoes_tabelas):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [[1, 'Ana', 'ana@escola.com', '1'], [2, 'Bia', 'bia@escola.com', '2']]
+        sem_versoes_tabelas.return_value = (3,)
+
+        primeira = client.get('/professores?limit=1')
+        sem_versoes_tabelas.reset_mock()
+        mock_conn.reset_mock()
+
+        # Acerto no cache: corpo, ETag e cursor da próxima página sem conexão do pool
+        response = client.get('/professores?limit=1')
+        assert response.get_json() == primeira.get_json()
+        assert response.headers['ETag'] == primeira.headers['ETag']
+        assert response.headers['X-Next-Cursor'] == primeira.headers['X-Next-Cursor']
+        assert response.headers['Link'] == primeira.headers['Link']
+        assert client.get('/professores?limit=1', headers={'If-None-Match': primeira.headers['ETag']}).status_code == 304
+        sem_versoes_tabelas.assert_not_called()
+        mock_conn.assert_not_called()
+
+        # ids na chave: a busca em lote não recebe a página guardada
+        mock_cursor.fetchall.return_value = [[2, 'Bia', 'bia@escola.com', '2']]
+        response = client.get('/professores?ids=2,9')
+        assert [p['id_professor'] for p in response.get_json()] == [2]
+        assert client.get('/professores?ids=2,9').headers['X-Missing-Ids'] == '9'
+        assert mock_cursor.execute.call_count == 1
+
+    @patch('App.crudTurmas.get_connection')
+    def test_cache_listagem_turmas_fora_com_include(self, mock_conn, client, sem_versoes_tabelas):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [[1, 'Turma A', 1, '08:00', 'Prof. Maria']]
+
+        client.get('/turmas')
+        mock_conn.reset_mock()
+        assert client.get('/turmas').get_json()[0]['nome_turma'] == 'Turma A'
+        mock_conn.assert_not_called()
+
+        mock_cursor.fetchall.return_value = []
+        client.get('/turmas?include=professor')
+        client.get('/turmas?include=professor')
+        assert mock_conn.call_count == 2
+
+    def test_cache_ttl_lru(self):
+        from App.Utils.cache import CacheTTL
+        c = CacheTTL('teste', ttl=60, max_itens=2)
+        c.guardar('a', 1, c.versao)
+        c.guardar('b', 2, c.versao)
+        assert c.obter('a') == (True, 1)
+        c.guardar('c', 3, c.versao)
+        assert c.obter('b') == (False, None)
+        assert c.obter('a') == (True, 1)
+
+        versao = c.versao
+        c.invalidar()
+        c.guardar('d', 4, versao)
+        assert c.obter('d') == (False, None)
+
+    # TESTES INVALIDAÇÃO ENTRE WORKERS
+    def test_notificacao_invalida_caches_da_tabela(self):
+        from App.Utils import cache, notificacoes
+        versao_turmas = cache.turmas.versao
+        versao_professores = cache.professores.versao
+
+        notificacoes.processar('{"tabela": "turma", "operacao": "UPDATE", "ids": [3]}')
+        assert cache.turmas.versao == versao_turmas + 1
+        assert cache.professores.versao == versao_professores
+
+        notificacoes.processar('{"tabela": "professor", "operacao": "TRUNCATE", "ids": null}')
+        assert cache.turmas.versao == versao_turmas + 2
+        assert cache.professores.versao == versao_professores + 1
+
+        notificacoes.processar('{"tabela": "aluno", "operacao": "INSERT", "ids": [1, 2]}')
+        assert cache.turmas.versao == versao_turmas + 2
+        assert cache.professores.versao == versao_professores + 1
+
+    def test_migracao_notificacoes_cobre_tabelas(self):
+        from App.Utils import cache, migracoes
+        caminho = [c for v, n, c in migracoes.listar_migracoes() if n == 'notificacoes_por_comando'][0]
+        with open(caminho, encoding='utf-8') as arquivo:
+            sql = arquivo.read()
+        # Triggers por comando, com os ids lidos das tabelas de transição
+        assert 'FOR EACH ROW' not in sql
+        assert "REFERENCING NEW TABLE AS alteradas" in sql
+        assert "REFERENCING OLD TABLE AS alteradas" in sql
+        for tabela in ('professor', 'turma', 'aluno', 'atividade'):
+            assert tabela in cache.DEPENDENCIAS
+            assert f"('{tabela}', 'id_{tabela}')" in sql
+
+    # TESTES GET CONDICIONAL (ETAG)
+    @patch('App.crudAtividades.get_connection')
+    def test_get_condicional_304_sem_consulta(self, mock_conn, client, sem_versoes_tabelas):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [[1, 'Pintura', datetime(2024, 3, 1)]]
+        sem_versoes_tabelas.return_value = (7,)
+
+        response = client.get('/atividades')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+
+        response = client.get('/atividades', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert mock_cursor.execute.call_count == 1
+
+        sem_versoes_tabelas.return_value = (8,)
+        response = client.get('/atividades', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    @patch('App.crudTurmas.get_connection')
+    def test_get_condicional_turmas_depende_de_professor(self, mock_conn, client, sem_versoes_tabelas):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1, 'Turma A', 1, 'Manhã', 'Prof. Maria']
+        sem_versoes_tabelas.return_value = (1, 1)
+
+        response = client.get('/turmas/1')
+        assert response.headers['Cache-Control'] == 'private, max-age=60'
+        sem_versoes_tabelas.assert_called_with(('turma', 'professor'))
+
+    def test_versoes_leitores_simultaneos_nao_se_bloqueiam(self, conectar_banco):
+        import threading
+        tabelas = ['aluno', 'turma', 'professor', 'atividade',
+                   'atividade_aluno', 'pagamento', 'presenca', 'usuario']
+        resultados = [[], []]
+
+        def ler(resultado):
+            conn = conectar_banco()
+            conn.autocommit = True
+            cursor = conn.cursor()
+            for _ in range(2000):
+                cursor.execute("SELECT ler_versoes_tabelas(%s)", (tabelas,))
+                resultado.append(cursor.fetchone()[0])
+
+        leitores = [threading.Thread(target=ler, args=(resultado,)) for resultado in resultados]
+        for leitor in leitores:
+            leitor.start()
+        for leitor in leitores:
+            leitor.join()
+        # Sem escrita em andamento, nenhuma leitura pode ficar sem versão
+        assert all(versoes is not None for resultado in resultados for versoes in resultado)
+        assert len(resultados[0]) == len(resultados[1]) == 2000
+
+    def test_versoes_nulas_durante_escrita_sem_commit(self, conectar_banco):
+        escritor = conectar_banco()
+        leitor = conectar_banco()
+        leitor.autocommit = True
+        cursor = leitor.cursor()
+        escritor.cursor().execute("UPDATE turma SET nome_turma = nome_turma WHERE false")
+        try:
+            cursor.execute("SELECT ler_versoes_tabelas(%s)", (['turma'],))
+            assert cursor.fetchone()[0] is None
+            cursor.execute("SELECT ler_versoes_tabelas(%s)", (['aluno'],))
+            assert cursor.fetchone()[0] is not None
+        finally:
+            escritor.rollback()
+        cursor.execute("SELECT ler_versoes_tabelas(%s)", (['turma'],))
+        assert cursor.fetchone()[0] is not None
+
+    # TESTES POOL DE SENHAS (BCRYPT)
+    @patch('App.crudUsuarios.get_connection')
+    def test_login_refaz_hash_com_fator_antigo(self, mock_conn, client):
+        import bcrypt
+        from App.Utils import senhas
+        hash_antigo = bcrypt.hashpw(b'senha123', bcrypt.gensalt(4)).decode('utf-8')
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1, 'admin', hash_antigo, 'admin']
+
+        with patch.dict('App.Utils.bd.config', {'bcrypt_rounds': 5, 'bcrypt_workers': 0}), \
+                patch.multiple(senhas, _executor=None, _vagas=None, _executor_pid=None):
+            response = client.post('/login', json={'login': 'admin', 'senha': 'senha123'})
+        assert response.status_code == 200
+        query, valores = mock_cursor.execute.call_args[0]
+        assert query.startswith('UPDATE usuario SET senha')
+        assert senhas.custo(valores[0]) == 5
+        assert bcrypt.checkpw(b'senha123', valores[0].encode('utf-8'))
+
+    @patch('App.crudUsuarios.get_connection')
+    def test_login_fila_cheia_retorna_503(self, mock_conn, client):
+        from App.Utils import senhas
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1, 'admin', '$2b$04$invalido', 'admin']
+
+        with patch.dict('App.Utils.bd.config', {'bcrypt_workers': 0, 'bcrypt_fila_max': 0}), \
+                patch.multiple(senhas, _executor=None, _vagas=None, _executor_pid=None):
+            response = client.post('/login', json={'login': 'admin', 'senha': 'senha123'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+    # TESTES TOKENS DE SESSÃO
+    # Lista de revogados já carregada pelo listener de notificações
+    @patch('App.Utils.tokens.sincronizada', return_value=True)
+    @patch('App.crudUsuarios.get_connection')
+    def test_login_emite_tokens_verificados_sem_banco(self, mock_conn, mock_sincronizada):
+        import bcrypt
+        from App import create_app
+        from App.Utils import senhas, tokens
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        hash_senha = bcrypt.hashpw(b'senha123', bcrypt.gensalt(4)).decode('utf-8')
+        mock_cursor.fetchone.return_value = [1, 'admin', hash_senha, 'admin']
+
+        app = create_app({'TESTING': True, 'SECRET_KEY': 'teste'})
+        client = app.test_client()
+        with patch.dict('App.Utils.bd.config', {'bcrypt_rounds': 4, 'bcrypt_workers': 0}), \
+                patch.multiple(senhas, _executor=None, _vagas=None, _executor_pid=None):
+            corpo = client.post('/login', json={'login': 'admin', 'senha': 'senha123'}).get_json()
+        assert corpo['token_type'] == 'Bearer'
+
+        with app.test_request_context():
+            payload = tokens.verificar(corpo['access_token'], tokens.ACESSO)
+            assert payload['sub'] == 1 and payload['nivel_acesso'] == 'admin'
+            adulterado = corpo['access_token'][:-2] + ('AA' if not corpo['access_token'].endswith('AA') else 'BB')
+            for token, tipo in ((adulterado, tokens.ACESSO), (corpo['refresh_token'], tokens.ACESSO)):
+                try:
+                    tokens.verificar(token, tipo)
+                    assert False, 'token deveria ser recusado'
+                except tokens.TokenInvalido:
+                    pass
+
+        mock_conn.reset_mock()
+        response = client.get('/pool/stats', headers={'Authorization': 'Bearer ' + adulterado})
+        assert response.status_code == 401
+        mock_conn.assert_not_called()
+
+    @patch('App.Utils.tokens.sincronizada', return_value=True)
+    @patch('App.crudUsuarios.get_connection')
+    def test_logout_revoga_token_de_acesso(self, mock_conn, mock_sincronizada):
+        from App import create_app
+        from App.Utils import tokens
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.rowcount = 1
+
+        app = create_app({'TESTING': True, 'SECRET_KEY': 'teste'})
+        client = app.test_client()
+        with app.app_context():
+            token = tokens.emitir({'id_usuario': 1, 'login': 'admin', 'nivel_acesso': 'admin'}, tokens.ACESSO)
+        cabecalho = {'Authorization': 'Bearer ' + token}
+
+        assert client.post('/logout', headers=cabecalho).status_code == 200
+        assert 'INSERT INTO token_revogado' in mock_cursor.execute.call_args[0][0]
+        response = client.get('/pool/stats', headers=cabecalho)
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'Token revogado'
+
+    @patch('App.Utils.tokens.sincronizada', return_value=True)
+    @patch('App.crudUsuarios.get_connection')
+    def test_refresh_com_token_de_acesso_expirado(self, mock_conn, mock_sincronizada):
+        from App import create_app
+        from App.Utils import tokens
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1, 'admin', 'admin']
+        mock_cursor.rowcount = 1
+        usuario = {'id_usuario': 1, 'login': 'admin', 'nivel_acesso': 'admin'}
+
+        app = create_app({'TESTING': True, 'SECRET_KEY': 'teste'})
+        client = app.test_client()
+        with app.app_context():
+            refresh = tokens.emitir(usuario, tokens.REFRESH)
+            with patch.dict('App.Utils.bd.config', {'token_acesso_ttl': -1}):
+                expirado = tokens.emitir(usuario, tokens.ACESSO)
+        cabecalho = {'Authorization': 'Bearer ' + expirado}
+
+        # As rotas comuns recusam o token expirado; as de autenticação seguem
+        assert client.get('/pool/stats', headers=cabecalho).status_code == 401
+        response = client.post('/token/refresh', json={'refresh_token': refresh}, headers=cabecalho)
+        assert response.status_code == 200
+        assert response.get_json()['access_token'] != expirado
+        assert client.post('/login', json={}, headers=cabecalho).status_code == 400
+
+    @patch('App.Utils.tokens.bd.get_connection')
+    def test_revogacao_conferida_no_banco_ate_sincronizar(self, mock_conn):
+        from App import create_app
+        from App.Utils import tokens
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+
+        app = create_app({'TESTING': True, 'SECRET_KEY': 'teste'})
+        client = app.test_client()
+        with app.app_context():
+            token = tokens.emitir({'id_usuario': 1, 'login': 'admin', 'nivel_acesso': 'admin'}, tokens.ACESSO)
+        cabecalho = {'Authorization': 'Bearer ' + token}
+
+        # Revogado por outro worker, ainda fora da lista deste processo
+        mock_cursor.fetchone.return_value = [1]
+        response = client.get('/pool/stats', headers=cabecalho)
+        assert response.status_code == 401
+        assert 'token_revogado' in mock_cursor.execute.call_args[0][0]
+
+        mock_cursor.fetchone.return_value = None
+        assert client.get('/pool/stats', headers=cabecalho).status_code == 200
+
+        # Sem banco o token é recusado (falha fechada)
+        mock_conn.return_value = None
+        assert client.get('/pool/stats', headers=cabecalho).status_code == 503
+
+        mock_conn.reset_mock()
+        with patch.object(tokens, 'sincronizada', return_value=True):
+            assert client.get('/pool/stats', headers=cabecalho).status_code == 200
+        mock_conn.assert_not_called()
+
+    def test_app_nao_sobe_sem_secret_key_propria(self):
+        import os
+        import pytest
+        from App import create_app
+        with patch.dict(os.environ, {'SECRET_KEY': 'dev'}):
+            with pytest.raises(RuntimeError):
+                create_app()
+            del os.environ['SECRET_KEY']
+            with pytest.raises(RuntimeError):
+                create_app()
+
+    # TESTES LIMITE DE TENTATIVAS DE LOGIN
+    @patch('App.crudUsuarios.get_connection')
+    def test_login_limitado_antes_do_bcrypt(self, mock_conn, client):
+        from App.Utils import limites
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
+        recusas = limites.stats()['login']
+
+        with patch.dict('App.Utils.bd.config', {'login_limite_login_burst': 2, 'login_limite_login_refill': 0.5}), \
+                patch('App.Utils.senhas.verificar') as mock_verificar:
+            for _ in range(2):
+                assert client.post('/login', json={'login': 'Admin', 'senha': 'x'}).status_code == 401
+            response = client.post('/login', json={'login': 'admin ', 'senha': 'x'})
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '2'
+        assert mock_cursor.execute.call_count == 2
+        mock_verificar.assert_not_called()
+        assert limites.stats()['login'] == recusas + 1
+
+    @patch('App.crudUsuarios.get_connection')
+    def test_login_limitado_em_memoria_sem_reservar_conexao(self, mock_conn, client):
+        with patch.dict('App.Utils.bd.config', {'login_limite_backend': 'memoria',
+                                               'login_limite_ip_burst': 1, 'login_limite_ip_refill': 0.5}):
+            client.post('/login', json={'login': 'admin', 'senha': 'x'})
+            mock_conn.reset_mock()
+            response = client.post('/login', json={'login': 'admin', 'senha': 'x'})
+        assert response.status_code == 429
+        mock_conn.assert_not_called()
+
+    @patch('App.crudUsuarios.get_connection')
+    def test_login_limite_postgres_usa_a_conexao(self, mock_conn, client):
+        with patch.dict('App.Utils.bd.config', {'login_limite_backend': 'postgres'}), \
+                patch('App.Utils.limites.consumir_postgres', return_value=(False, 0.0)) as mock_consumir:
+            response = client.post('/login', json={'login': 'admin', 'senha': 'x'})
+        assert response.status_code == 429
+        assert mock_consumir.call_args_list[0].args[0] is mock_conn.return_value
+
+    @patch('App.crudUsuarios.get_connection')
+    def test_login_senha_nao_texto_retorna_400(self, mock_conn, client):
+        for corpo in ({'login': 123, 'senha': 'x'}, {'login': 'admin', 'senha': ['x']},
+                      {'login': None, 'senha': None}, ['login', 'senha']):
+            response = client.post('/login', json=corpo)
+            assert response.status_code == 400
+        mock_conn.assert_not_called()
+
+    def test_balde_de_fichas_repoe_com_o_tempo(self):
+        from App.Utils.limites import BaldesMemoria
+        baldes = BaldesMemoria()
+        with patch('App.Utils.limites.time.monotonic', side_effect=[0, 0, 0, 1.0]):
+            assert baldes.consumir('ip:1', 2, 1)[0]
+            assert baldes.consumir('ip:1', 2, 1)[0]
+            assert not baldes.consumir('ip:1', 2, 1)[0]
+            assert baldes.consumir('ip:1', 2, 1)[0]
+
+    # TESTES BENCHMARK
+    def test_benchmark_resumo_e_metricas(self):
+        import benchmark
+        assert benchmark.percentil([1, 2, 3, 4], 50) == 2
+        assert benchmark.percentil([1, 2, 3, 4], 99) == 4
+
+        resumo = benchmark.resumir([('GET /turmas', 200, 0.01), ('GET /turmas', 304, 0.03),
+                                    ('POST /login', 503, 0.2)], duracao=1.0)
+        assert resumo['requisicoes'] == 3 and resumo['erros'] == 1
+        assert resumo['endpoints']['GET /turmas']['p50_ms'] == 10.0
+        assert resumo['endpoints']['GET /turmas']['status'] == {'200': 1, '304': 1}
+
+        def texto(requisicoes, consultas):
+            return (
+                '# TYPE escola_db_queries_per_request histogram\n'
+                f'escola_db_queries_per_request_count{{blueprint="turmas",endpoint="turmas.read_all_turmas"}} {requisicoes}\n'
+                f'escola_db_queries_per_request_sum{{blueprint="turmas",endpoint="turmas.read_all_turmas"}} {consultas}\n'
+            )
+        diferenca = benchmark.diferenca_metricas(benchmark.ler_metricas(texto(10, 20)),
+                                                 benchmark.ler_metricas(texto(30, 80)))
+        assert diferenca['turmas.read_all_turmas']['requisicoes'] == 20
+        assert diferenca['turmas.read_all_turmas']['consultas_por_requisicao'] == 3.0
+
+    # TESTES GERAÇÃO DE DADOS SINTÉTICOS
+    def test_geracao_deterministica(self):
+        from datetime import date
+        from App.Utils import geracao
+
+        def linhas(semente):
+            volumes = geracao.volumes(1, alunos=30, turmas=3, anos=1, atividades_por_ano=5)
+            gerador = geracao.Gerador(volumes, semente=semente, data_final=date(2025, 12, 31), rounds=4)
+            return {tabela: ''.join(getattr(gerador, tabela)()) for tabela in geracao.ORDEM_CARGA if tabela != 'usuario'}
+
+        primeira = linhas(1)
+        assert primeira == linhas(1)
+        assert primeira['presenca'] != linhas(2)['presenca']
+        assert primeira['aluno'].count('\n') == 30
+        assert primeira['presenca'].count('\n') == 30 * len(geracao.dias_letivos(date(2025, 1, 1), date(2025, 12, 31)))
+
+    def test_geracao_carrega_com_copy(self):
+        from datetime import date
+        from App.Utils import geracao
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.side_effect = [
+            [('presenca', 'presenca_id_aluno_fkey', 'f', 'FOREIGN KEY (id_aluno) REFERENCES aluno(id_aluno)'),
+             ('presenca', 'uq_presenca_aluno_data', 'u', 'UNIQUE (id_aluno, data_presenca)')],
+            [('idx_presenca_data', 'CREATE INDEX idx_presenca_data ON public.presenca USING btree (data_presenca)')],
+        ]
+        cursor.copy_expert.side_effect = lambda sql, arquivo, size: list(iter(lambda: arquivo.read(size), ''))
+
+        volumes = geracao.volumes(1, alunos=10, turmas=2, anos=1)
+        relatorio = geracao.gerar(conn, geracao.Gerador(volumes, data_final=date(2025, 12, 31), rounds=4),
+                                  saida=lambda _: None)
+
+        comandos = [chamada[0][0] for chamada in cursor.execute.call_args_list]
+        assert comandos[1].startswith('TRUNCATE')
+        assert 'ALTER TABLE presenca DROP CONSTRAINT "presenca_id_aluno_fkey"' in comandos
+        assert comandos.index('ALTER TABLE presenca ADD CONSTRAINT "uq_presenca_aluno_data" UNIQUE (id_aluno, data_presenca)') \
+            < comandos.index('ALTER TABLE presenca ADD CONSTRAINT "presenca_id_aluno_fkey" '
+                             'FOREIGN KEY (id_aluno) REFERENCES aluno(id_aluno)')
+        assert all('WITH (FREEZE)' in chamada[0][0] for chamada in cursor.copy_expert.call_args_list)
+        assert relatorio['linhas']['aluno'] == 10
+        assert relatorio['linhas']['usuario'] == volumes['professores'] + 1
+
+    # TESTES SERIALIZAÇÃO JSON
+    @patch('App.crudPagamentos.get_connection')
+    def test_json_datas_iso_e_decimal(self, mock_conn, client):
+        from datetime import date
+        from decimal import Decimal
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [(1, 2, date(2024, 1, 15), Decimal('150.50'), 'PIX', 'REF001', 'Pago')]
+
+        response = client.get('/pagamentos')
+        assert response.status_code == 200
+        assert response.get_json() == [{
+            'id_pagamento': 1, 'id_aluno': 2, 'data_pagamento': '2024-01-15', 'valor_pago': 150.5,
+            'forma_pagamento': 'PIX', 'referencia': 'REF001', 'status': 'Pago'
+        }]
+        assert response.get_data().startswith(b'[{"data_pagamento":"2024-01-15"')
+
+    def test_json_sem_orjson_mesma_saida(self, app):
+        from datetime import date
+        from decimal import Decimal
+        from App.Utils import serializacao
+        dados = {'b': [date(2024, 1, 15), Decimal('1.25')], 'a': 'ção'}
+        with app.app_context():
+            rapido = app.json.loads(app.json.dumps(dados))
+            with patch.object(serializacao, 'orjson', None):
+                padrao = app.json.loads(app.json.dumps(dados))
+                assert serializacao.dumps_bytes(dados, ordenar=True) == '{"a":"ção","b":["2024-01-15",1.25]}'.encode('utf-8')
+        assert rapido == padrao == {'a': 'ção', 'b': ['2024-01-15', 1.25]}
+
+    # TESTES JSON MONTADO NO BANCO
+    @patch('App.crudPresencas.get_connection')
+    def test_listagem_json_no_banco(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        corpo = b'[{"data_presenca" : "2024-01-15", "id_aluno" : 1, "id_presenca" : 5, "presente" : true}]'
+        mock_cursor.fetchone.return_value = (memoryview(corpo), ['2024-01-15', 5])
+
+        with patch.dict('App.Utils.bd.config', {'listagens_json_banco': True}):
+            response = client.get('/presencas?id_aluno=1&limit=1')
+        assert response.status_code == 200
+        assert response.get_data() == corpo
+        assert response.mimetype == 'application/json'
+        assert 'X-Next-Cursor' in response.headers
+        mock_cursor.fetchall.assert_not_called()
+
+        query, params = mock_cursor.execute.call_args[0]
+        assert 'json_agg(json_build_object(' in query
+        assert "'data_presenca', to_char(data_presenca, 'YYYY-MM-DD')" in query
+        assert params == (1, 1, 1, '1', 2)
+
+    # TESTES COMPRESSÃO
+    @patch('App.crudPresencas.get_connection')
+    def test_compressao_gzip_com_limite(self, mock_conn):
+        import gzip
+        import json
+        from App import create_app
+        from App.Utils import metricas
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        client = create_app({'TESTING': True}).test_client()
+        saida = metricas.COMPRESSAO_SAIDA.labels('gzip')._value.get()
+
+        mock_cursor.fetchall.return_value = [[i, i, '2024-01-15', True] for i in range(1, 201)]
+        response = client.get('/presencas?limit=500', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert int(response.headers['Content-Length']) == len(response.get_data())
+        assert len(json.loads(gzip.decompress(response.get_data()))) == 200
+        assert metricas.COMPRESSAO_SAIDA.labels('gzip')._value.get() == saida + len(response.get_data())
+
+        mock_cursor.fetchall.return_value = [[1, 1, '2024-01-15', True]]
+        response = client.get('/presencas?limit=1', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+        mock_cursor.fetchall.return_value = [[i, i, '2024-01-15', True] for i in range(1, 201)]
+        assert 'Content-Encoding' not in client.get('/presencas?limit=501').headers
+
+    @patch('App.Utils.exportacao.get_pool')
+    def test_compressao_exportacao_em_streaming(self, mock_pool):
+        import gzip
+        from App import create_app
+        mock_cursor = MagicMock()
+        mock_pool.return_value.getconn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchmany.side_effect = [[[1, 1, '2024-01-15', True]], [[2, 2, '2024-01-15', False]], []]
+
+        client = create_app({'TESTING': True}).test_client()
+        response = client.get('/presencas', headers={'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in response.headers
+        assert len(gzip.decompress(response.get_data()).splitlines()) == 2
+
+    def test_compressao_desativada_na_rota_de_login(self):
+        from App import create_app
+        client = create_app({'TESTING': True}).test_client()
+        with patch.dict('App.Utils.bd.config', {'compressao_min_bytes': 0}):
+            response = client.post('/login', json={}, headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 400
+        assert 'Content-Encoding' not in response.headers
+
+    # TESTES ESCRITAS EM UM COMANDO (RESTRIÇÕES + RETURNING)
+    @staticmethod
+    def _violacao(classe, restricao):
+        from types import SimpleNamespace
+        return type('Violacao', (classe,), {'diag': SimpleNamespace(constraint_name=restricao)})('violação')
+
+    @patch('App.crudPresencas.get_connection')
+    def test_create_presenca_violacoes_de_restricao(self, mock_conn, client):
+        from psycopg2 import errors
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        data = {'id_aluno': 1, 'data_presenca': '2024-01-15', 'presente': True}
+
+        mock_cursor.execute.side_effect = self._violacao(errors.ForeignKeyViolation, 'presenca_id_aluno_fkey')
+        response = client.post('/presencas', json=data)
+        assert response.status_code == 404
+        assert response.get_json()['error'] == 'Aluno não encontrado'
+
+        mock_cursor.execute.side_effect = self._violacao(errors.UniqueViolation, 'uq_presenca_aluno_data')
+        response = client.post('/presencas', json=data)
+        assert response.status_code == 400
+        assert 'Já existe' in response.get_json()['error']
+        assert mock_cursor.execute.call_count == 2
+        assert mock_conn.return_value.rollback.called
+
+    @patch('App.crudPresencas.get_connection')
+    def test_update_presenca_um_comando(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+
+        mock_cursor.fetchone.return_value = None
+        assert client.put('/presencas/99', json={'presente': False}).status_code == 404
+
+        mock_cursor.fetchone.return_value = [1]
+        assert client.put('/presencas/1', json={'presente': False}).status_code == 200
+        query, valores = mock_cursor.execute.call_args[0]
+        assert 'SET presente = %s WHERE' in query and 'RETURNING' in query
+        assert valores == (False, 1)
+
+    @patch('App.crudUsuarios.get_connection')
+    def test_update_usuario_login_repetido(self, mock_conn, client):
+        from psycopg2 import errors
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.execute.side_effect = self._violacao(errors.UniqueViolation, 'usuario_login_key')
+
+        response = client.put('/usuarios/1', json={'login': 'admin'})
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Login já existe'
+        assert mock_cursor.execute.call_count == 1
+
+    # TESTES PATCH (ATUALIZAÇÃO PARCIAL)
+    @patch('App.crudProfessores.get_connection')
+    def test_patch_professor_so_campos_enviados(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1, 'Prof. Maria', 'maria@escola.com', '11988887777']
+
+        response = client.patch('/professores/1', json={'telefone': '11988887777'})
+        assert response.status_code == 200
+        assert response.get_json() == {'id_professor': 1, 'nome_completo': 'Prof. Maria',
+                                       'email': 'maria@escola.com', 'telefone': '11988887777'}
+        assert mock_cursor.execute.call_count == 1
+        query, valores = mock_cursor.execute.call_args[0]
+        assert 'SET telefone = %s WHERE id_professor = %s RETURNING' in query
+        assert valores == ('11988887777', 1)
+
+    @patch('App.crudAlunos.get_connection')
+    def test_patch_aluno_validacao_e_inexistente(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+
+        assert client.patch('/alunos/1', json={}).status_code == 400
+        response = client.patch('/alunos/1', json={'id_aluno': 2, 'senha': 'x'})
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Campos não permitidos: id_aluno, senha'
+        assert not mock_cursor.execute.called
+
+        mock_cursor.fetchone.return_value = None
+        assert client.patch('/alunos/99', json={'telefone_responsavel': '1199'}).status_code == 404
+
+    @patch('App.crudUsuarios.get_connection')
+    @patch('App.Utils.senhas.gerar_hash', return_value='hash')
+    def test_patch_usuario_nao_devolve_senha(self, mock_hash, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1, 'admin', 'admin', None]
+
+        response = client.patch('/usuarios/1', json={'senha': 'novaSenha123'})
+        assert response.status_code == 200
+        assert 'senha' not in response.get_json()
+        assert mock_cursor.execute.call_args[0][1] == ('hash', 1)
+
+    # TESTES FILTROS, ORDENAÇÃO E PROJEÇÃO DE PAGAMENTOS
+    @patch('App.crudPagamentos.get_connection')
+    def test_list_pagamentos_filtros_ordenacao_projecao(self, mock_conn, client):
+        from decimal import Decimal
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [[3, Decimal('300.00')], [2, Decimal('200.00')], [1, Decimal('100.00')]]
+
+        response = client.get('/pagamentos?status=Pendente,Atrasado&valor_min=50&sort=-valor_pago'
+                              '&fields=valor_pago&limit=2')
+        assert response.status_code == 200
+        assert response.get_json() == [{'valor_pago': 300.0}, {'valor_pago': 200.0}]
+        assert 'X-Next-Cursor' in response.headers
+        query, valores = mock_cursor.execute.call_args[0]
+        assert query.startswith('SELECT id_pagamento, valor_pago FROM pagamento')
+        assert 'status = ANY(%s) AND valor_pago >= %s' in query
+        assert 'ORDER BY valor_pago DESC, id_pagamento DESC' in query
+        assert valores == (['Pendente', 'Atrasado'], Decimal('50'), 3)
+
+    @patch('App.crudPagamentos.get_connection')
+    def test_list_pagamentos_parametros_invalidos(self, mock_conn, client):
+        assert client.get('/pagamentos?sort=forma_pagamento').status_code == 400
+        assert client.get('/pagamentos?fields=senha').status_code == 400
+        assert client.get('/pagamentos?valor_max=abc').status_code == 400
+        assert not mock_conn.called
+
+    # TESTES BUSCA EM LOTE (ids=)
+    @patch('App.crudAlunos.get_connection')
+    def test_alunos_em_lote_ordem_e_inexistentes(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [
+            [1, 'Ana', '2019-01-01', 1, None, None, None, None],
+            [3, 'Caio', '2019-03-01', 1, None, None, None, None],
+        ]
+
+        response = client.get('/alunos?ids=3,2,1,3')
+        assert response.status_code == 200
+        assert [aluno['aluno_id'] for aluno in response.get_json()] == [3, 1]
+        assert response.headers['X-Missing-Ids'] == '2'
+        assert 'X-Next-Cursor' not in response.headers
+        assert mock_cursor.execute.call_count == 1
+        query, valores = mock_cursor.execute.call_args[0]
+        assert 'id_aluno = ANY(%s)' in query
+        assert valores == ([3, 2, 1],)
+
+    @patch('App.crudTurmas.get_connection')
+    def test_turmas_em_lote_limites(self, mock_conn, client):
+        from App.Utils.paginacao import MAXIMO_IDS
+        ids = ','.join(str(i) for i in range(MAXIMO_IDS + 1))
+        assert client.get(f'/turmas?ids={ids}').status_code == 400
+        assert client.get('/turmas?ids=1,a').status_code == 400
+        assert not mock_conn.called
+
+    # TESTES RELAÇÕES EMBUTIDAS (include=)
+    @patch('App.crudTurmas.get_connection')
+    def test_turmas_include_uma_consulta_por_relacao(self, mock_conn, client, sem_versoes_tabelas):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.side_effect = [
+            [[1, 'Turma A', 10, 'Manhã', 'Prof. Maria'], [2, 'Turma B', None, 'Tarde', None]],
+            [[5, 'Ana', '2019-01-01', 1, None, None, None, None], [6, 'Bia', '2019-02-01', 1, None, None, None, None]],
+            [[10, 'Prof. Maria', 'maria@escola.com', '11999999999']],
+        ]
+        sem_versoes_tabelas.return_value = (1, 1, 1)
+
+        response = client.get('/turmas?include=professor,alunos')
+        assert response.status_code == 200
+        turma_a, turma_b = response.get_json()
+        assert [aluno['aluno_id'] for aluno in turma_a['alunos']] == [5, 6]
+        assert turma_a['professor']['email'] == 'maria@escola.com'
+        assert turma_b['alunos'] == [] and turma_b['professor'] is None
+        assert mock_cursor.execute.call_count == 3
+        assert mock_cursor.execute.call_args_list[1][0][1] == ([1, 2],)
+        assert mock_cursor.execute.call_args_list[2][0][1] == ([10],)
+        sem_versoes_tabelas.assert_called_with(('turma', 'professor', 'aluno'))
+
+        assert client.get('/turmas?include=pagamentos').status_code == 400
+
+    @patch('App.crudAlunos.get_connection')
+    def test_aluno_include_presencas_e_atividades(self, mock_conn, client):
+        mock_cursor = MagicMock()
+        mock_conn.return_value.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [5, 'Ana', '2019-01-01', 1, None, None, None, None]
+        mock_cursor.fetchall.side_effect = [
+            [[100, 5, '2024-01-16', True], [99, 5, '2024-01-15', False]],
+            [[5, 3, 'Pintura', '2024-01-10', 'Ótimo', None]],
+        ]
+
+        response = client.get('/alunos/5?include=atividades,presencas')
+        assert response.status_code == 200
+        aluno = response.get_json()
+        assert [p['id_presenca'] for p in aluno['presencas']] == [100, 99]
+        assert aluno['atividades'] == [{'id_atividade': 3, 'descricao': 'Pintura', 'data_realizacao': '2024-01-10',
+                                        'desempenho': 'Ótimo', 'observacoes': None}]
+        assert 'turma' not in aluno and 'pagamentos' not in aluno
+        assert mock_cursor.execute.call_count == 3